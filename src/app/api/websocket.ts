@@ -20,7 +20,29 @@ export type WebSocketMessage = {
         pitch: number;
         roll: number;
         yaw: number;
+        source?: 'ingest' | 'synthetic';
     };
+} | {
+    type: 'alert';
+    data: {
+        rule: string;
+        field: string;
+        kind: 'threshold' | 'rate';
+        severity: string;
+        state: 'active' | 'cleared';
+        value: number;
+        threshold: number;
+        timestamp: number;
+    }[];
+} | {
+    type: 'alerts';
+    data: {
+        rule: string;
+        field: string;
+        kind: 'threshold' | 'rate';
+        severity: string;
+        value: number;
+    }[];
 } | {
     type: 'video';
     data: string;
@@ -41,6 +63,30 @@ export type WebSocketMessage = {
         altitude: number;
         yaw: number;
     };
+} | {
+    type: 'mapping_images';
+    data: {
+        image_url: string;
+        image_id: string;
+        timestamp: string;
+        latitude: number;
+        longitude: number;
+        altitude: number;
+        yaw: number;
+    }[];
+} | {
+    type: 'device_status';
+    data: {
+        updated: number | null;
+        services: Record<string, {
+            online: boolean | null;
+            status: Record<string, unknown> | null;
+            error: string | null;
+            checked_at: number | null;
+            latency_ms?: number;
+            circuit?: string;
+        }>;
+    };
 };
 
 // Base WebSocket class that can be extended
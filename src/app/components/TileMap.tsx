@@ -0,0 +1,83 @@
+'use client'
+
+import React, { useEffect, useState } from 'react'
+import { Button } from "@/components/ui/button"
+
+const TILE_SIZE = 256
+const GRID_RADIUS = 2 // Tiles drawn on each side of the center tile
+
+// Web Mercator global pixel coordinates at zoom z, same projection as the server's tiles
+function lonLatToPixel(lon: number, lat: number, z: number) {
+  const scale = TILE_SIZE * Math.pow(2, z)
+  const sinLat = Math.sin((Math.max(Math.min(lat, 85.05112878), -85.05112878) * Math.PI) / 180)
+  return {
+    x: ((lon + 180) / 360) * scale,
+    y: (0.5 - Math.log((1 + sinLat) / (1 - sinLat)) / (4 * Math.PI)) * scale,
+  }
+}
+
+export default function TileMap({ center, version }: {
+  center: { latitude: number; longitude: number } | null;
+  version: number;
+}) {
+  const [zoomRange, setZoomRange] = useState<{ min: number; max: number } | null>(null)
+  const [zoom, setZoom] = useState<number | null>(null)
+
+  useEffect(() => {
+    const fetchTileStats = async () => {
+      try {
+        const response = await fetch('http://localhost:8888/tiles/stats')
+        const stats = await response.json()
+        setZoomRange({ min: stats.min_zoom, max: stats.max_zoom })
+        setZoom(Math.max(stats.min_zoom, stats.max_zoom - 2))
+      } catch (error) {
+        console.error('Error fetching tile stats:', error)
+      }
+    }
+    fetchTileStats()
+  }, [])
+
+  if (!center || !zoomRange || zoom === null) {
+    return (
+      <div className="w-full h-full flex items-center justify-center text-muted-foreground">
+        No map tiles yet
+      </div>
+    )
+  }
+
+  // Tiles are placed relative to the center point, which sits in the middle of the view
+  const { x, y } = lonLatToPixel(center.longitude, center.latitude, zoom)
+  const centerX = Math.floor(x / TILE_SIZE)
+  const centerY = Math.floor(y / TILE_SIZE)
+  const tiles = []
+  for (let ty = centerY - GRID_RADIUS; ty <= centerY + GRID_RADIUS; ty++) {
+    for (let tx = centerX - GRID_RADIUS; tx <= centerX + GRID_RADIUS; tx++) {
+      tiles.push({ tx, ty })
+    }
+  }
+
+  return (
+    <div className="relative w-full h-full overflow-hidden bg-muted rounded-md">
+      <div className="absolute left-1/2 top-1/2">
+        {tiles.map(({ tx, ty }) => (
+          // eslint-disable-next-line @next/next/no-img-element
+          <img
+            key={`${zoom}/${tx}/${ty}/${version}`}
+            src={`http://localhost:8888/tiles/${zoom}/${tx}/${ty}.png?v=${version}`}
+            alt=""
+            width={TILE_SIZE}
+            height={TILE_SIZE}
+            className="absolute max-w-none"
+            style={{ left: tx * TILE_SIZE - x, top: ty * TILE_SIZE - y }}
+            // Areas without imagery have no tile
+            onError={(e) => { e.currentTarget.style.visibility = 'hidden' }}
+          />
+        ))}
+      </div>
+      <div className="absolute top-2 right-2 flex flex-col gap-1">
+        <Button size="icon" variant="secondary" disabled={zoom >= zoomRange.max} onClick={() => setZoom(zoom + 1)}>+</Button>
+        <Button size="icon" variant="secondary" disabled={zoom <= zoomRange.min} onClick={() => setZoom(zoom - 1)}>-</Button>
+      </div>
+    </div>
+  )
+}
@@ -5,6 +5,7 @@ import Image from 'next/image'
 import { Card } from "@/components/ui/card"
 import { Button } from "@/components/ui/button"
 import Header from '../components/Header'
+import TileMap from '../components/TileMap'
 import styles from '../styles/Home.module.css'
 import { mappingWsClient } from '../api/websocket'
 import { Trash2 } from 'lucide-react'
@@ -22,12 +23,18 @@ export default function MappingPage() {
     yaw: number;
   }[]>([])
   const [selectedImageData, setSelectedImageData] = useState<typeof images[0] | null>(null)
+  // Bumped whenever imagery changes so the map refetches its (browser-cached) tiles
+  const [tileVersion, setTileVersion] = useState(0)
 
   useEffect(() => {
     mappingWsClient.connect();
     mappingWsClient.onMessage((message) => {
       if (message.type === 'mapping_image') {
         setImages(prevImages => [...prevImages, message.data]);
+        setTileVersion(version => version + 1);
+      } else if (message.type === 'mapping_images') {
+        setImages(prevImages => [...prevImages, ...message.data]);
+        setTileVersion(version => version + 1);
       }
     });
     const savedState = localStorage.getItem('mappingState')
@@ -95,6 +102,9 @@ export default function MappingPage() {
     setSelectedImageData(image);
   };
 
+  // Center the map on the last image with a position
+  const mapCenter = [...images].reverse().find(image => image.latitude || image.longitude) ?? null
+
   const handleDeleteImage = async (imageId: string, e: React.MouseEvent) => {
     e.stopPropagation(); // Prevent image selection when clicking delete
     try {
@@ -108,6 +118,7 @@ export default function MappingPage() {
 
       // Remove the deleted image from state
       setImages(prevImages => prevImages.filter(img => img.image_id !== imageId));
+      setTileVersion(version => version + 1);
       if (selectedImageData?.image_id === imageId) {
         setSelectedImage(null);
         setSelectedImageData(null);
@@ -155,7 +166,18 @@ export default function MappingPage() {
                       selectedImage === image.image_url ? 'bg-accent' : ''
                     } text-card-foreground flex justify-between items-center`}
                   >
-                    <span>{image.image_id}</span>
+                    <div className="flex items-center gap-2 min-w-0">
+                      {/* Small cached thumbnail from the server instead of the full-size image */}
+                      <Image
+                        src={`http://localhost:8888/thumbs${image.image_url}`}
+                        alt=""
+                        width={48}
+                        height={48}
+                        className="rounded object-cover h-12 w-12"
+                        unoptimized={true}
+                      />
+                      <span className="truncate">{image.image_id}</span>
+                    </div>
                     <Button
                       variant="ghost"
                       size="icon"
@@ -205,9 +227,7 @@ export default function MappingPage() {
                   )}
                 </div>
               ) : (
-                <div className="w-full h-full flex items-center justify-center text-muted-foreground">
-                  Select an image to view
-                </div>
+                <TileMap center={mapCenter} version={tileVersion} />
               )}
             </Card>
           </div>
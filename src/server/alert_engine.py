@@ -0,0 +1,228 @@
+import logging
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RULE_KINDS = ("threshold", "rate")
+
+
+class AlertRule(NamedTuple):
+    """
+    One alert condition on a telemetry field. "threshold" rules look at the value,
+    "rate" rules at its change per second. The alert fires once the condition has
+    held for sustain seconds and only clears when the metric is back past clear,
+    so a value hovering at the limit does not flap.
+    """
+    name: str
+    field: str
+    kind: str
+    above: bool
+    trigger: float
+    clear: float
+    sustain: float = 0.0
+    absolute: bool = False
+    severity: str = "warning"
+
+    @classmethod
+    def from_config(cls, config: dict) -> "AlertRule":
+        kind = config.get("kind", "threshold")
+        if kind not in RULE_KINDS:
+            raise ValueError(f"alert rule {config.get('name')}: unknown kind {kind}")
+        if ("above" in config) == ("below" in config):
+            raise ValueError(f"alert rule {config.get('name')}: set exactly one of above/below")
+        above = "above" in config
+        trigger = float(config["above"] if above else config["below"])
+        clear = float(config.get("clear", trigger))
+        if (above and clear > trigger) or (not above and clear < trigger):
+            raise ValueError(f"alert rule {config.get('name')}: clear must be on the safe side of the trigger")
+        return cls(
+            name=config["name"],
+            field=config["field"],
+            kind=kind,
+            above=above,
+            trigger=trigger,
+            clear=clear,
+            sustain=float(config.get("sustain", 0.0)),
+            absolute=bool(config.get("abs", False)),
+            severity=config.get("severity", "warning"),
+        )
+
+
+class TelemetryRing:
+    """Fixed-size ring buffer of (sample time, field values...) rows"""
+
+    def __init__(self, capacity: int, fields: Sequence[str]):
+        self.fields = list(fields)
+        self.capacity = capacity
+        self._rows = np.zeros((capacity, 1 + len(self.fields)), dtype=np.float64)
+        self._next = 0
+        self.count = 0
+
+    @property
+    def newest(self) -> Optional[float]:
+        return float(self._rows[(self._next - 1) % self.capacity, 0]) if self.count else None
+
+    def append(self, sample_time: float, values: np.ndarray):
+        self._rows[self._next, 0] = sample_time
+        self._rows[self._next, 1:] = values
+        self._next = (self._next + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def ordered(self) -> np.ndarray:
+        """Rows oldest first (a copy)"""
+        start = (self._next - self.count) % self.capacity
+        return self._rows[(start + np.arange(self.count)) % self.capacity]
+
+    def since(self, cutoff: float) -> np.ndarray:
+        rows = self.ordered()
+        return rows[np.searchsorted(rows[:, 0], cutoff):]
+
+
+class AlertEngine:
+    """
+    Evaluates every rule against each telemetry sample in one vectorized pass over
+    a ring buffer of recent samples, and reports only alert state transitions.
+    Rates and sustain durations are measured on the samples' own timestamps, so a
+    batch posted at once is judged at the pace it was recorded. Timestamps must
+    increase; the engine resets whenever the sample source changes, so each feed
+    keeps its own time base.
+    """
+
+    def __init__(self, rules: List[AlertRule], fields: Sequence[str], capacity: int, rate_window: float,
+                 publish: Optional[Callable[[List[dict]], None]] = None):
+        self.rules = rules
+        self.rate_window = rate_window
+        self.publish = publish
+        self.ring = TelemetryRing(capacity, fields)
+        field_index = {field: i for i, field in enumerate(fields)}
+        unknown = [rule.field for rule in rules if rule.field not in field_index]
+        if unknown:
+            raise ValueError(f"alert rules reference unknown fields: {', '.join(unknown)}")
+
+        # Per-rule parameters as arrays, so evaluation is a handful of NumPy ops for any number of rules
+        self._field = np.array([field_index[rule.field] for rule in rules], dtype=np.intp)
+        self._rate = np.array([rule.kind == "rate" for rule in rules], dtype=bool)
+        self._absolute = np.array([rule.absolute for rule in rules], dtype=bool)
+        # Flip "below" rules so every comparison is metric * sign > limit * sign
+        self._sign = np.array([1.0 if rule.above else -1.0 for rule in rules])
+        self._trigger = np.array([rule.trigger for rule in rules]) * self._sign
+        self._clear = np.array([rule.clear for rule in rules]) * self._sign
+        self._sustain = np.array([rule.sustain for rule in rules])
+
+        self.active = np.zeros(len(rules), dtype=bool)
+        # Sample time the trigger condition started holding, NaN while it does not
+        self._since = np.full(len(rules), np.nan)
+        self._metric = np.full(len(rules), np.nan)
+        # Source tag of the samples in the ring (see TelemetrySource), copied onto events
+        self.source: Optional[str] = None
+        self.samples = 0
+        self.transitions = 0
+        self.resets = 0
+        self.last_eval_us: Optional[float] = None
+
+    def _rates(self, now: float, values: np.ndarray) -> np.ndarray:
+        past = self.ring.since(now - self.rate_window)
+        if len(past) < 2:
+            return np.zeros_like(values)
+        elapsed = now - past[0, 0]
+        if elapsed <= 0:
+            return np.zeros_like(values)
+        return (values - past[0, 1:]) / elapsed
+
+    def evaluate(self, sample: dict, now: Optional[float] = None) -> List[dict]:
+        """
+        Add a sample and return the alerts that turned on or off because of it. now
+        is the sample's time (defaults to its timestamp); raises ValueError if it is
+        not later than the previous sample from the same source.
+        """
+        start = time.perf_counter()
+        now = float(sample["timestamp"]) if now is None else now
+        values = np.array([sample[field] for field in self.ring.fields], dtype=np.float64)
+        if sample.get("source") != self.source and self.ring.count:
+            # Rates and sustain times must not span samples from two different feeds
+            self.reset()
+        elif self.ring.count and now <= self.ring.newest:
+            raise ValueError(f"sample time {now} is not after the previous sample ({self.ring.newest})")
+        self.source = sample.get("source")
+        self.ring.append(now, values)
+        self.samples += 1
+        if not self.rules:
+            return []
+
+        metric = np.where(self._rate, self._rates(now, values)[self._field], values[self._field])
+        metric = np.where(self._absolute, np.abs(metric), metric)
+        self._metric = metric
+        signed = metric * self._sign
+
+        triggering = signed > self._trigger
+        self._since = np.where(triggering, np.where(np.isnan(self._since), now, self._since), np.nan)
+        sustained = triggering & (now - self._since >= self._sustain)
+        # Hysteresis: an active alert stays on until the metric is back past the clear level
+        active = np.where(self.active, signed >= self._clear, sustained)
+
+        changed = np.flatnonzero(active != self.active)
+        self.active = active
+        events = [self._event(i, sample) for i in changed]
+        self.transitions += len(events)
+        self.last_eval_us = (time.perf_counter() - start) * 1e6
+        if events and self.publish:
+            self.publish(events)
+        return events
+
+    def reset(self) -> List[dict]:
+        """Forget the buffered samples and clear every active alert; returns the cleared events"""
+        cleared = np.flatnonzero(self.active)
+        self.active = np.zeros(len(self.rules), dtype=bool)
+        events = [self._event(i, {"timestamp": time.time(), "source": self.source}) for i in cleared]
+        self.ring = TelemetryRing(self.ring.capacity, self.ring.fields)
+        self._since = np.full(len(self.rules), np.nan)
+        self._metric = np.full(len(self.rules), np.nan)
+        self.resets += 1
+        self.transitions += len(events)
+        if events and self.publish:
+            self.publish(events)
+        return events
+
+    def _event(self, i: int, sample: dict) -> dict:
+        rule = self.rules[i]
+        return {
+            "rule": rule.name,
+            "field": rule.field,
+            "kind": rule.kind,
+            "severity": rule.severity,
+            "state": "active" if self.active[i] else "cleared",
+            "value": float(self._metric[i]),
+            "threshold": rule.trigger if self.active[i] else rule.clear,
+            "timestamp": sample.get("timestamp"),
+            "source": sample.get("source"),
+        }
+
+    def active_alerts(self) -> List[dict]:
+        return [
+            {
+                "rule": self.rules[i].name,
+                "field": self.rules[i].field,
+                "kind": self.rules[i].kind,
+                "severity": self.rules[i].severity,
+                "value": float(self._metric[i]),
+            }
+            for i in np.flatnonzero(self.active)
+        ]
+
+    def rule_configs(self) -> List[Dict]:
+        return [rule._asdict() for rule in self.rules]
+
+    def stats(self) -> dict:
+        return {
+            "rules": len(self.rules),
+            "active": int(self.active.sum()),
+            "samples": self.samples,
+            "transitions": self.transitions,
+            "resets": self.resets,
+            "source": self.source,
+            "buffered": self.ring.count,
+            "last_eval_us": self.last_eval_us,
+        }
@@ -0,0 +1,51 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import cdist
+
+# Above this many candidate pairs the KD-tree pre-gate replaces the dense cost matrix
+KDTREE_MIN_PAIRS = 4096
+
+
+def associate(previous_centers, current_centers, max_distance):
+    """
+    Globally optimal one-to-one association between two sets of centers.
+
+    Pairs further apart than max_distance are gated out; among the remaining pairs
+    linear_sum_assignment maximizes the number of matches and then minimizes total
+    distance. Returns (prev_idx, curr_idx) index arrays of the accepted matches.
+    """
+    previous_centers = np.asarray(previous_centers, dtype=float).reshape(-1, 2)
+    current_centers = np.asarray(current_centers, dtype=float).reshape(-1, 2)
+    n_prev, n_curr = len(previous_centers), len(current_centers)
+    empty = np.empty(0, dtype=np.intp)
+    if n_prev == 0 or n_curr == 0:
+        return empty, empty
+
+    if n_prev * n_curr >= KDTREE_MIN_PAIRS:
+        # Only pairs inside the gate are ever materialized
+        pairs = cKDTree(previous_centers).sparse_distance_matrix(
+            cKDTree(current_centers), max_distance, output_type="ndarray"
+        )
+        if len(pairs) == 0:
+            return empty, empty
+        rows, row_index = np.unique(pairs["i"], return_inverse=True)
+        cols, col_index = np.unique(pairs["j"], return_inverse=True)
+        costs = np.full((len(rows), len(cols)), np.inf)
+        costs[row_index, col_index] = pairs["v"]
+    else:
+        rows, cols = np.arange(n_prev), np.arange(n_curr)
+        costs = cdist(previous_centers, current_centers)
+        costs[costs > max_distance] = np.inf
+
+    # Gated pairs get a cost larger than any full set of feasible matches, so the
+    # solver never trades a feasible match away for a shorter total distance
+    feasible = np.isfinite(costs)
+    if not feasible.any():
+        return empty, empty
+    penalty = (costs[feasible].max() + 1.0) * (min(costs.shape) + 1)
+    costs[~feasible] = penalty
+
+    row_ind, col_ind = linear_sum_assignment(costs)
+    accepted = feasible[row_ind, col_ind]
+    return rows[row_ind[accepted]], cols[col_ind[accepted]]
@@ -0,0 +1,105 @@
+"""
+Benchmark and regression check for the warning system alert engine.
+
+Times AlertEngine.evaluate per sample for a growing number of rules, then posts
+batched attitude ramps to /warning-system/telemetry: a smooth ramp below every
+rate limit must not raise an alert, and a steep one must. Exits 1 if either
+check fails.
+
+Usage:
+    cd src/server
+    python benchmarks/bench_alert_engine.py
+    python benchmarks/bench_alert_engine.py --rules 4 64 256 --samples 5000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from alert_engine import AlertEngine, AlertRule  # noqa: E402
+from config import ALERT_RULES, ALERT_BUFFER_SAMPLES, ALERT_RATE_WINDOW  # noqa: E402
+from telemetry_source import TELEMETRY_FIELDS  # noqa: E402
+
+SAMPLE_DT = 0.1
+
+
+def make_rules(n_rules):
+    rules = [AlertRule.from_config(rule) for rule in ALERT_RULES]
+    return [rules[i % len(rules)]._replace(name=f"{rules[i % len(rules)].name}_{i}") for i in range(n_rules)]
+
+
+def run(n_rules, n_samples):
+    engine = AlertEngine(make_rules(n_rules), TELEMETRY_FIELDS, ALERT_BUFFER_SAMPLES, ALERT_RATE_WINDOW)
+    t = np.arange(n_samples) * SAMPLE_DT
+    samples = [
+        {"timestamp": ts, "pitch": 70 * np.sin(ts / 2), "roll": 50 * np.sin(ts / 3), "yaw": 30 * np.sin(ts / 4),
+         "source": "ingest"}
+        for ts in t
+    ]
+    latencies = []
+    for sample in samples:
+        start = time.perf_counter()
+        engine.evaluate(sample)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return {
+        "rules": n_rules,
+        "p50_us": float(np.percentile(latencies, 50)),
+        "p99_us": float(np.percentile(latencies, 99)),
+        "transitions": engine.transitions,
+    }
+
+
+def post_ramp(client, start, rate, n_samples=10):
+    """Post one batch of samples SAMPLE_DT apart with pitch rising at rate degrees/s"""
+    batch = [
+        {"timestamp": start + i * SAMPLE_DT, "pitch": rate * i * SAMPLE_DT, "roll": 0.0, "yaw": 0.0}
+        for i in range(n_samples)
+    ]
+    response = client.post("/warning-system/telemetry", json=batch)
+    response.raise_for_status()
+    return {alert["rule"] for alert in client.get("/warning-system/alerts").json()["active"]}
+
+
+def check_batched_ramps():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    import routers.warning_system as warning_system
+
+    app = FastAPI()
+    app.include_router(warning_system.router)
+    failures = 0
+    with TestClient(app) as client:
+        smooth = post_ramp(client, time.time(), rate=20.0)
+        print(f"smooth 20 deg/s batch: active alerts {sorted(smooth) or 'none'}")
+        if smooth:
+            failures += 1
+        warning_system.alert_engine.reset()
+        steep = post_ramp(client, time.time() + 10, rate=50.0)
+        print(f"steep 50 deg/s batch:  active alerts {sorted(steep) or 'none'}")
+        if "pitch_rate" not in steep:
+            failures += 1
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rules", type=int, nargs="+", default=[4, 32, 256])
+    parser.add_argument("--samples", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'rules':>6} {'p50 us':>10} {'p99 us':>10} {'transitions':>12}")
+    for n_rules in args.rules:
+        result = run(n_rules, args.samples)
+        print(f"{result['rules']:>6} {result['p50_us']:>10.1f} {result['p99_us']:>10.1f} {result['transitions']:>12}")
+    print()
+    failures = check_batched_ramps()
+    print(f"{failures} check(s) failed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
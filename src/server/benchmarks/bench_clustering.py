@@ -0,0 +1,56 @@
+"""
+Per-frame clustering latency for each ObstacleDetector backend.
+
+Usage:
+    cd src/server
+    python benchmarks/bench_clustering.py --points 1000 10000 50000 200000 --scene dense_walls
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from clustering import DBSCANClusterer, GridClusterer  # noqa: E402
+from config import OBSTACLE_GRID_CELL_SIZE, OBSTACLE_MIN_SAMPLES  # noqa: E402
+from scenes import SCENES  # noqa: E402
+
+
+def time_backend(clusterer, frames):
+    samples = []
+    for points in frames:
+        start = time.perf_counter()
+        labels = clusterer.fit(points)
+        samples.append(time.perf_counter() - start)
+    return np.median(samples) * 1000, int(labels.max()) + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, nargs="+", default=[1000, 5000, 20000, 50000, 100000, 200000])
+    parser.add_argument("--frames", type=int, default=5)
+    parser.add_argument("--scene", choices=sorted(SCENES), default="dense_walls")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-dbscan-points", type=int, default=50000,
+                        help="skip DBSCAN above this size (its neighbourhood memory grows quickly)")
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    print(f"{'points':>8} {'grid ms':>9} {'clusters':>9} {'dbscan ms':>10} {'clusters':>9}")
+    for n_points in args.points:
+        frames = SCENES[args.scene](n_points, args.frames, rng)
+
+        grid_ms, grid_k = time_backend(GridClusterer(OBSTACLE_GRID_CELL_SIZE, OBSTACLE_MIN_SAMPLES), frames)
+        if n_points <= args.max_dbscan_points:
+            dbscan_ms, dbscan_k = time_backend(DBSCANClusterer(), frames)
+            dbscan = f"{dbscan_ms:>10.2f} {dbscan_k:>9}"
+        else:
+            dbscan = f"{'skipped':>10} {'-':>9}"
+        print(f"{n_points:>8} {grid_ms:>9.2f} {grid_k:>9} {dbscan}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+CPU cost and added latency of relaying detection frames: legacy base64-in-JSON
+versus binary header + raw JPEG passthrough.
+
+The relay work per frame is what the server does between receiving a Pi message
+and handing bytes to the websocket layer for each frontend client.
+
+Usage:
+    cd src/server
+    python benchmarks/bench_detection_relay.py --frame-kb 80 --fps 30 --seconds 10
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from detection_frames import pack_frame, parse_header  # noqa: E402
+
+
+def json_relay(message: str):
+    # receive_json() + rebuild + send_json() in the original handler
+    data = json.loads(message)
+    detection_frame = {
+        "type": "detection_frame",
+        "data": {"timestamp": int(time.time()), "frame": data["frame"]},
+    }
+    return json.dumps(detection_frame)
+
+
+def binary_relay(message: bytes):
+    parse_header(message)
+    return message
+
+
+def measure(relay, messages):
+    latencies = []
+    cpu_start = time.process_time()
+    for message in messages:
+        start = time.perf_counter()
+        relay(message)
+        latencies.append(time.perf_counter() - start)
+    cpu = time.process_time() - cpu_start
+    latencies.sort()
+    return cpu, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frame-kb", type=int, default=80, help="JPEG size per frame")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--seconds", type=int, default=10, help="simulated stream length")
+    args = parser.parse_args()
+
+    n_frames = args.fps * args.seconds
+    jpegs = [os.urandom(args.frame_kb * 1024) for _ in range(8)]
+    json_messages = [
+        json.dumps({"frame": base64.b64encode(jpegs[i % len(jpegs)]).decode()}) for i in range(n_frames)
+    ]
+    binary_messages = [pack_frame(i, time.time(), jpegs[i % len(jpegs)]) for i in range(n_frames)]
+
+    print(f"{n_frames} frames of {args.frame_kb} KB ({args.seconds} s at {args.fps} fps)")
+    print(f"{'':8} {'wire KB':>8} {'CPU % core':>11} {'p50 us':>9} {'p99 us':>9}")
+    for name, relay, messages in (("json", json_relay, json_messages), ("binary", binary_relay, binary_messages)):
+        cpu, p50, p99 = measure(relay, messages)
+        wire_kb = len(messages[0]) / 1024
+        print(f"{name:8} {wire_kb:>8.1f} {cpu / args.seconds * 100:>10.2f}% {p50 * 1e6:>9.1f} {p99 * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Compare JSON and packed binary ingest for /lidar-data.
+
+Usage:
+    cd src/server
+    python benchmarks/bench_lidar_ingest.py --points 1000 5000 20000
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lidar_codec import encode_scan, decode_scan  # noqa: E402
+
+
+def make_scan(n_points, n_boxes=8):
+    angles = np.linspace(0, 2 * np.pi, n_points, endpoint=False)
+    ranges = np.random.uniform(0.5, 14, n_points)
+    points = np.column_stack([ranges * np.cos(angles), ranges * np.sin(angles)]).astype(np.float32)
+    labels = np.random.randint(-1, n_boxes, n_points).astype(np.int32)
+    boxes = np.column_stack([
+        np.arange(n_boxes),
+        np.random.uniform(-10, 10, (n_boxes, 2)),
+        np.random.uniform(0.2, 2, (n_boxes, 2)),
+        np.zeros(n_boxes),
+    ]).astype(np.float32)
+    return points, labels, boxes
+
+
+def time_it(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return np.median(samples) * 1000
+
+
+def run(n_points, repeat):
+    points, labels, boxes = make_scan(n_points)
+    json_body = json.dumps({
+        "scan_points": points.tolist(),
+        "point_labels": labels.tolist(),
+        "bounding_boxes": [
+            {"center": [b[1], b[2]], "width": b[3], "height": b[4]} for b in boxes.tolist()
+        ],
+    }).encode()
+    binary_body = encode_scan(points, labels, boxes)
+
+    def json_ingest():
+        data = json.loads(json_body)
+        return data["scan_points"]
+
+    def json_forward():
+        data = json.loads(json_body)
+        return json.dumps({"type": "lidar", "data": {"points": data["scan_points"]}})
+
+    def binary_ingest():
+        return decode_scan(binary_body).points
+
+    def binary_forward():
+        scan = decode_scan(binary_body)
+        return json.dumps({"type": "lidar", "data": {"points": scan.points.tolist()}})
+
+    return {
+        "points": n_points,
+        "json_bytes": len(json_body),
+        "binary_bytes": len(binary_body),
+        "json_ingest_ms": time_it(json_ingest, repeat),
+        "binary_ingest_ms": time_it(binary_ingest, repeat),
+        "json_forward_ms": time_it(json_forward, repeat),
+        "binary_forward_ms": time_it(binary_forward, repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, nargs="+", default=[1000, 5000, 20000, 100000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    header = f"{'points':>8} {'json KB':>9} {'bin KB':>8} {'json ingest':>12} {'bin ingest':>11} {'json fwd':>9} {'bin fwd':>8}"
+    print(header)
+    for n_points in args.points:
+        r = run(n_points, args.repeat)
+        print(
+            f"{r['points']:>8} {r['json_bytes'] / 1024:>9.1f} {r['binary_bytes'] / 1024:>8.1f} "
+            f"{r['json_ingest_ms']:>10.3f}ms {r['binary_ingest_ms']:>9.3f}ms "
+            f"{r['json_forward_ms']:>7.3f}ms {r['binary_forward_ms']:>6.3f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Compare bytes per second and encode time of plain JSON lidar frames against
+the delta/keyframe stream codec used by /ws/lidar?codec=delta. Scans are run
+with a fixed point count and with a varying one (dropped returns, and the
+per-subscriber max_points downsampling when --max-points is given).
+
+Usage:
+    cd src/server
+    python benchmarks/bench_lidar_stream.py --points 2000 --frames 300 --rate 10
+    python benchmarks/bench_lidar_stream.py --dropout 0.05 --max-points 500
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lidar_codec import LidarFrame, LidarStreamEncoder, LidarStreamDecoder  # noqa: E402
+from point_cloud import downsample_to_budget  # noqa: E402
+from config import LIDAR_STREAM_QUANTUM, LIDAR_STREAM_KEYFRAME_INTERVAL, LIDAR_DOWNSAMPLE_METHOD  # noqa: E402
+
+
+def scan_sequence(n_points, n_frames, noise=0.005, n_boxes=6, dropout=0.0, max_points=None):
+    """
+    Slowly drifting room scan with range noise and a few drifting boxes. dropout is the
+    fraction of returns missing from each scan, so the point count changes every frame.
+    """
+    angles = np.linspace(-np.pi, np.pi, n_points, endpoint=False)
+    base_ranges = 4 + 2 * np.sin(3 * angles) + np.random.uniform(0, 0.5, n_points)
+    box_centers = np.random.uniform(-5, 5, (n_boxes, 2))
+    for i in range(n_frames):
+        ranges = base_ranges + np.random.normal(0, noise, n_points) + 0.001 * i
+        points = np.column_stack([ranges * np.cos(angles), ranges * np.sin(angles)]).astype(np.float32)
+        labels = (np.arange(n_points) * n_boxes // n_points).astype(np.int32)
+        if dropout:
+            keep = np.random.uniform(size=n_points) >= dropout
+            points, labels = points[keep], labels[keep]
+        if max_points and len(points) > max_points:
+            # Per-point labels do not survive downsampling (same as publish_scan)
+            points, labels = downsample_to_budget(points, max_points, LIDAR_DOWNSAMPLE_METHOD), None
+        centers = box_centers + 0.01 * i
+        boxes = np.column_stack([
+            np.arange(n_boxes), centers, np.full((n_boxes, 2), 0.8), np.zeros(n_boxes)
+        ]).astype(np.float32)
+        yield points, labels, boxes
+
+
+def json_frame(points, boxes):
+    clusters = [
+        {"id": int(b[0]), "center": (b[1], b[2]), "width": b[3], "height": b[4], "theta": b[5], "points": []}
+        for b in boxes.tolist()
+    ]
+    return json.dumps({
+        "type": "lidar",
+        "data": {"points": points.tolist(), "clusters": clusters, "radius_threshold": 14},
+    }).encode()
+
+
+def run(frames_iter, frames):
+    encoder = LidarStreamEncoder(quantum=LIDAR_STREAM_QUANTUM, keyframe_interval=LIDAR_STREAM_KEYFRAME_INTERVAL)
+    decoder = LidarStreamDecoder()
+    json_bytes = codec_bytes = 0
+    json_time = codec_time = 0.0
+    max_error = 0.0
+    keyframes = 0
+
+    for points, labels, boxes in frames_iter:
+        start = time.perf_counter()
+        json_bytes += len(json_frame(points, boxes))
+        json_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        message = encoder.encode(LidarFrame(points, labels, boxes))
+        codec_time += time.perf_counter() - start
+        codec_bytes += len(message)
+        keyframes += message[4] == 0
+
+        decoded = decoder.decode(message)
+        if len(points):
+            max_error = max(max_error, float(np.abs(decoded.points - points).max()))
+    return json_bytes, json_time, codec_bytes, codec_time, keyframes, max_error
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=2000)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--rate", type=float, default=10.0, help="scan rate in Hz used for bytes/s")
+    parser.add_argument("--noise", type=float, default=0.005, help="per-point range noise")
+    parser.add_argument("--dropout", type=float, default=0.02, help="fraction of returns missing per scan in the variable-count run")
+    parser.add_argument("--max-points", type=int, default=None, help="also downsample the variable-count run to this budget")
+    args = parser.parse_args()
+
+    frames = args.frames
+    print(f"{args.points} points, {frames} frames at {args.rate:g} Hz, keyframe every {LIDAR_STREAM_KEYFRAME_INTERVAL}")
+    print(f"{'':20} {'KB/frame':>9} {'KB/s':>9} {'encode ms':>10} {'keyframes':>10} {'ratio':>6}")
+    scenarios = (
+        ("fixed count", scan_sequence(args.points, frames, args.noise)),
+        ("variable count", scan_sequence(args.points, frames, args.noise, dropout=args.dropout, max_points=args.max_points)),
+    )
+    for scenario, frames_iter in scenarios:
+        json_bytes, json_time, codec_bytes, codec_time, keyframes, max_error = run(frames_iter, frames)
+        for name, total_bytes, total_time, kf in (("json", json_bytes, json_time, ""), ("delta", codec_bytes, codec_time, keyframes)):
+            per_frame = total_bytes / frames / 1024
+            ratio = f"{json_bytes / codec_bytes:.1f}x" if name == "delta" else ""
+            print(f"{scenario + ' ' + name:20} {per_frame:>9.1f} {per_frame * args.rate:>9.1f} "
+                  f"{total_time / frames * 1000:>10.3f} {kf!s:>10} {ratio:>6}")
+        print(f"{scenario}: max reconstruction error {max_error:.4g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Time MappingStore's spatial queries on a large generated image set.
+
+Fills a temporary SQLite store with images scattered over a survey area, then
+reports p50/p99 latency of viewport (bbox), radius and k-nearest queries at random
+points. The target for a map viewport is a few milliseconds at 100k images.
+
+Usage:
+    cd src/server
+    python benchmarks/bench_mapping_queries.py
+    python benchmarks/bench_mapping_queries.py --images 10000 100000 --queries 500
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mapping_store import MappingStore, METERS_PER_DEGREE  # noqa: E402
+
+CENTER = (42.4440, -76.5019)
+AREA_M = 5000.0  # Side of the square survey area
+VIEWPORT_M = 300.0  # Side of a zoomed-in map viewport
+RADIUS_M = 100.0
+NEAREST_K = 10
+
+
+def fill_store(store, n_images, rng):
+    lats = CENTER[0] + rng.uniform(-0.5, 0.5, n_images) * AREA_M / METERS_PER_DEGREE
+    lons = CENTER[1] + rng.uniform(-0.5, 0.5, n_images) * AREA_M / (METERS_PER_DEGREE * np.cos(np.radians(CENTER[0])))
+    store.upsert_many([
+        {
+            "image_id": f"img{i}", "image_url": f"/mapping_images/img{i}.jpg", "timestamp": float(i),
+            "latitude": float(lat), "longitude": float(lon), "altitude": 50.0, "yaw": 0.0,
+        }
+        for i, (lat, lon) in enumerate(zip(lats, lons))
+    ])
+
+
+def time_queries(query, points):
+    latencies, results = [], 0
+    for lat, lon in points:
+        start = time.perf_counter()
+        results += len(query(lat, lon))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99)), results / len(points)
+
+
+def run(n_images, n_queries, seed):
+    rng = np.random.default_rng(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = MappingStore(Path(tmp) / "mapping.db")
+        fill_store(store, n_images, rng)
+        half_lat = VIEWPORT_M / 2 / METERS_PER_DEGREE
+        half_lon = half_lat / np.cos(np.radians(CENTER[0]))
+        points = [
+            (CENTER[0] + dy * AREA_M / 2 / METERS_PER_DEGREE, CENTER[1] + dx * AREA_M / 2 / METERS_PER_DEGREE)
+            for dy, dx in rng.uniform(-0.8, 0.8, (n_queries, 2))
+        ]
+        queries = {
+            "bbox": lambda lat, lon: store.within_bbox(lat - half_lat, lon - half_lon, lat + half_lat, lon + half_lon),
+            "radius": lambda lat, lon: store.within_radius(lat, lon, RADIUS_M),
+            "nearest": lambda lat, lon: store.nearest(lat, lon, NEAREST_K),
+        }
+        return store.spatial_index, {name: time_queries(query, points) for name, query in queries.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'images':>8} {'index':>6} {'query':>8} {'p50 ms':>8} {'p99 ms':>8} {'rows/query':>11}")
+    for n_images in args.images:
+        index, results = run(n_images, args.queries, args.seed)
+        for name, (p50, p99, rows) in results.items():
+            print(f"{n_images:>8} {index:>6} {name:>8} {p50:>8.2f} {p99:>8.2f} {rows:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
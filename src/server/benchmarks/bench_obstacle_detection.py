@@ -0,0 +1,194 @@
+"""
+Stage-by-stage benchmark and regression check for ObstacleDetector.
+
+Times StandardScaler, clustering, bounding boxes, match_clusters, the tracker
+update and JSON serialization on generated scenes, reporting p50/p99 latency
+and peak traced memory per frame. Results are written to
+benchmarks/results/<label>.json (label defaults to the current git commit) so
+two runs can be diffed with --compare.
+
+Usage:
+    cd src/server
+    python benchmarks/bench_obstacle_detection.py
+    python benchmarks/bench_obstacle_detection.py --points 1000 100000 --scenes moving_targets
+    python benchmarks/bench_obstacle_detection.py --compare benchmarks/results/<baseline>.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+sys.path.insert(0, str(BENCH_DIR))
+
+from obstacle_detection import ObstacleDetector, default_clusterer  # noqa: E402
+from point_cloud import cluster_boxes  # noqa: E402
+from scenes import SCENES  # noqa: E402
+
+RESULTS_DIR = BENCH_DIR / "results"
+STAGES = (
+    "standard_scaler", "clustering", "bounding_boxes",
+    "match_clusters", "tracking_update", "json_serialization", "process_frame",
+)
+FRAME_DT = 0.1
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        yield
+        self.samples[name].append((time.perf_counter() - start) * 1000)
+
+    def summary(self):
+        return {
+            name: {"p50_ms": float(np.percentile(values, 50)), "p99_ms": float(np.percentile(values, 99))}
+            for name, values in self.samples.items() if values
+        }
+
+
+def run_stages(frames, backend):
+    """Time each stage in isolation, then process_frame end to end on a separate detector"""
+    timer = StageTimer()
+    staged = ObstacleDetector(simulation=False, clusterer=default_clusterer(backend))
+    whole = ObstacleDetector(simulation=False, clusterer=default_clusterer(backend))
+    previous = []
+
+    for i, points in enumerate(frames):
+        timestamp = i * FRAME_DT
+        with timer.stage("standard_scaler"):
+            StandardScaler().fit_transform(points)
+        with timer.stage("clustering"):
+            labels = staged.clusterer.fit(points)
+        with timer.stage("bounding_boxes"):
+            boxes, _, _ = cluster_boxes(points, labels)
+        current = [{"center": (row[2], row[3])} for row in boxes]
+        with timer.stage("match_clusters"):
+            staged.match_clusters(current, previous, max_distance=staged.tracks.gate)
+        with timer.stage("tracking_update"):
+            staged.tracks.step(boxes[:, 2:4], FRAME_DT)
+        previous = current
+
+        with timer.stage("process_frame"):
+            result = whole.process_frame(points, timestamp=timestamp)
+        with timer.stage("json_serialization"):
+            json.dumps(result)
+
+    return timer.summary()
+
+
+def peak_memory_kb(frames, backend, n_frames=3):
+    """Peak traced allocation of process_frame plus serialization, over a few frames"""
+    detector = ObstacleDetector(simulation=False, clusterer=default_clusterer(backend))
+    peak = 0
+    for i, points in enumerate(frames[:n_frames]):
+        tracemalloc.start()
+        json.dumps(detector.process_frame(points, timestamp=i * FRAME_DT))
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results, baseline_path, threshold):
+    baseline = json.loads(Path(baseline_path).read_text())
+    base_index = {(r["scene"], r["points"], r["backend"]): r for r in baseline["results"]}
+    print(f"\nComparison against {baseline_path} ({baseline['meta']['commit']}), p50 ratio new/old")
+    regressions = 0
+    for r in results:
+        base = base_index.get((r["scene"], r["points"], r["backend"]))
+        if base is None:
+            continue
+        for stage, stats in r["stages"].items():
+            old = base["stages"].get(stage)
+            if not old or old["p50_ms"] <= 0:
+                continue
+            ratio = stats["p50_ms"] / old["p50_ms"]
+            flag = "  REGRESSION" if ratio > threshold else ""
+            regressions += bool(flag)
+            print(f"  {r['scene']:<15} {r['points']:>7} {r['backend']:<7} {stage:<19} "
+                  f"{old['p50_ms']:>9.3f} -> {stats['p50_ms']:>9.3f} ms  x{ratio:.2f}{flag}")
+    print(f"{regressions} stage(s) slower than x{threshold:g}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenes", nargs="+", choices=sorted(SCENES), default=sorted(SCENES))
+    parser.add_argument("--points", type=int, nargs="+", default=[1000, 10000, 100000, 500000])
+    parser.add_argument("--backends", nargs="+", default=["grid", "dbscan"])
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--max-dbscan-points", type=int, default=20000,
+                        help="skip DBSCAN above this size (its neighbourhood memory grows quickly)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", help="results file name (defaults to the git commit)")
+    parser.add_argument("--compare", help="baseline results file to diff against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="p50 ratio reported as a regression")
+    args = parser.parse_args()
+
+    results = []
+    for scene in args.scenes:
+        for n_points in args.points:
+            frames = SCENES[scene](n_points, args.frames, np.random.default_rng(args.seed))
+            for backend in args.backends:
+                if backend == "dbscan" and n_points > args.max_dbscan_points:
+                    continue
+                stages = run_stages(frames, backend)
+                memory = peak_memory_kb(frames, backend)
+                results.append({
+                    "scene": scene, "points": n_points, "backend": backend,
+                    "stages": stages, "peak_memory_kb": memory,
+                })
+                total = stages["process_frame"]
+                print(f"{scene:<15} {n_points:>7} {backend:<7} process_frame p50 {total['p50_ms']:>9.2f} ms "
+                      f"p99 {total['p99_ms']:>9.2f} ms  peak {memory / 1024:>7.1f} MB")
+                for stage in STAGES[:-1]:
+                    stats = stages[stage]
+                    print(f"{'':33}{stage:<19} p50 {stats['p50_ms']:>9.3f} ms p99 {stats['p99_ms']:>9.3f} ms")
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "frames": args.frames,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    RESULTS_DIR.mkdir(exist_ok=True)
+    out_path = RESULTS_DIR / f"{args.label or commit}.json"
+    out_path.write_text(json.dumps(report, indent=2))
+    print(f"\nSaved results to {out_path}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
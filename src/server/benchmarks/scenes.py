@@ -0,0 +1,75 @@
+"""
+Parameterized LiDAR scene generators for benchmarks.
+
+Every generator returns a list of (n, 2) float arrays, one per frame, so that
+tracking stages see realistic frame-to-frame continuity.
+"""
+import numpy as np
+
+EXTENT = 30.0  # Scene half-width is EXTENT / 2, in scan units
+
+
+def _blobs(rng, centers, n_points, spread=0.3):
+    picks = rng.integers(0, len(centers), n_points)
+    return centers[picks] + rng.normal(0, spread, (n_points, 2))
+
+
+def _walls(rng, n_points, half=EXTENT / 2, thickness=0.05):
+    side = rng.integers(0, 4, n_points)
+    s = rng.uniform(-half, half, n_points)
+    x = np.choose(side, [s, np.full(n_points, half), s, np.full(n_points, -half)])
+    y = np.choose(side, [np.full(n_points, -half), s, np.full(n_points, half), s])
+    return np.column_stack([x, y]) + rng.normal(0, thickness, (n_points, 2))
+
+
+def _noise(rng, n_points, half=EXTENT / 2):
+    return rng.uniform(-half, half, (n_points, 2))
+
+
+def many_obstacles(n_points, n_frames, rng, n_obstacles=200, noise_fraction=0.02):
+    """Hundreds of small static obstacles with light sensor jitter"""
+    centers = rng.uniform(-EXTENT / 2, EXTENT / 2, (n_obstacles, 2))
+    n_noise = int(n_points * noise_fraction)
+    return [
+        np.vstack([_blobs(rng, centers, n_points - n_noise, 0.15), _noise(rng, n_noise)])
+        for _ in range(n_frames)
+    ]
+
+
+def dense_walls(n_points, n_frames, rng, n_obstacles=10, wall_fraction=0.8):
+    """A room outline dominating the scan with a few obstacles inside"""
+    centers = rng.uniform(-EXTENT / 3, EXTENT / 3, (n_obstacles, 2))
+    n_wall = int(n_points * wall_fraction)
+    return [
+        np.vstack([_walls(rng, n_wall), _blobs(rng, centers, n_points - n_wall)])
+        for _ in range(n_frames)
+    ]
+
+
+def moving_targets(n_points, n_frames, rng, n_obstacles=30, speed=0.3, dt=0.1):
+    """Obstacles moving with constant velocity, some heading towards the sensor"""
+    centers = rng.uniform(-EXTENT / 2, EXTENT / 2, (n_obstacles, 2))
+    velocity = rng.normal(0, speed, (n_obstacles, 2))
+    frames = []
+    for _ in range(n_frames):
+        frames.append(_blobs(rng, centers, n_points, 0.3))
+        centers = centers + velocity * dt
+    return frames
+
+
+def noisy(n_points, n_frames, rng, n_obstacles=20, noise_fraction=0.5):
+    """Half of the returns are uniform clutter"""
+    centers = rng.uniform(-EXTENT / 2, EXTENT / 2, (n_obstacles, 2))
+    n_noise = int(n_points * noise_fraction)
+    return [
+        np.vstack([_blobs(rng, centers, n_points - n_noise), _noise(rng, n_noise)])
+        for _ in range(n_frames)
+    ]
+
+
+SCENES = {
+    "many_obstacles": many_obstacles,
+    "dense_walls": dense_walls,
+    "moving_targets": moving_targets,
+    "noisy": noisy,
+}
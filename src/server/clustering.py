@@ -0,0 +1,130 @@
+import numpy as np
+from scipy import ndimage
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from sklearn.cluster import DBSCAN
+from sklearn.preprocessing import StandardScaler
+
+# Dense occupancy grids larger than this fall back to the sparse cell graph
+MAX_DENSE_CELLS = 4_000_000
+
+# Forward half of the 8-neighbourhood; the other half is covered by symmetry
+_NEIGHBOR_OFFSETS = np.array([(1, -1), (1, 0), (1, 1), (0, 1)], dtype=np.int64)
+_KEY_BITS = 31
+_KEY_MASK = np.int64((1 << _KEY_BITS) - 1)
+
+
+class DBSCANClusterer:
+    """The original per-frame StandardScaler + DBSCAN, kept for comparison"""
+
+    name = "dbscan"
+
+    def __init__(self, eps=0.3, min_samples=10):
+        self.eps = eps
+        self.min_samples = min_samples
+
+    def fit(self, points):
+        """Return one label per point, -1 for noise"""
+        if len(points) == 0:
+            return np.empty(0, dtype=np.int64)
+        X_scaled = StandardScaler().fit_transform(points)
+        return DBSCAN(eps=self.eps, min_samples=self.min_samples).fit(X_scaled).labels_
+
+
+class GridClusterer:
+    """
+    Fixed-metric clustering: points are hashed into square cells of cell_size and
+    8-connected occupied cells form a cluster. Clusters with fewer than min_samples
+    points are labeled noise (-1).
+
+    Cells are anchored to a fixed world grid, so when the occupied cells are the
+    same as the previous frame the connected components are reused as-is.
+    """
+
+    name = "grid"
+
+    def __init__(self, cell_size=1.0, min_samples=10):
+        self.cell_size = cell_size
+        self.min_samples = min_samples
+        self._prev_occupancy = None
+        self._prev_origin = None
+        self._prev_components = None
+        self.reused_frames = 0
+
+    def fit(self, points):
+        """Return one label per point, -1 for noise"""
+        if len(points) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        cells = np.floor(np.asarray(points)[:, :2] / self.cell_size).astype(np.int64)
+        origin = cells.min(axis=0)
+        cells -= origin
+        shape = cells.max(axis=0) + 1
+
+        if shape[0] * shape[1] <= MAX_DENSE_CELLS:
+            point_components = self._dense_components(cells, origin, shape)
+        else:
+            point_components = self._sparse_components(cells)
+
+        # Drop components that are too small to be an obstacle, then relabel 0..k-1
+        sizes = np.bincount(point_components)
+        keep = sizes >= self.min_samples
+        relabel = np.full(len(sizes), -1, dtype=np.int64)
+        relabel[keep] = np.arange(np.count_nonzero(keep))
+        return relabel[point_components]
+
+    def _dense_components(self, cells, origin, shape):
+        flat = cells[:, 0] * shape[1] + cells[:, 1]
+        occupancy = (np.bincount(flat, minlength=shape[0] * shape[1]) > 0).reshape(shape)
+
+        if (
+            self._prev_occupancy is not None
+            and np.array_equal(origin, self._prev_origin)
+            and np.array_equal(occupancy, self._prev_occupancy)
+        ):
+            components = self._prev_components
+            self.reused_frames += 1
+        else:
+            components, _ = ndimage.label(occupancy, structure=np.ones((3, 3), dtype=bool))
+            self._prev_occupancy, self._prev_origin, self._prev_components = occupancy, origin, components
+
+        # ndimage labels start at 1; occupied cells never get 0
+        return components.reshape(-1)[flat] - 1
+
+    def _sparse_components(self, cells):
+        # Very wide scans: build the cell adjacency graph over occupied cells only
+        self._prev_occupancy = None
+        keys = (cells[:, 0] << _KEY_BITS) | cells[:, 1]
+        unique_keys, point_cells = np.unique(keys, return_inverse=True)
+        cell_x, cell_y = unique_keys >> _KEY_BITS, unique_keys & _KEY_MASK
+
+        rows, cols = [], []
+        for dx, dy in _NEIGHBOR_OFFSETS:
+            neighbor_y = cell_y + dy
+            valid = neighbor_y >= 0
+            neighbor_keys = ((cell_x + dx) << _KEY_BITS) | np.where(valid, neighbor_y, 0)
+            idx = np.searchsorted(unique_keys, neighbor_keys)
+            idx = np.minimum(idx, len(unique_keys) - 1)
+            hit = valid & (unique_keys[idx] == neighbor_keys)
+            rows.append(np.flatnonzero(hit))
+            cols.append(idx[hit])
+
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        n_cells = len(unique_keys)
+        graph = coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n_cells, n_cells))
+        _, cell_components = connected_components(graph, directed=False)
+        return cell_components[point_cells.reshape(-1)]
+
+
+CLUSTERERS = {
+    GridClusterer.name: GridClusterer,
+    DBSCANClusterer.name: DBSCANClusterer,
+}
+
+
+def make_clusterer(name, **kwargs):
+    """Build a clustering backend by name ("grid" or "dbscan")"""
+    try:
+        return CLUSTERERS[name](**kwargs)
+    except KeyError:
+        raise ValueError(f"Unknown clustering backend: {name}")
@@ -5,6 +5,18 @@ LIDAR_SERVICE_URL = "http://10.49.33.224:5000"
 CAMERA_SERVICE_URL = "http://10.49.33.224:6000"
 MAPPING_SERVICE_URL = "http://127.0.0.1:8000"
 
+# Device service HTTP client (one pooled client shared by every proxy endpoint)
+LIDAR_SERVICE_TIMEOUT = 3.0  # Seconds per request to the LiDAR Pi
+CAMERA_SERVICE_TIMEOUT = 3.0  # Seconds per request to the camera Pi
+MAPPING_SERVICE_TIMEOUT = 3.0  # Seconds per request to the mapping service
+SERVICE_CONNECT_TIMEOUT = 1.0  # Seconds to open a connection; an unreachable Pi fails this fast
+SERVICE_RETRIES = 2  # Extra attempts after a connection failure (and timeouts/5xx on GET/DELETE)
+SERVICE_BREAKER_THRESHOLD = 3  # Consecutive failures before calls to a service fail immediately
+SERVICE_BREAKER_RESET = 10.0  # Seconds the breaker stays open before a trial request
+SERVICE_MAX_CONNECTIONS = 20  # Pool size across all services
+SERVICE_MAX_KEEPALIVE = 10  # Idle connections kept open for reuse
+STATUS_POLL_INTERVAL = 2.0  # Seconds between background status checks of each device (served at /status)
+
 # Directories for storing mapping data
 MAPPING_DIR = Path("mapping_images")
 MAPPING_METADATA_DIR = Path("mapping_metadata")
@@ -16,4 +28,94 @@ PICAMVID_DIR = Path("picam_videos")
 CORS_ORIGINS = ["*"]  # In development, allow all origins
 CORS_CREDENTIALS = True
 CORS_METHODS = ["*"]
-CORS_HEADERS = ["*"] 
\ No newline at end of file
+CORS_HEADERS = ["*"]
+
+# WebSocket fan-out settings
+WS_CLIENT_QUEUE_SIZE = 32  # Messages buffered per client before the overflow policy kicks in
+WS_OVERFLOW_POLICY = "drop_oldest"  # "drop_oldest" or "latest_only"
+
+# LiDAR broadcast level of detail
+LIDAR_DOWNSAMPLE_METHOD = "angular"  # "angular" (nearest point per sector) or "voxel" (grid centroids)
+
+# Delta/keyframe codec for /ws/lidar?codec=delta
+LIDAR_STREAM_QUANTUM = 0.001  # Point and box quantization step, in scan units
+LIDAR_STREAM_KEYFRAME_INTERVAL = 30  # Delta frames between keyframes
+
+# Run ObstacleDetector on ingested scans in a worker process
+LIDAR_SERVER_DETECTION = True
+
+# Obstacle clustering backend: "grid" (fixed-metric spatial hash) or "dbscan"
+OBSTACLE_CLUSTERER = "grid"
+OBSTACLE_GRID_CELL_SIZE = 1.0  # Cell edge length in scan units; touching cells join one cluster
+OBSTACLE_MIN_SAMPLES = 10  # Smallest point count that still counts as an obstacle
+
+# Obstacle tracker (constant-velocity Kalman filter over a fixed-size track store)
+OBSTACLE_TRACK_CAPACITY = 256  # Maximum simultaneous tracks; births beyond this are dropped
+OBSTACLE_TRACK_GATE = 2.0  # Largest center jump, in scan units, that still matches a track
+OBSTACLE_TRACK_MIN_HITS = 3  # Matches needed before a track is reported
+OBSTACLE_TRACK_MAX_MISSES = 5  # Consecutive missed frames before a track is dropped
+OBSTACLE_APPROACH_SPEED = 0.2  # Radial speed (scan units/s) that counts as moving towards the LiDAR
+
+# Adaptive detection stream delivery: (scale, JPEG quality) per level, 0 is the original frame
+DETECTION_QUALITY_LEVELS = [(1.0, None), (0.75, 75), (0.5, 65), (0.35, 50)]
+DETECTION_REENCODE_WORKERS = 2  # Threads used for OpenCV downscale/re-encode
+DETECTION_ADAPT_INTERVAL = 1.0  # Seconds between quality decisions for a viewer
+
+# Detection stream recording (segmented files + timestamp index, replayed over /ws/detection/replay)
+DETECTION_RECORDING_ENABLED = False  # Off by default: each segment preallocates DETECTION_SEGMENT_BYTES on disk
+DETECTION_RECORDING_DIR = Path("detection_recordings")
+DETECTION_SEGMENT_BYTES = 256 * 1024 * 1024  # Preallocated size of each segment file
+DETECTION_SEGMENT_SECONDS = 300  # Start a new segment after this many seconds (server clock)
+DETECTION_FSYNC_INTERVAL = 1.0  # Seconds between fsyncs of the open segment
+DETECTION_RECORDING_MAX_BYTES = 10 * 1024 * 1024 * 1024  # Oldest segments are deleted past this total
+
+# Resumable picam uploads (keep on the same filesystem as the picam directories for atomic renames)
+PICAM_UPLOAD_DIR = Path("picam_uploads")
+PICAM_UPLOAD_BUFFER_BYTES = 1024 * 1024  # Request body bytes buffered per disk write
+PICAM_UPLOAD_MAX_BYTES = 8 * 1024 * 1024 * 1024  # Largest accepted upload
+PICAM_UPLOAD_EXPIRY = 24 * 60 * 60  # Seconds before an abandoned upload is removed
+
+# Media file serving
+MEDIA_CHUNK_BYTES = 256 * 1024  # Read size when streaming files and byte ranges
+
+# Thumbnails for picam and mapping galleries
+THUMBNAIL_DIR = Path("thumbnails")
+THUMBNAIL_SIZES = [160, 480]  # Longest edge in pixels of each generated size
+THUMBNAIL_QUALITY = 80  # JPEG quality of generated thumbnails
+THUMBNAIL_WORKERS = 2  # Worker processes decoding and resizing uploads
+THUMBNAIL_CACHE_MAX_BYTES = 512 * 1024 * 1024  # Least recently used thumbnails are evicted past this
+
+# Mapping image metadata store (SQLite); replaces the per-image JSON files in MAPPING_METADATA_DIR
+MAPPING_DB_PATH = Path("mapping.db")
+
+# XYZ tile pyramid built from mapping uploads (served at /tiles/{z}/{x}/{y})
+MAPPING_TILE_DIR = Path("mapping_tiles")
+MAPPING_TILE_MIN_ZOOM = 12  # Lowest zoom level kept up to date
+MAPPING_TILE_MAX_ZOOM = 20  # Images are projected at this zoom (~0.1 m/px) and downsampled for the rest
+MAPPING_CAMERA_HFOV = 62.2  # Horizontal field of view of the nadir mapping camera, in degrees
+MAPPING_TILE_MAX_AGE = 60  # Seconds browsers may cache a tile before revalidating
+
+# Mapping upload writes (decode + disk I/O off the event loop)
+MAPPING_WRITE_WORKERS = 4  # Threads decoding and writing uploaded images
+MAPPING_WRITE_MAX_PENDING = 32  # Image writes accepted at once before uploads have to wait
+MAPPING_WRITE_WAIT_TIMEOUT = 5.0  # Seconds an upload waits for a write slot before a 503
+MAPPING_BATCH_MAX_IMAGES = 200  # Images accepted in one /mapping/upload/batch request
+MAPPING_BATCH_MAX_IN_FLIGHT = 4  # Write slots one batch may hold at once, so it cannot starve other uploads
+
+# Warning system telemetry (one shared producer; real samples via POST /warning-system/telemetry)
+TELEMETRY_INTERVAL = 0.1  # Seconds between synthetic samples while no real data is arriving
+TELEMETRY_STALE_AFTER = 1.0  # Seconds without an ingested sample before the synthetic feed resumes
+TELEMETRY_MAX_RATE = None  # Default per-client cap in samples/s (None sends every sample)
+TELEMETRY_RATE_STEPS = [1, 2, 5, 10, 20, 30, 60]  # Rates a client max_rate is rounded down to (samples/s)
+
+# Warning system alert rules, evaluated server-side on every telemetry sample
+# kind: "threshold" (value) or "rate" (degrees/s); above/below: trigger level; clear: level the
+# metric must return past before the alert clears (hysteresis); sustain: seconds the trigger must hold
+ALERT_RULES = [
+    {"name": "pitch_limit", "field": "pitch", "kind": "threshold", "abs": True, "above": 60, "clear": 55, "sustain": 0.5, "severity": "warning"},
+    {"name": "roll_limit", "field": "roll", "kind": "threshold", "abs": True, "above": 45, "clear": 40, "sustain": 0.5, "severity": "warning"},
+    {"name": "pitch_rate", "field": "pitch", "kind": "rate", "abs": True, "above": 35, "clear": 30, "severity": "critical"},
+    {"name": "roll_rate", "field": "roll", "kind": "rate", "abs": True, "above": 15, "clear": 12, "severity": "critical"},
+]
+ALERT_BUFFER_SAMPLES = 600  # Telemetry samples kept for rule evaluation (60 s at 10 Hz)
+ALERT_RATE_WINDOW = 0.5  # Seconds of history a rate of change is measured over
@@ -0,0 +1,85 @@
+import base64
+import json
+import struct
+
+# Binary detection frame, used both from the Pi and towards binary frontend clients:
+#   header   seq(I) capture_timestamp(d) size(I)     little-endian, 16 bytes
+#   payload  raw JPEG bytes, exactly `size` long
+FRAME_HEADER = struct.Struct("<IdI")
+
+
+class DetectionFrameError(ValueError):
+    """Raised when a binary detection frame is malformed"""
+
+
+def pack_frame(seq: int, capture_timestamp: float, jpeg: bytes) -> bytes:
+    return FRAME_HEADER.pack(seq & 0xFFFFFFFF, capture_timestamp, len(jpeg)) + jpeg
+
+
+def parse_header(message: bytes):
+    """Validate a binary frame and return (seq, capture_timestamp, size) without copying the JPEG"""
+    if len(message) < FRAME_HEADER.size:
+        raise DetectionFrameError("frame is shorter than its header")
+    seq, capture_timestamp, size = FRAME_HEADER.unpack_from(message)
+    if len(message) - FRAME_HEADER.size != size:
+        raise DetectionFrameError(f"header says {size} bytes, got {len(message) - FRAME_HEADER.size}")
+    return seq, capture_timestamp, size
+
+
+def jpeg_payload(message: bytes) -> memoryview:
+    return memoryview(message)[FRAME_HEADER.size:]
+
+
+def frame_to_json(seq: int, capture_timestamp: float, frame_b64: str) -> dict:
+    """Compatibility message for frontends that still expect base64-in-JSON"""
+    return {
+        "type": "detection_frame",
+        "data": {
+            "timestamp": int(capture_timestamp),
+            "seq": seq,
+            "frame": frame_b64
+        }
+    }
+
+
+class DetectionFrame:
+    """
+    One camera frame shared by every viewer. Each wire format (packed binary,
+    base64 JSON) and each reduced-quality variant is built at most once per frame.
+    """
+
+    def __init__(self, seq: int, capture_timestamp: float, jpeg=None, packed: bytes = None, b64: str = None):
+        self.seq = seq
+        self.capture_timestamp = capture_timestamp
+        self._jpeg = jpeg
+        self._packed = packed
+        self._b64 = b64
+        self._json_text = None
+        # Quality level -> future of a reduced DetectionFrame, filled in by the delivery layer
+        self.variants = {}
+
+    @classmethod
+    def from_binary(cls, message: bytes) -> "DetectionFrame":
+        seq, capture_timestamp, _ = parse_header(message)
+        return cls(seq, capture_timestamp, jpeg_payload(message), packed=message)
+
+    @classmethod
+    def from_base64(cls, seq: int, capture_timestamp: float, b64: str) -> "DetectionFrame":
+        return cls(seq, capture_timestamp, b64=b64)
+
+    @property
+    def jpeg(self):
+        if self._jpeg is None:
+            self._jpeg = base64.b64decode(self._b64)
+        return self._jpeg
+
+    def binary(self) -> bytes:
+        if self._packed is None:
+            self._packed = pack_frame(self.seq, self.capture_timestamp, bytes(self.jpeg))
+        return self._packed
+
+    def json_text(self) -> str:
+        if self._json_text is None:
+            frame_b64 = self._b64 if self._b64 is not None else base64.b64encode(self.jpeg).decode("ascii")
+            self._json_text = json.dumps(frame_to_json(self.seq, self.capture_timestamp, frame_b64))
+        return self._json_text
@@ -0,0 +1,144 @@
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+import numpy as np
+
+from obstacle_detection import ObstacleDetector
+
+logger = logging.getLogger(__name__)
+
+# The detector lives in the worker process so its tracking state persists between frames
+_detector: Optional[ObstacleDetector] = None
+
+
+def _init_worker():
+    global _detector
+    _detector = ObstacleDetector(simulation=False)
+
+
+def _warm_up():
+    """Runs once at startup so the worker spawns and imports sklearn before the first scan"""
+    return True
+
+
+def _detect(points):
+    start = time.perf_counter()
+    result = _detector.process_frame(points)
+    # The raw scan is already broadcast on ingest, so only clusters come back
+    result.pop("points", None)
+    result["processing_ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+
+class DetectionPipeline:
+    """
+    Runs ObstacleDetector on ingested scans in a dedicated worker process.
+    Handoff is latest-frame-wins: while a frame is being processed, newer scans
+    overwrite a single pending slot, so slow frames cause skips instead of a backlog.
+    """
+
+    def __init__(self, publish: Callable[[dict], None]):
+        self.publish = publish
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending = None
+        self._ready = asyncio.Event()
+        self._frame_ids = itertools.count(1)
+        self.frames_submitted = 0
+        self.frames_processed = 0
+        self.frames_skipped = 0
+        self.last_processing_ms = None
+        self.last_latency_ms = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._executor = self._new_executor()
+        self._executor.submit(_warm_up)
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Started obstacle detection worker")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn keeps the worker clear of the server's threads and signal handlers
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    def submit(self, points) -> bool:
+        """Hand a scan to the worker. Returns False if the pipeline is not running."""
+        if not self.running:
+            return False
+        if self._pending is not None:
+            self.frames_skipped += 1
+        points = np.asarray(points, dtype=np.float32)
+        self._pending = (next(self._frame_ids), points, time.perf_counter())
+        self.frames_submitted += 1
+        self._ready.set()
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            frame = self._pending
+            self._pending = None
+            if frame is None:
+                continue
+
+            frame_id, points, received_at = frame
+            try:
+                result = await loop.run_in_executor(self._executor, _detect, points)
+            except BrokenProcessPool:
+                logger.error("Obstacle detection worker died, restarting it")
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+                continue
+            except Exception as e:
+                logger.error(f"Error running obstacle detection: {str(e)}")
+                continue
+
+            self.frames_processed += 1
+            self.last_processing_ms = result["processing_ms"]
+            self.last_latency_ms = (time.perf_counter() - received_at) * 1000
+            result["frame_id"] = frame_id
+            result["latency_ms"] = self.last_latency_ms
+            try:
+                self.publish(result)
+            except Exception as e:
+                logger.error(f"Error publishing detection result: {str(e)}")
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "frames_submitted": self.frames_submitted,
+            "frames_processed": self.frames_processed,
+            "frames_skipped": self.frames_skipped,
+            "last_processing_ms": self.last_processing_ms,
+            "last_latency_ms": self.last_latency_ms,
+        }
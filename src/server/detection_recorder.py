@@ -0,0 +1,330 @@
+import logging
+import mmap
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from detection_frames import DetectionFrame
+
+logger = logging.getLogger(__name__)
+
+# Each segment is a pair of files:
+#   <name>.dat   packed detection frames (16-byte header + JPEG) back to back
+#   <name>.idx   one INDEX_DTYPE record per frame: capture timestamp, offset and length in .dat
+# The .dat file is preallocated up front and trimmed to its used size when the segment closes.
+INDEX_DTYPE = np.dtype([("timestamp", "<f8"), ("offset", "<u8"), ("length", "<u4")])
+DATA_SUFFIX = ".dat"
+INDEX_SUFFIX = ".idx"
+
+
+def _preallocate(fd: int, size: int):
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except (AttributeError, OSError):
+        # Not every filesystem/platform supports fallocate; a sparse file still avoids resizes
+        os.ftruncate(fd, size)
+
+
+def _open_new(path: Path, flags: int) -> int:
+    return os.open(path, flags | os.O_CREAT | os.O_EXCL, 0o644)
+
+
+class _Segment:
+    """
+    The segment currently being written. Names come from the server's clock in
+    milliseconds (never the sender's timestamps) and files are created with O_EXCL,
+    so an existing recording is never truncated; on a name clash the next
+    millisecond is tried.
+    """
+
+    def __init__(self, directory: Path, name_ms: int, size: int):
+        while True:
+            self.name = f"segment_{name_ms:013d}"
+            self.data_path = directory / f"{self.name}{DATA_SUFFIX}"
+            self.index_path = directory / f"{self.name}{INDEX_SUFFIX}"
+            try:
+                self.data_fd = _open_new(self.data_path, os.O_RDWR)
+            except FileExistsError:
+                name_ms += 1
+                continue
+            try:
+                self.index_fd = _open_new(self.index_path, os.O_WRONLY | os.O_APPEND)
+            except FileExistsError:
+                # Stray index without its data file; leave it alone and move on
+                os.close(self.data_fd)
+                self.data_path.unlink()
+                name_ms += 1
+                continue
+            break
+        self.name_ms = name_ms
+        self.size = size
+        self.opened_at = time.monotonic()
+        self.last_timestamp: Optional[float] = None
+        self.used = 0
+        self.frames = 0
+        _preallocate(self.data_fd, size)
+
+    def fits(self, length: int) -> bool:
+        return self.used + length <= self.size
+
+    def append(self, timestamp: float, packed: bytes):
+        os.pwrite(self.data_fd, packed, self.used)
+        record = np.array([(timestamp, self.used, len(packed))], dtype=INDEX_DTYPE)
+        # The index entry goes after the data so a reader never sees an offset without bytes
+        os.write(self.index_fd, record.tobytes())
+        self.last_timestamp = timestamp
+        self.used += len(packed)
+        self.frames += 1
+
+    def sync(self):
+        os.fdatasync(self.data_fd)
+        os.fdatasync(self.index_fd)
+
+    def close(self):
+        os.ftruncate(self.data_fd, self.used)
+        self.sync()
+        os.close(self.data_fd)
+        os.close(self.index_fd)
+
+
+class DetectionRecorder:
+    """
+    Appends detection frames to segmented files from a background thread.
+
+    record() only puts the frame on a bounded queue, so the live relay never waits
+    on disk. If the disk falls behind and the queue fills, frames are dropped from
+    the recording (and counted) rather than slowing the relay down.
+    """
+
+    def __init__(self, directory: Path, segment_bytes: int, segment_seconds: float,
+                 fsync_interval: float, max_bytes: int, queue_size: int = 256):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self._queue: "queue.Queue[Optional[DetectionFrame]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._segment: Optional[_Segment] = None
+        self.frames_recorded = 0
+        self.frames_dropped = 0
+        self.bytes_recorded = 0
+
+    @property
+    def recording(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.recording:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="detection-recorder", daemon=True)
+        self._thread.start()
+        logger.info(f"Recording detection frames to {self.directory}")
+
+    def stop(self):
+        if not self.recording:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def record(self, frame: DetectionFrame) -> bool:
+        if not self.recording:
+            return False
+        try:
+            self._queue.put_nowait(frame)
+            return True
+        except queue.Full:
+            self.frames_dropped += 1
+            return False
+
+    def _run(self):
+        last_sync = time.monotonic()
+        while True:
+            try:
+                frame = self._queue.get(timeout=self.fsync_interval)
+            except queue.Empty:
+                frame = False
+            if frame is None:
+                break
+
+            try:
+                if frame is not False:
+                    self._write(frame)
+                if self._segment and time.monotonic() - last_sync >= self.fsync_interval:
+                    self._segment.sync()
+                    last_sync = time.monotonic()
+            except OSError as e:
+                logger.error(f"Error writing detection recording: {str(e)}")
+
+        self._close_segment()
+
+    def _write(self, frame: DetectionFrame):
+        packed = frame.binary()
+        timestamp = frame.capture_timestamp
+        segment = self._segment
+        if segment is None or not segment.fits(len(packed)) or (
+            time.monotonic() - segment.opened_at >= self.segment_seconds
+        ) or (
+            # Sender clock went backwards: start a new segment so each index stays sorted for seeks
+            segment.last_timestamp is not None and timestamp < segment.last_timestamp
+        ):
+            name_ms = int(time.time() * 1000)
+            if segment is not None:
+                # Keep names increasing even if the server clock steps back
+                name_ms = max(name_ms, segment.name_ms + 1)
+            self._close_segment()
+            segment = self._segment = _Segment(self.directory, name_ms, max(self.segment_bytes, len(packed)))
+            self._enforce_retention()
+        segment.append(timestamp, packed)
+        self.frames_recorded += 1
+        self.bytes_recorded += len(packed)
+
+    def _close_segment(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+    def _enforce_retention(self):
+        segments = list_segments(self.directory)
+        total = sum(s.data_path.stat().st_size for s in segments)
+        for segment in segments:
+            if total <= self.max_bytes or (self._segment and segment.name == self._segment.name):
+                break
+            total -= segment.data_path.stat().st_size
+            segment.data_path.unlink(missing_ok=True)
+            segment.index_path.unlink(missing_ok=True)
+            logger.info(f"Removed old detection recording {segment.name}")
+
+    def stats(self) -> dict:
+        return {
+            "recording": self.recording,
+            "frames_recorded": self.frames_recorded,
+            "frames_dropped": self.frames_dropped,
+            "bytes_recorded": self.bytes_recorded,
+            "queue_depth": self._queue.qsize(),
+            "segment": self._segment.name if self._segment else None,
+        }
+
+
+class RecordedSegment:
+    """Read-only view of a segment; data and index are memory-mapped"""
+
+    def __init__(self, data_path: Path, index_path: Path):
+        self.name = data_path.stem
+        self.data_path = data_path
+        self.index_path = index_path
+        self._data: Optional[mmap.mmap] = None
+        self._data_file = None
+
+    def index(self) -> np.ndarray:
+        # Re-read each time so a segment that is still being written shows new frames
+        n_records = self.index_path.stat().st_size // INDEX_DTYPE.itemsize
+        if n_records == 0:
+            return np.empty(0, dtype=INDEX_DTYPE)
+        return np.memmap(self.index_path, dtype=INDEX_DTYPE, mode="r", shape=(n_records,))
+
+    def _mapped(self) -> mmap.mmap:
+        if self._data is None:
+            self._data_file = open(self.data_path, "rb")
+            self._data = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._data
+
+    def read(self, offset: int, length: int) -> bytes:
+        data = self._mapped()
+        if offset + length > len(data):
+            # The live segment was trimmed or grew since it was mapped; map it again
+            self.close()
+            data = self._mapped()
+        return data[offset:offset + length]
+
+    def summary(self) -> dict:
+        index = self.index()
+        return {
+            "name": self.name,
+            "frames": int(len(index)),
+            "start": float(index["timestamp"][0]) if len(index) else None,
+            "end": float(index["timestamp"][-1]) if len(index) else None,
+            "bytes": int(index["offset"][-1] + index["length"][-1]) if len(index) else 0,
+        }
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._data_file.close()
+            self._data = None
+            self._data_file = None
+
+
+def list_segments(directory: Path) -> List[RecordedSegment]:
+    """All segments in recording order (names sort by the server time they were opened)"""
+    directory = Path(directory)
+    if not directory.exists():
+        return []
+    return [
+        RecordedSegment(path, path.with_suffix(INDEX_SUFFIX))
+        for path in sorted(directory.glob(f"segment_*{DATA_SUFFIX}"))
+        if path.with_suffix(INDEX_SUFFIX).exists()
+    ]
+
+
+class ReplayCursor:
+    """
+    Walks recorded frames in time order across segments, starting at any timestamp.
+    seek() jumps with a binary search over the memory-mapped indexes.
+    """
+
+    def __init__(self, directory: Path, start: Optional[float] = None, end: Optional[float] = None):
+        self.directory = Path(directory)
+        self.end = end
+        self._segments: List[RecordedSegment] = []
+        self._segment_pos = 0
+        self._frame_pos = 0
+        self._index = None
+        self.seek(start)
+
+    def seek(self, timestamp: Optional[float]):
+        self.close()
+        self._segments = list_segments(self.directory)
+        self._segment_pos, self._frame_pos, self._index = len(self._segments), 0, None
+        for pos, segment in enumerate(self._segments):
+            index = segment.index()
+            if len(index) == 0:
+                continue
+            if timestamp is None or index["timestamp"][-1] >= timestamp:
+                self._segment_pos = pos
+                self._index = index
+                self._frame_pos = 0 if timestamp is None else int(
+                    np.searchsorted(index["timestamp"], timestamp, side="left")
+                )
+                return
+
+    def next(self):
+        """Return (timestamp, packed frame bytes) or None at the end of the range"""
+        while self._segment_pos < len(self._segments):
+            segment = self._segments[self._segment_pos]
+            if self._index is None or self._frame_pos >= len(self._index):
+                # Pick up frames appended to a live segment before moving on
+                self._index = segment.index()
+            if self._frame_pos < len(self._index):
+                record = self._index[self._frame_pos]
+                timestamp = float(record["timestamp"])
+                if self.end is not None and timestamp > self.end:
+                    return None
+                self._frame_pos += 1
+                return timestamp, segment.read(int(record["offset"]), int(record["length"]))
+            segment.close()
+            self._segment_pos += 1
+            self._frame_pos = 0
+            self._index = None
+        return None
+
+    def close(self):
+        for segment in self._segments:
+            segment.close()
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from config import DETECTION_QUALITY_LEVELS, DETECTION_REENCODE_WORKERS, DETECTION_ADAPT_INTERVAL
+from detection_frames import DetectionFrame
+
+logger = logging.getLogger(__name__)
+
+# OpenCV releases the GIL while decoding/encoding, so a small thread pool keeps
+# re-encoding off the event loop without a process hop for every frame
+_reencode_pool = ThreadPoolExecutor(max_workers=DETECTION_REENCODE_WORKERS, thread_name_prefix="reencode")
+
+# A viewer steps down when it drops this share of frames or is busy sending this
+# share of the ingest interval, and steps back up after consecutive healthy windows
+DEGRADE_DROP_FRACTION = 0.2
+DEGRADE_BUSY_RATIO = 0.9
+UPGRADE_BUSY_RATIO = 0.4
+UPGRADE_WINDOWS = 3
+
+
+def reencode_jpeg(jpeg: bytes, scale: float, quality: int) -> bytes:
+    image = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("frame is not a decodable JPEG")
+    if scale < 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("JPEG encode failed")
+    return encoded.tobytes()
+
+
+class IngestRate:
+    """Smoothed interval between frames arriving from the Pi"""
+
+    def __init__(self, alpha=0.1):
+        self.alpha = alpha
+        self.interval = None
+        self._last = None
+
+    def tick(self):
+        now = time.perf_counter()
+        if self._last is not None:
+            elapsed = now - self._last
+            self.interval = elapsed if self.interval is None else self.interval + self.alpha * (elapsed - self.interval)
+        self._last = now
+
+
+ingest_rate = IngestRate()
+
+
+async def _build_variant(frame: DetectionFrame, level: int) -> DetectionFrame:
+    scale, quality = DETECTION_QUALITY_LEVELS[level]
+    loop = asyncio.get_running_loop()
+    jpeg = await loop.run_in_executor(_reencode_pool, reencode_jpeg, bytes(frame.jpeg), scale, quality)
+    return DetectionFrame(frame.seq, frame.capture_timestamp, jpeg)
+
+
+def frame_variant(frame: DetectionFrame, level: int):
+    """Reduced-quality copy of a frame, shared by every viewer at the same level"""
+    future = frame.variants.get(level)
+    if future is None:
+        future = asyncio.ensure_future(_build_variant(frame, level))
+        frame.variants[level] = future
+    return future
+
+
+class AdaptiveDelivery:
+    """
+    Per-viewer encoder for /ws/detection_stream, run by the client's writer task.
+
+    The viewer holds a single latest-frame slot, so a slow viewer already gets a
+    lower frame rate. On top of that, the drop rate and send time are checked
+    every DETECTION_ADAPT_INTERVAL seconds and the viewer moves between the
+    quality levels in DETECTION_QUALITY_LEVELS. Fast viewers stay at level 0 and
+    receive the original bytes.
+    """
+
+    def __init__(self, client, binary: bool):
+        self.client = client
+        self.binary = binary
+        self.level = 0
+        self.reencode_errors = 0
+        self._healthy_windows = 0
+        self._window_start = time.perf_counter()
+        self._window_sent = client.sent
+        self._window_dropped = client.dropped
+
+    def _adapt(self):
+        now = time.perf_counter()
+        if now - self._window_start < DETECTION_ADAPT_INTERVAL:
+            return
+        sent = self.client.sent - self._window_sent
+        dropped = self.client.dropped - self._window_dropped
+        self._window_start, self._window_sent, self._window_dropped = now, self.client.sent, self.client.dropped
+
+        drop_fraction = dropped / max(sent + dropped, 1)
+        busy = self.client.send_time_ewma / ingest_rate.interval if ingest_rate.interval else 0.0
+
+        if drop_fraction > DEGRADE_DROP_FRACTION or busy > DEGRADE_BUSY_RATIO:
+            self._healthy_windows = 0
+            if self.level < len(DETECTION_QUALITY_LEVELS) - 1:
+                self.level += 1
+                logger.info(f"Detection viewer {self.client.id} falling behind, quality level {self.level}")
+        elif dropped == 0 and busy < UPGRADE_BUSY_RATIO:
+            self._healthy_windows += 1
+            if self.level > 0 and self._healthy_windows >= UPGRADE_WINDOWS:
+                self.level -= 1
+                self._healthy_windows = 0
+                logger.info(f"Detection viewer {self.client.id} keeping up, quality level {self.level}")
+
+    async def __call__(self, frame: DetectionFrame):
+        self._adapt()
+        if self.level > 0:
+            try:
+                frame = await frame_variant(frame, self.level)
+            except Exception as e:
+                # Fall back to the original frame rather than dropping the viewer
+                self.reencode_errors += 1
+                logger.warning(f"Could not re-encode detection frame: {str(e)}")
+        return frame.binary() if self.binary else frame.json_text()
+
+    def stats(self) -> dict:
+        return {
+            "quality_level": self.level,
+            "scale": DETECTION_QUALITY_LEVELS[self.level][0],
+            "reencode_errors": self.reencode_errors,
+        }
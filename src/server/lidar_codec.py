@@ -0,0 +1,297 @@
+import struct
+import zlib
+import numpy as np
+
+# Content types accepted by /lidar-data for the packed binary scan format
+LIDAR_SCAN_CONTENT_TYPES = {"application/x-lidar-scan", "application/octet-stream"}
+
+# Packed scan layout (all little-endian):
+#   header   magic(4s) version(B) dims(B) flags(H) n_points(I) n_boxes(I)
+#   points   float32[n_points, dims]
+#   labels   int32[n_points]            (only if FLAG_LABELS is set)
+#   boxes    float32[n_boxes, 6]        label, center_x, center_y, width, height, theta
+SCAN_MAGIC = b"LDR1"
+SCAN_VERSION = 1
+SCAN_HEADER = struct.Struct("<4sBBHII")
+FLAG_LABELS = 0x1
+BOX_FIELDS = 6
+
+POINT_DTYPE = np.dtype("<f4")
+LABEL_DTYPE = np.dtype("<i4")
+
+
+class LidarScanError(ValueError):
+    """Raised when a packed scan body is malformed"""
+
+
+class LidarScan:
+    def __init__(self, points, labels=None, boxes=None):
+        self.points = points
+        self.labels = labels
+        self.boxes = boxes if boxes is not None else np.empty((0, BOX_FIELDS), dtype=POINT_DTYPE)
+
+
+def encode_scan(points, labels=None, boxes=None) -> bytes:
+    """Pack a scan into the binary ingest format (used by clients and benchmarks)"""
+    points = np.ascontiguousarray(points, dtype=POINT_DTYPE)
+    if points.ndim != 2 or points.shape[1] not in (2, 3):
+        raise LidarScanError("points must have shape (n, 2) or (n, 3)")
+    boxes = np.ascontiguousarray(
+        boxes if boxes is not None else np.empty((0, BOX_FIELDS)), dtype=POINT_DTYPE
+    ).reshape(-1, BOX_FIELDS)
+
+    flags = 0
+    parts = []
+    if labels is not None:
+        flags |= FLAG_LABELS
+        labels = np.ascontiguousarray(labels, dtype=LABEL_DTYPE)
+        if labels.shape != (points.shape[0],):
+            raise LidarScanError("labels must have one entry per point")
+
+    header = SCAN_HEADER.pack(
+        SCAN_MAGIC, SCAN_VERSION, points.shape[1], flags, points.shape[0], boxes.shape[0]
+    )
+    parts.append(header)
+    parts.append(points.tobytes())
+    if labels is not None:
+        parts.append(labels.tobytes())
+    parts.append(boxes.tobytes())
+    return b"".join(parts)
+
+
+def decode_scan(body: bytes) -> LidarScan:
+    """
+    Decode a packed scan without creating per-point Python objects.
+    The returned arrays are read-only views over the request body.
+    """
+    if len(body) < SCAN_HEADER.size:
+        raise LidarScanError("body is shorter than the scan header")
+
+    magic, version, dims, flags, n_points, n_boxes = SCAN_HEADER.unpack_from(body)
+    if magic != SCAN_MAGIC:
+        raise LidarScanError("bad scan magic")
+    if version != SCAN_VERSION:
+        raise LidarScanError(f"unsupported scan version {version}")
+    if dims not in (2, 3):
+        raise LidarScanError(f"unsupported point dimension {dims}")
+
+    has_labels = bool(flags & FLAG_LABELS)
+    expected = (
+        SCAN_HEADER.size
+        + n_points * dims * POINT_DTYPE.itemsize
+        + (n_points * LABEL_DTYPE.itemsize if has_labels else 0)
+        + n_boxes * BOX_FIELDS * POINT_DTYPE.itemsize
+    )
+    if len(body) != expected:
+        raise LidarScanError(f"expected {expected} bytes, got {len(body)}")
+
+    offset = SCAN_HEADER.size
+    points = np.frombuffer(body, dtype=POINT_DTYPE, count=n_points * dims, offset=offset)
+    points = points.reshape(n_points, dims)
+    offset += points.nbytes
+
+    labels = None
+    if has_labels:
+        labels = np.frombuffer(body, dtype=LABEL_DTYPE, count=n_points, offset=offset)
+        offset += labels.nbytes
+
+    boxes = np.frombuffer(body, dtype=POINT_DTYPE, count=n_boxes * BOX_FIELDS, offset=offset)
+    boxes = boxes.reshape(n_boxes, BOX_FIELDS)
+
+    return LidarScan(points, labels, boxes)
+
+
+def boxes_to_clusters(points, labels, boxes):
+    """
+    Convert packed boxes into the cluster dicts the frontend expects.
+    When per-point labels are present each cluster also gets its member points.
+    """
+    members = {}
+    if labels is not None and len(labels):
+        order = np.argsort(labels, kind="stable")
+        sorted_labels = labels[order]
+        keys, starts = np.unique(sorted_labels, return_index=True)
+        for key, chunk in zip(keys, np.split(points[order], starts[1:])):
+            members[int(key)] = chunk
+
+    clusters = []
+    for label, center_x, center_y, width, height, theta in boxes.tolist():
+        cluster_points = members.get(int(label))
+        clusters.append({
+            "id": int(label),
+            "center": (center_x, center_y),
+            "width": width,
+            "height": height,
+            "theta": theta,
+            "points": cluster_points.tolist() if cluster_points is not None else []
+        })
+    return clusters
+
+
+def clusters_to_boxes(clusters):
+    """Pack cluster dicts (as sent to the frontend) into a float32 box array"""
+    boxes = np.empty((len(clusters), BOX_FIELDS), dtype=POINT_DTYPE)
+    for i, cluster in enumerate(clusters):
+        center = cluster.get("center", (0.0, 0.0))
+        boxes[i] = (
+            cluster.get("id", i), center[0], center[1],
+            cluster.get("width", 0.0), cluster.get("height", 0.0), cluster.get("theta", 0.0)
+        )
+    return boxes
+
+
+# Streaming codec for /ws/lidar?codec=delta. Each websocket message is one binary frame:
+#   header   magic(4s) kind(B) dims(B) flags(H) seq(I) n_points(I) n_boxes(I) quantum(f)
+#   payload  zlib( points int32[n_points, dims]
+#                  labels int32[n_points]          (only if STREAM_FLAG_LABELS)
+#                  boxes  int32[n_boxes, 6] )
+# Keyframes carry absolute quantized values. Delta frames carry the difference from the
+# previous frame for points and labels, and for boxes when STREAM_FLAG_BOX_DELTA is set.
+# Scans vary in point count (dropped returns, downsampling), so point i of a delta frame is
+# taken against previous point i * n_prev // n_points; both sides derive that from the counts.
+# Clients that see a gap in seq send {"type": "resync"} and the next frame is a keyframe.
+STREAM_MAGIC = b"LDS1"
+STREAM_HEADER = struct.Struct("<4sBBHIIIf")
+KEYFRAME = 0
+DELTA_FRAME = 1
+STREAM_FLAG_LABELS = 0x1
+STREAM_FLAG_BOX_DELTA = 0x2
+ANGLE_QUANTUM = 1e-3  # radians per step for box theta
+DEFAULT_POINT_DIMS = 2  # shape given to an empty scan
+QUANT_DTYPE = np.dtype("<i4")
+
+
+class LidarFrame:
+    """A scan queued for a codec client; encoding happens when it is actually sent"""
+
+    def __init__(self, points, labels=None, boxes=None):
+        self.points = np.asarray(points, dtype=POINT_DTYPE)
+        if self.points.ndim != 2:
+            self.points = self.points.reshape(-1, self.points.shape[-1] if self.points.size else DEFAULT_POINT_DIMS)
+        self.labels = None if labels is None or len(labels) != len(self.points) else np.asarray(labels)
+        self.boxes = boxes if boxes is not None else np.empty((0, BOX_FIELDS), dtype=POINT_DTYPE)
+
+
+def reference_index(n_points: int, n_prev: int) -> np.ndarray:
+    """Previous-frame point each point of a delta frame is taken against (identity when counts match)"""
+    return np.arange(n_points, dtype=np.int64) * n_prev // max(n_points, 1)
+
+
+def _quantize_boxes(boxes, quantum):
+    scale = np.array([1.0, quantum, quantum, quantum, quantum, ANGLE_QUANTUM])
+    return np.rint(np.asarray(boxes, dtype=np.float64) / scale).astype(QUANT_DTYPE)
+
+
+def _dequantize_boxes(q_boxes, quantum):
+    scale = np.array([1.0, quantum, quantum, quantum, quantum, ANGLE_QUANTUM])
+    return (q_boxes * scale).astype(POINT_DTYPE)
+
+
+class LidarStreamEncoder:
+    """
+    Per-subscriber encoder state. Deltas are taken against the quantized values the
+    client already holds, so quantization error never accumulates across frames.
+    """
+
+    def __init__(self, quantum=0.001, keyframe_interval=30, level=1):
+        self.quantum = quantum
+        self.keyframe_interval = keyframe_interval
+        self.level = level
+        self.seq = 0
+        self._since_keyframe = 0
+        self._force_keyframe = True
+        self._prev_points = None
+        self._prev_labels = None
+        self._prev_boxes = None
+
+    def request_keyframe(self):
+        self._force_keyframe = True
+
+    def __call__(self, message):
+        # Other lidar channel messages (e.g. detection results) pass through as-is
+        if not isinstance(message, LidarFrame):
+            return message
+        return self.encode(message)
+
+    def encode(self, frame: LidarFrame) -> bytes:
+        q_points = np.rint(frame.points / self.quantum).astype(QUANT_DTYPE)
+        q_labels = frame.labels.astype(QUANT_DTYPE) if frame.labels is not None else None
+        q_boxes = _quantize_boxes(frame.boxes, self.quantum)
+
+        keyframe = (
+            self._force_keyframe
+            or self._prev_points is None
+            or self._since_keyframe >= self.keyframe_interval
+            or q_points.shape[1] != self._prev_points.shape[1]
+            # Nothing to take a delta against
+            or (len(self._prev_points) == 0 and len(q_points) > 0)
+            or (q_labels is None) != (self._prev_labels is None)
+        )
+
+        flags = STREAM_FLAG_LABELS if q_labels is not None else 0
+        if keyframe:
+            kind = KEYFRAME
+            body_points, body_labels, body_boxes = q_points, q_labels, q_boxes
+            self._since_keyframe = 0
+            self._force_keyframe = False
+        else:
+            kind = DELTA_FRAME
+            reference = reference_index(len(q_points), len(self._prev_points))
+            body_points = q_points - self._prev_points[reference]
+            body_labels = q_labels - self._prev_labels[reference] if q_labels is not None else None
+            if q_boxes.shape == self._prev_boxes.shape:
+                flags |= STREAM_FLAG_BOX_DELTA
+                body_boxes = q_boxes - self._prev_boxes
+            else:
+                body_boxes = q_boxes
+            self._since_keyframe += 1
+
+        self._prev_points, self._prev_labels, self._prev_boxes = q_points, q_labels, q_boxes
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+
+        parts = [body_points.tobytes()]
+        if body_labels is not None:
+            parts.append(body_labels.tobytes())
+        parts.append(body_boxes.tobytes())
+        header = STREAM_HEADER.pack(
+            STREAM_MAGIC, kind, q_points.shape[1], flags, self.seq,
+            q_points.shape[0], q_boxes.shape[0], self.quantum
+        )
+        return header + zlib.compress(b"".join(parts), self.level)
+
+
+class LidarStreamDecoder:
+    """Reference decoder for the streaming codec (mirrors what a client implements)"""
+
+    def __init__(self):
+        self.seq = None
+        self._points = None
+        self._labels = None
+        self._boxes = None
+
+    def decode(self, message: bytes) -> LidarFrame:
+        magic, kind, dims, flags, seq, n_points, n_boxes, quantum = STREAM_HEADER.unpack_from(message)
+        if magic != STREAM_MAGIC:
+            raise LidarScanError("bad stream magic")
+        if kind == DELTA_FRAME and (self._points is None or self.seq is None or seq != self.seq + 1):
+            raise LidarScanError("sequence gap, resync required")
+
+        payload = np.frombuffer(zlib.decompress(message[STREAM_HEADER.size:]), dtype=QUANT_DTYPE)
+        offset = n_points * dims
+        points = payload[:offset].reshape(n_points, dims)
+        labels = None
+        if flags & STREAM_FLAG_LABELS:
+            labels = payload[offset:offset + n_points]
+            offset += n_points
+        boxes = payload[offset:offset + n_boxes * BOX_FIELDS].reshape(n_boxes, BOX_FIELDS)
+
+        if kind == DELTA_FRAME:
+            reference = reference_index(n_points, len(self._points))
+            points = self._points[reference] + points
+            labels = self._labels[reference] + labels if labels is not None else None
+            if flags & STREAM_FLAG_BOX_DELTA:
+                boxes = self._boxes + boxes
+
+        self.seq = seq
+        self._points, self._labels, self._boxes = points, labels, boxes
+        return LidarFrame((points * quantum).astype(POINT_DTYPE), labels, _dequantize_boxes(boxes, quantum))
@@ -2,7 +2,11 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
-from routers import lidar, mapping, detection, chatbot, warning_system
+from contextlib import asynccontextmanager
+import asyncio
+from routers import lidar, mapping, detection, chatbot, warning_system, picam, thumbnails, status
+from websocket_manager import all_manager_stats
+from service_client import service_pool
 from config import (
     CORS_ORIGINS, 
     CORS_CREDENTIALS, 
@@ -11,11 +15,35 @@ from config import (
     MAPPING_DIR,
     MAPPING_METADATA_DIR,
     PICAMPIC_DIR,
-    PICAMVID_DIR
+    PICAMVID_DIR,
+    LIDAR_SERVER_DETECTION,
+    DETECTION_RECORDING_ENABLED
 )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background workers are started with the server and stopped on shutdown
+    service_pool.start()
+    if LIDAR_SERVER_DETECTION:
+        lidar.detection_pipeline.start()
+    if DETECTION_RECORDING_ENABLED:
+        detection.recorder.start()
+    thumbnails.thumbnail_service.start()
+    await asyncio.to_thread(mapping.mapping_store.import_sidecars, MAPPING_METADATA_DIR, MAPPING_DIR)
+    mapping.tile_pyramid.start()
+    status.status_poller.start()
+    warning_system.telemetry_source.start()
+    yield
+    await warning_system.telemetry_source.stop()
+    await status.status_poller.stop()
+    await lidar.detection_pipeline.stop()
+    await asyncio.to_thread(detection.recorder.stop)
+    thumbnails.thumbnail_service.stop()
+    await mapping.tile_pyramid.stop()
+    await service_pool.stop()
+
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -34,8 +62,7 @@ PICAMVID_DIR.mkdir(exist_ok=True)
 
 # Mount the mapping_images directory to serve files
 app.mount("/mapping_images", StaticFiles(directory=str(MAPPING_DIR)), name="mapping_images")
-app.mount("/picam_images", StaticFiles(directory=str(PICAMPIC_DIR)), name="picam_images")
-app.mount("/picam_videos", StaticFiles(directory=str(PICAMVID_DIR)), name="picam_videos")
+# /picam_images and /picam_videos are served by the picam router (Range and ETag support)
 
 # Include routers
 app.include_router(lidar.router, tags=["lidar"])
@@ -43,7 +70,20 @@ app.include_router(mapping.router, tags=["mapping"])
 app.include_router(detection.router, tags=["detection"])
 app.include_router(chatbot.router, tags=["chatbot"])
 app.include_router(warning_system.router, tags=["warning_system"])
+app.include_router(picam.router, tags=["picam"])
+app.include_router(thumbnails.router, tags=["thumbnails"])
+app.include_router(status.router, tags=["status"])
 
 @app.get("/")
 async def root():
-    return {"message": "API is running"}
\ No newline at end of file
+    return {"message": "API is running"}
+
+@app.get("/ws/stats")
+async def websocket_stats():
+    """Per-client send queue depth and drop counts for every websocket channel"""
+    return {"managers": all_manager_stats()}
+
+@app.get("/services/stats")
+async def service_stats():
+    """Circuit state and request/failure counts for each device service"""
+    return service_pool.stats()
@@ -0,0 +1,355 @@
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+
+from mapping_store import METERS_PER_DEGREE
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 256
+MAX_LATITUDE = 85.05112878
+# Largest warped footprint (pixels per side at max zoom); bad altitude data should not fill the disk
+MAX_FOOTPRINT_PX = 8192
+# Half-diagonal of a footprint as a multiple of its half-width; covers aspect ratios down to 1:sqrt(3)
+FOOTPRINT_RADIUS_FACTOR = 2.0
+
+
+def tile_path(tile_dir: Path, z: int, x: int, y: int) -> Path:
+    return Path(tile_dir) / str(z) / str(x) / f"{y}.png"
+
+
+def lonlat_to_pixel(lon, lat, z: int):
+    """Web Mercator global pixel coordinates at zoom z"""
+    scale = TILE_SIZE * (1 << z)
+    lat = np.clip(lat, -MAX_LATITUDE, MAX_LATITUDE)
+    x = (np.asarray(lon) + 180.0) / 360.0 * scale
+    sin_lat = np.sin(np.radians(lat))
+    y = (0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+    return x, y
+
+
+def footprint(lat: float, lon: float, altitude: float, yaw: float, hfov: float, aspect: float):
+    """
+    Ground corners (lon, lat) of a nadir image, ordered top-left, top-right,
+    bottom-right, bottom-left. The top of the image faces yaw (degrees clockwise
+    from north).
+    """
+    half_w = altitude * math.tan(math.radians(hfov) / 2)
+    half_h = half_w / aspect
+    yaw_rad = math.radians(yaw)
+    cos_y, sin_y = math.cos(yaw_rad), math.sin(yaw_rad)
+    corners = []
+    for u, v in ((-half_w, half_h), (half_w, half_h), (half_w, -half_h), (-half_w, -half_h)):
+        east = u * cos_y + v * sin_y
+        north = -u * sin_y + v * cos_y
+        corners.append((
+            lon + east / (METERS_PER_DEGREE * math.cos(math.radians(lat))),
+            lat + north / METERS_PER_DEGREE,
+        ))
+    return corners
+
+
+def _read_tile(path: Path) -> Optional[np.ndarray]:
+    if not path.exists():
+        return None
+    return cv2.imread(str(path), cv2.IMREAD_UNCHANGED)
+
+
+def _write_tile(path: Path, tile: np.ndarray):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    ok, encoded = cv2.imencode(".png", tile)
+    if not ok:
+        raise ValueError("PNG encode failed")
+    # Write then rename so the tile endpoint never serves a half-written file
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_bytes(encoded.tobytes())
+    os.replace(tmp, path)
+
+
+def _composite(base: Optional[np.ndarray], layer: np.ndarray) -> np.ndarray:
+    """Alpha-composite a BGRA layer over a BGRA tile"""
+    if base is None:
+        return layer
+    alpha = layer[:, :, 3:4].astype(np.float32) / 255.0
+    out = base.astype(np.float32)
+    out[:, :, :3] = layer[:, :, :3] * alpha + out[:, :, :3] * (1 - alpha)
+    out[:, :, 3:4] = 255.0 * alpha + out[:, :, 3:4] * (1 - alpha)
+    return np.rint(out).astype(np.uint8)
+
+
+def _footprint_bounds(lat: float, lon: float, altitude: float, hfov: float, z: int) -> Tuple[int, int, int, int]:
+    """
+    Tile range (x0, y0, x1, y1) at zoom z that holds an image's footprint at any yaw
+    and aspect ratio; used when the image itself can no longer be read.
+    """
+    radius = altitude * math.tan(math.radians(hfov) / 2) * FOOTPRINT_RADIUS_FACTOR
+    dlat = radius / METERS_PER_DEGREE
+    dlon = radius / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    px, py = lonlat_to_pixel(np.array([lon - dlon, lon + dlon]), np.array([lat + dlat, lat - dlat]), z)
+    return (int(px[0]) // TILE_SIZE, int(py[0]) // TILE_SIZE,
+            int(px[1]) // TILE_SIZE, int(py[1]) // TILE_SIZE)
+
+
+def _warp_layers(image_path: str, lat: float, lon: float, altitude: float, yaw: float,
+                 max_zoom: int, hfov: float) -> Dict[Tuple[int, int], np.ndarray]:
+    """Project one image onto the max-zoom tile grid; returns the non-empty BGRA layer for each tile"""
+    image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"could not decode {Path(image_path).name}")
+    height, width = image.shape[:2]
+
+    corners = footprint(lat, lon, altitude, yaw, hfov, width / height)
+    px, py = lonlat_to_pixel(np.array([c[0] for c in corners]), np.array([c[1] for c in corners]), max_zoom)
+    x0, y0 = int(math.floor(px.min())), int(math.floor(py.min()))
+    x1, y1 = int(math.ceil(px.max())), int(math.ceil(py.max()))
+    if x1 - x0 > MAX_FOOTPRINT_PX or y1 - y0 > MAX_FOOTPRINT_PX:
+        raise ValueError(f"footprint of {Path(image_path).name} is too large to tile")
+
+    # Shrink to about the output resolution first; the perspective warp itself only interpolates
+    scale = math.hypot(px[1] - px[0], py[1] - py[0]) / width
+    if scale < 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        height, width = image.shape[:2]
+
+    # Warp once into the footprint's bounding box, aligned to the tile grid
+    tx0, ty0 = x0 // TILE_SIZE, y0 // TILE_SIZE
+    tx1, ty1 = (x1 - 1) // TILE_SIZE, (y1 - 1) // TILE_SIZE
+    origin_x, origin_y = tx0 * TILE_SIZE, ty0 * TILE_SIZE
+    region_w = (tx1 - tx0 + 1) * TILE_SIZE
+    region_h = (ty1 - ty0 + 1) * TILE_SIZE
+    src = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    dst = np.float32(np.column_stack([px - origin_x, py - origin_y]))
+    transform = cv2.getPerspectiveTransform(src, dst)
+    bgra = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+    warped = cv2.warpPerspective(bgra, transform, (region_w, region_h), flags=cv2.INTER_LINEAR,
+                                 borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0, 0))
+
+    layers = {}
+    for ty in range(ty0, ty1 + 1):
+        for tx in range(tx0, tx1 + 1):
+            layer = warped[(ty - ty0) * TILE_SIZE:(ty - ty0 + 1) * TILE_SIZE,
+                           (tx - tx0) * TILE_SIZE:(tx - tx0 + 1) * TILE_SIZE]
+            if layer[:, :, 3].any():
+                layers[(tx, ty)] = layer
+    return layers
+
+
+def _render_image(image_path: str, lat: float, lon: float, altitude: float, yaw: float,
+                  tile_dir: str, min_zoom: int, max_zoom: int, hfov: float) -> int:
+    """
+    Runs in the tiling worker. Projects one image into the max-zoom tiles it covers,
+    then rebuilds just the parent tiles above them. Returns the number of tiles written.
+    """
+    layers = _warp_layers(image_path, lat, lon, altitude, yaw, max_zoom, hfov)
+    for (tx, ty), layer in layers.items():
+        path = tile_path(tile_dir, max_zoom, tx, ty)
+        _write_tile(path, _composite(_read_tile(path), layer))
+    return len(layers) + _rebuild_parents(tile_dir, set(layers), min_zoom, max_zoom)
+
+
+def _remove_image(lat: float, lon: float, altitude: float, others: List[tuple],
+                  tile_dir: str, min_zoom: int, max_zoom: int, hfov: float) -> int:
+    """
+    Runs in the tiling worker. Redraws every max-zoom tile a deleted image may have
+    covered from the remaining images (others, in upload order, so stacking is
+    unchanged), drops tiles nothing covers any more, then rebuilds the parent tiles
+    above. Returns the number of tiles written.
+    """
+    x0, y0, x1, y1 = _footprint_bounds(lat, lon, altitude, hfov, max_zoom)
+    if max(x1 - x0, y1 - y0) * TILE_SIZE > 4 * MAX_FOOTPRINT_PX:
+        # Too large to have passed the MAX_FOOTPRINT_PX check, so it was never tiled
+        return 0
+    tiles: Dict[Tuple[int, int], Optional[np.ndarray]] = {
+        (tx, ty): None for ty in range(y0, y1 + 1) for tx in range(x0, x1 + 1)
+    }
+    for image_path, other_lat, other_lon, other_altitude, other_yaw in others:
+        ox0, oy0, ox1, oy1 = _footprint_bounds(other_lat, other_lon, other_altitude, hfov, max_zoom)
+        if ox1 < x0 or ox0 > x1 or oy1 < y0 or oy0 > y1:
+            continue
+        try:
+            layers = _warp_layers(image_path, other_lat, other_lon, other_altitude, other_yaw, max_zoom, hfov)
+        except (ValueError, cv2.error):
+            # Same images the upload path skips; they never made it into the tiles
+            continue
+        for key, layer in layers.items():
+            if key in tiles:
+                tiles[key] = _composite(tiles[key], layer)
+
+    written = 0
+    for (tx, ty), tile in tiles.items():
+        path = tile_path(tile_dir, max_zoom, tx, ty)
+        if tile is None:
+            path.unlink(missing_ok=True)
+        else:
+            _write_tile(path, tile)
+            written += 1
+    return written + _rebuild_parents(tile_dir, set(tiles), min_zoom, max_zoom)
+
+
+def _rebuild_parents(tile_dir: str, touched: Set[Tuple[int, int]], min_zoom: int, max_zoom: int) -> int:
+    written = 0
+    for z in range(max_zoom - 1, min_zoom - 1, -1):
+        touched = {(tx // 2, ty // 2) for tx, ty in touched}
+        for tx, ty in touched:
+            path = tile_path(tile_dir, z, tx, ty)
+            parent = _parent_tile(tile_dir, z, tx, ty)
+            if parent is None:
+                path.unlink(missing_ok=True)
+            else:
+                _write_tile(path, parent)
+                written += 1
+    return written
+
+
+def _parent_tile(tile_dir: str, z: int, x: int, y: int) -> Optional[np.ndarray]:
+    """Downsampled mosaic of a tile's four children, or None when none of them exist"""
+    mosaic = np.zeros((TILE_SIZE * 2, TILE_SIZE * 2, 4), dtype=np.uint8)
+    found = False
+    for dy in (0, 1):
+        for dx in (0, 1):
+            child = _read_tile(tile_path(tile_dir, z + 1, 2 * x + dx, 2 * y + dy))
+            if child is not None:
+                mosaic[dy * TILE_SIZE:(dy + 1) * TILE_SIZE, dx * TILE_SIZE:(dx + 1) * TILE_SIZE] = child
+                found = True
+    if not found:
+        return None
+    return cv2.resize(mosaic, (TILE_SIZE, TILE_SIZE), interpolation=cv2.INTER_AREA)
+
+
+def _warm_up():
+    return True
+
+
+class TilePyramid:
+    """
+    Keeps an XYZ (slippy map) PNG tile pyramid of the mapping imagery up to date.
+    Images are tiled one at a time, in upload order, by a single worker process, so
+    tile read-modify-write never races and later images are drawn on top. Deleting
+    an image queues a redraw of the tiles under it from the images that remain.
+    """
+
+    def __init__(self, tile_dir: Path, min_zoom: int, max_zoom: int, hfov: float):
+        self.tile_dir = Path(tile_dir)
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.hfov = hfov
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.images_tiled = 0
+        self.images_removed = 0
+        self.images_failed = 0
+        self.tiles_written = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self.tile_dir.mkdir(exist_ok=True)
+        self._executor = self._new_executor()
+        self._executor.submit(_warm_up)
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Started mapping tile worker")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+
+    @staticmethod
+    def _position(metadata: dict) -> Optional[Tuple[float, float, float, float]]:
+        """(lat, lon, altitude, yaw), or None for images without a usable position"""
+        try:
+            lat, lon = float(metadata["latitude"]), float(metadata["longitude"])
+            altitude, yaw = float(metadata["altitude"]), float(metadata.get("yaw") or 0.0)
+        except (KeyError, TypeError, ValueError):
+            return None
+        if altitude <= 0 or (lat == 0.0 and lon == 0.0):
+            return None
+        return lat, lon, altitude, yaw
+
+    def submit(self, image_path: Path, metadata: dict) -> bool:
+        """Queue an uploaded image for tiling; images without a usable position are skipped"""
+        position = self._position(metadata)
+        if not self.running or position is None:
+            return False
+        self._queue.put_nowait((Path(image_path).name, _render_image, (str(image_path), *position)))
+        return True
+
+    def remove(self, metadata: dict, remaining: List[Tuple[Path, dict]]) -> bool:
+        """
+        Queue a deleted image's tiles to be redrawn without it. remaining is every
+        other (image path, metadata) in upload order; only those overlapping the
+        deleted footprint are drawn again.
+        """
+        position = self._position(metadata)
+        if not self.running or position is None:
+            return False
+        lat, lon, altitude, _ = position
+        others = []
+        for image_path, other in remaining:
+            other_position = self._position(other)
+            if other_position is not None:
+                others.append((str(image_path), *other_position))
+        self._queue.put_nowait((f"removal of {metadata['image_id']}", _remove_image, (lat, lon, altitude, others)))
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            name, job, args = await self._queue.get()
+            try:
+                written = await loop.run_in_executor(
+                    self._executor, job, *args, str(self.tile_dir), self.min_zoom, self.max_zoom, self.hfov
+                )
+                if job is _remove_image:
+                    self.images_removed += 1
+                else:
+                    self.images_tiled += 1
+                self.tiles_written += written
+            except BrokenProcessPool:
+                logger.error("Mapping tile worker died, restarting it")
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+                self.images_failed += 1
+            except Exception as e:
+                logger.error(f"Error tiling {name}: {str(e)}")
+                self.images_failed += 1
+
+    def tile(self, z: int, x: int, y: int) -> Path:
+        return tile_path(self.tile_dir, z, x, y)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "images_tiled": self.images_tiled,
+            "images_removed": self.images_removed,
+            "images_failed": self.images_failed,
+            "tiles_written": self.tiles_written,
+            "min_zoom": self.min_zoom,
+            "max_zoom": self.max_zoom,
+        }
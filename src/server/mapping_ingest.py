@@ -0,0 +1,113 @@
+import asyncio
+import base64
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Callable, List, Sequence, Tuple
+
+
+class WriterBusy(Exception):
+    """Raised when the write backlog stays full for longer than the wait timeout"""
+
+
+def _atomic_write(path: Path, write: Callable[[BinaryIO], None]):
+    # Thumbnails, tiles and static file serving never see a partially written image.
+    # Writer threads share a pid, so the temp name needs to be unique per write
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def write_base64(path: Path, image_data: str):
+    data = base64.b64decode(image_data)
+    _atomic_write(path, lambda f: f.write(data))
+
+
+def write_stream(path: Path, source: BinaryIO):
+    source.seek(0)
+    _atomic_write(path, lambda f: shutil.copyfileobj(source, f))
+
+
+def staging_path(path: Path) -> Path:
+    """Where a batch writes an image before the whole batch is committed"""
+    return path.with_name(f".{path.name}.{uuid.uuid4().hex}.staged")
+
+
+def commit_staged(staged: List[Tuple[Path, Path]]):
+    for staged_path, path in staged:
+        os.replace(staged_path, path)
+
+
+def discard_staged(staged: List[Tuple[Path, Path]]):
+    for staged_path, _ in staged:
+        staged_path.unlink(missing_ok=True)
+
+
+class MappingWriter:
+    """
+    Runs image decoding and disk writes on a small thread pool. At most max_pending
+    writes are accepted at once; further uploads wait up to wait_timeout for a slot
+    and then fail with WriterBusy, so a burst turns into backpressure on the sender
+    instead of an unbounded backlog in memory.
+    """
+
+    def __init__(self, workers: int, max_pending: int, wait_timeout: float):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mapping-writer")
+        self._slots = asyncio.Semaphore(max_pending)
+        self.max_pending = max_pending
+        self.wait_timeout = wait_timeout
+        self.pending = 0
+        self.written = 0
+        self.rejected = 0
+
+    async def run(self, func: Callable, *args):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.wait_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise WriterBusy(f"mapping writer is busy ({self.max_pending} writes pending)")
+        self.pending += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+            self.written += 1
+            return result
+        finally:
+            self.pending -= 1
+            self._slots.release()
+
+    async def run_all(self, func: Callable, jobs: Sequence[tuple], max_in_flight: int) -> list:
+        """
+        Run func(*args) for every job, holding at most max_in_flight write slots at a
+        time so one large batch leaves room for other uploads. Returns results and
+        exceptions in job order, like asyncio.gather(return_exceptions=True); once a
+        job fails, the ones not yet started are skipped and return None.
+        """
+        limit = asyncio.Semaphore(max_in_flight)
+        failed = False
+
+        async def one(args):
+            nonlocal failed
+            async with limit:
+                if failed:
+                    return None
+                try:
+                    return await self.run(func, *args)
+                except Exception:
+                    failed = True
+                    raise
+
+        return await asyncio.gather(*(one(args) for args in jobs), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "written": self.written,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,308 @@
+import json
+import logging
+import math
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.JPG', '.JPEG', '.PNG'}
+METADATA_FIELDS = ("image_url", "image_id", "timestamp", "latitude", "longitude", "altitude", "yaw")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    image_id TEXT NOT NULL UNIQUE,
+    image_url TEXT NOT NULL,
+    timestamp REAL,
+    latitude REAL,
+    longitude REAL,
+    altitude REAL,
+    yaw REAL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_timestamp ON images(timestamp);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+# R-tree over image positions, kept in sync with images by triggers. REPLACE deletes the
+# old row, and its delete trigger only fires with recursive_triggers on (set per connection).
+RTREE_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS images_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+CREATE TRIGGER IF NOT EXISTS images_rtree_insert AFTER INSERT ON images
+WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL
+BEGIN
+    INSERT INTO images_rtree VALUES (new.seq, new.latitude, new.latitude, new.longitude, new.longitude);
+END;
+CREATE TRIGGER IF NOT EXISTS images_rtree_delete AFTER DELETE ON images
+BEGIN
+    DELETE FROM images_rtree WHERE id = old.seq;
+END;
+"""
+# Used when SQLite is built without the R-tree module
+FALLBACK_SPATIAL_SCHEMA = """
+CREATE INDEX IF NOT EXISTS images_lat_lon ON images(latitude, longitude);
+"""
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+
+def haversine_m(lat, lon, lats, lons):
+    """Great-circle distance in meters from (lat, lon) to each of lats/lons"""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def radius_bbox(lat: float, lon: float, radius_m: float):
+    """(min_lat, min_lon, max_lat, max_lon) enclosing a circle; min_lon > max_lon when it wraps"""
+    dlat = radius_m / METERS_PER_DEGREE
+    min_lat, max_lat = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    cos_lat = math.cos(math.radians(lat))
+    if min_lat <= -90.0 or max_lat >= 90.0 or dlat >= 180.0 * cos_lat:
+        # Reaches a pole or all the way round: every longitude is in range
+        return min_lat, -180.0, max_lat, 180.0
+    dlon = dlat / cos_lat
+    return min_lat, _wrap_lon(lon - dlon), max_lat, _wrap_lon(lon + dlon)
+
+
+def _wrap_lon(lon: float) -> float:
+    return (lon + 180.0) % 360.0 - 180.0
+
+
+def _row_to_metadata(row: sqlite3.Row) -> dict:
+    metadata = {field: row[field] for field in METADATA_FIELDS}
+    if metadata["timestamp"] is None:
+        # Images imported without a sidecar; the old listing reported an empty timestamp
+        metadata["timestamp"] = ""
+    metadata["seq"] = row["seq"]
+    return metadata
+
+
+class MappingStore:
+    """
+    Mapping image metadata in SQLite (WAL mode, so reads never wait on the writer).
+
+    Every insert or re-upload takes a new, increasing seq, so clients can page with
+    since_seq and only fetch images added after the last one they saw. Methods block;
+    call them from a worker thread (asyncio.to_thread) in request handlers.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            try:
+                had_rtree = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'images_rtree'"
+                ).fetchone() is not None
+                conn.executescript(RTREE_SCHEMA)
+                if not had_rtree:
+                    # Index rows stored before the R-tree existed
+                    conn.execute(
+                        "INSERT INTO images_rtree SELECT seq, latitude, latitude, longitude, longitude "
+                        "FROM images WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+                    )
+                self.spatial_index = "rtree"
+            except sqlite3.OperationalError:
+                conn.executescript(FALLBACK_SPATIAL_SCHEMA)
+                self.spatial_index = "btree"
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections are not shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA recursive_triggers=ON")
+            self._local.conn = conn
+        return conn
+
+    def upsert(self, metadata: dict) -> dict:
+        """Insert or replace an image's metadata; returns it with its new seq"""
+        return self.upsert_many([metadata])[0]
+
+    def upsert_many(self, batch: List[dict]) -> List[dict]:
+        """Insert or replace several images in one transaction"""
+        now = time.time()
+        stored = []
+        with self._connection() as conn:
+            for metadata in batch:
+                # REPLACE deletes the old row, so a re-upload moves to the end of the seq order
+                cursor = conn.execute(
+                    "INSERT OR REPLACE INTO images "
+                    "(image_id, image_url, timestamp, latitude, longitude, altitude, yaw, created) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        metadata["image_id"], metadata["image_url"], metadata.get("timestamp"),
+                        metadata.get("latitude"), metadata.get("longitude"), metadata.get("altitude"),
+                        metadata.get("yaw"), now,
+                    ),
+                )
+                stored.append(dict(metadata, seq=cursor.lastrowid))
+        return stored
+
+    def delete(self, image_id: str) -> bool:
+        with self._connection() as conn:
+            return conn.execute("DELETE FROM images WHERE image_id = ?", (image_id,)).rowcount > 0
+
+    def get(self, image_id: str) -> Optional[dict]:
+        row = self._connection().execute("SELECT * FROM images WHERE image_id = ?", (image_id,)).fetchone()
+        return _row_to_metadata(row) if row else None
+
+    def list_images(self, since_seq: Optional[int] = None, since_timestamp: Optional[float] = None,
+                    limit: Optional[int] = None) -> List[dict]:
+        """Images in seq order, optionally only those after since_seq and/or since_timestamp"""
+        clauses, params = [], []
+        if since_seq is not None:
+            clauses.append("seq > ?")
+            params.append(since_seq)
+        if since_timestamp is not None:
+            clauses.append("timestamp > ?")
+            params.append(since_timestamp)
+        query = "SELECT * FROM images"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY seq"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [_row_to_metadata(row) for row in self._connection().execute(query, params)]
+
+    def _bbox_rows(self, min_lat, min_lon, max_lat, max_lon, limit=None) -> List[sqlite3.Row]:
+        if min_lon > max_lon:
+            # Viewport crosses the antimeridian: query both sides
+            rows = self._bbox_rows(min_lat, min_lon, max_lat, 180.0, limit)
+            remaining = None if limit is None else limit - len(rows)
+            if remaining is None or remaining > 0:
+                rows += self._bbox_rows(min_lat, -180.0, max_lat, max_lon, remaining)
+            return rows
+
+        if self.spatial_index == "rtree":
+            # R-tree bounds are float32 rounded outward, so a point just inside the edge can have
+            # bounds just past it: find candidates by overlap, then filter on the exact columns
+            query = (
+                "SELECT images.* FROM images_rtree JOIN images ON images.seq = images_rtree.id "
+                "WHERE images_rtree.max_lat >= :min_lat AND images_rtree.min_lat <= :max_lat "
+                "AND images_rtree.max_lon >= :min_lon AND images_rtree.min_lon <= :max_lon "
+                "AND images.latitude BETWEEN :min_lat AND :max_lat "
+                "AND images.longitude BETWEEN :min_lon AND :max_lon"
+            )
+        else:
+            query = (
+                "SELECT * FROM images WHERE latitude BETWEEN :min_lat AND :max_lat "
+                "AND longitude BETWEEN :min_lon AND :max_lon"
+            )
+        params = {"min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon}
+        if limit is not None:
+            query += " LIMIT :limit"
+            params["limit"] = limit
+        return self._connection().execute(query, params).fetchall()
+
+    def within_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+                    limit: Optional[int] = None) -> List[dict]:
+        """Images inside a viewport; min_lon > max_lon means the box crosses the antimeridian"""
+        return [_row_to_metadata(row) for row in self._bbox_rows(min_lat, min_lon, max_lat, max_lon, limit)]
+
+    def _with_distances(self, rows, lat, lon):
+        lats = np.array([row["latitude"] for row in rows], dtype=float)
+        lons = np.array([row["longitude"] for row in rows], dtype=float)
+        return haversine_m(lat, lon, lats, lons)
+
+    def within_radius(self, lat: float, lon: float, radius_m: float, limit: Optional[int] = None) -> List[dict]:
+        """Images within radius_m of a point, nearest first, each with distance_m"""
+        rows = self._bbox_rows(*radius_bbox(lat, lon, radius_m))
+        if not rows:
+            return []
+        distances = self._with_distances(rows, lat, lon)
+        order = np.argsort(distances, kind="stable")
+        order = order[distances[order] <= radius_m][:limit]
+        return [dict(_row_to_metadata(rows[i]), distance_m=float(distances[i])) for i in order]
+
+    def nearest(self, lat: float, lon: float, k: int, initial_radius_m: float = 100.0) -> List[dict]:
+        """
+        The k images closest to a point. The search box doubles until it holds k images
+        that are no farther than its radius, which makes the result exact.
+        """
+        radius = initial_radius_m
+        while True:
+            rows = self._bbox_rows(*radius_bbox(lat, lon, radius))
+            covers_all = radius >= math.pi * EARTH_RADIUS_M
+            if rows:
+                distances = self._with_distances(rows, lat, lon)
+                if covers_all or np.count_nonzero(distances <= radius) >= k:
+                    order = np.argsort(distances, kind="stable")[:k]
+                    return [dict(_row_to_metadata(rows[i]), distance_m=float(distances[i])) for i in order]
+            elif covers_all:
+                return []
+            radius *= 2
+
+    def last_seq(self) -> int:
+        return self._connection().execute("SELECT COALESCE(MAX(seq), 0) FROM images").fetchone()[0]
+
+    def import_sidecars(self, metadata_dir: Path, image_dir: Path) -> int:
+        """
+        One-time import of the JSON sidecars written by earlier versions. Images without
+        a sidecar get the same zeroed metadata the old listing endpoint reported.
+        """
+        conn = self._connection()
+        if conn.execute("SELECT 1 FROM store_meta WHERE key = 'sidecars_imported'").fetchone():
+            return 0
+
+        image_dir = Path(image_dir)
+        image_files = list(image_dir.iterdir()) if image_dir.exists() else []
+        records = []
+        for image_file in image_files:
+            if not image_file.is_file() or image_file.suffix not in IMAGE_EXTENSIONS:
+                continue
+            metadata = {
+                "image_url": f"/mapping_images/{image_file.name}",
+                "image_id": image_file.stem,
+                "timestamp": "",
+                "latitude": 0.0,
+                "longitude": 0.0,
+                "altitude": 0.0,
+                "yaw": 0.0,
+            }
+            sidecar = Path(metadata_dir) / f"{image_file.stem}.json"
+            if sidecar.exists():
+                try:
+                    metadata.update(json.loads(sidecar.read_text()))
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Skipping unreadable mapping sidecar {sidecar.name}: {str(e)}")
+            records.append(metadata)
+
+        for m in records:
+            if not isinstance(m["timestamp"], (int, float)):
+                m["timestamp"] = None
+        # Oldest first so the imported seq order follows capture order
+        records.sort(key=lambda m: m["timestamp"] if m["timestamp"] is not None else 0.0)
+        now = time.time()
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO images "
+                "(image_id, image_url, timestamp, latitude, longitude, altitude, yaw, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (m["image_id"], m["image_url"], m["timestamp"], m["latitude"], m["longitude"],
+                     m["altitude"], m["yaw"], now)
+                    for m in records
+                ],
+            )
+            conn.execute("INSERT INTO store_meta (key, value) VALUES ('sidecars_imported', ?)", (str(now),))
+        logger.info(f"Imported {len(records)} mapping images into {self.db_path}")
+        return len(records)
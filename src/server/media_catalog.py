@@ -0,0 +1,135 @@
+import bisect
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+SORT_KEYS = ("mtime", "name", "size")
+
+
+class MediaEntry(NamedTuple):
+    name: str
+    file_type: str
+    size: int
+    mtime: float
+
+    def to_dict(self) -> dict:
+        return self._asdict()
+
+
+class MediaCatalog:
+    """
+    In-memory index of the files in one or more media directories, keyed by file type.
+
+    Handlers call add()/remove() as they change files. refresh() only rescans a
+    directory when its mtime has changed, which catches files copied in by other
+    means. Sorted views are built once per change and reused by every query.
+    refresh() runs on a worker thread, so all reads and writes of the index go
+    through a lock; the directory scan itself happens outside it.
+    """
+
+    def __init__(self, directories: Dict[str, Path]):
+        self.directories = {file_type: Path(path) for file_type, path in directories.items()}
+        self._entries: Dict[str, Dict[str, MediaEntry]] = {file_type: {} for file_type in self.directories}
+        self._dir_mtimes: Dict[str, Optional[int]] = {file_type: None for file_type in self.directories}
+        # (file_type, sort key) -> entries sorted ascending by that key
+        self._views: Dict[Tuple[Optional[str], str], list] = {}
+        self._lock = threading.Lock()
+        self.rescans = 0
+
+    def _dir_mtime(self, file_type: str) -> Optional[int]:
+        try:
+            return self.directories[file_type].stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        for file_type, directory in self.directories.items():
+            mtime = self._dir_mtime(file_type)
+            with self._lock:
+                if mtime is not None and mtime == self._dir_mtimes[file_type]:
+                    continue
+            entries = {}
+            if mtime is not None:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_file():
+                            stat = entry.stat()
+                            entries[entry.name] = MediaEntry(entry.name, file_type, stat.st_size, stat.st_mtime)
+            with self._lock:
+                # The directory changed mid-scan (possibly by add/remove); leave it for the next refresh
+                if self._dir_mtime(file_type) != mtime:
+                    continue
+                self._entries[file_type] = entries
+                self._dir_mtimes[file_type] = mtime
+                self._views.clear()
+                self.rescans += 1
+
+    def add(self, file_type: str, path: Path):
+        stat = path.stat()
+        with self._lock:
+            self._entries[file_type][path.name] = MediaEntry(path.name, file_type, stat.st_size, stat.st_mtime)
+            self._changed(file_type)
+
+    def remove(self, file_type: str, name: str):
+        with self._lock:
+            self._entries[file_type].pop(name, None)
+            self._changed(file_type)
+
+    def _changed(self, file_type: str):
+        # Our own change moved the directory mtime; record it so it does not trigger a rescan
+        if self._dir_mtimes[file_type] is not None:
+            self._dir_mtimes[file_type] = self._dir_mtime(file_type)
+        self._views.clear()
+
+    def _view(self, file_type: Optional[str], sort: str) -> List[MediaEntry]:
+        key = (file_type, sort)
+        view = self._views.get(key)
+        if view is None:
+            types = [file_type] if file_type is not None else list(self._entries)
+            view = [entry for t in types for entry in self._entries[t].values()]
+            view.sort(key=lambda entry: getattr(entry, sort))
+            self._views[key] = view
+        return view
+
+    def _mtimes(self, file_type: Optional[str]) -> List[float]:
+        key = (file_type, "mtime_keys")
+        mtimes = self._views.get(key)
+        if mtimes is None:
+            mtimes = self._views[key] = [entry.mtime for entry in self._view(file_type, "mtime")]
+        return mtimes
+
+    def query(self, file_type: Optional[str] = None, sort: str = "mtime", descending: bool = True,
+              since: Optional[float] = None, until: Optional[float] = None,
+              offset: int = 0, limit: Optional[int] = None) -> Tuple[int, List[MediaEntry]]:
+        """Return (total matching, one page of entries); limit=None returns everything after offset"""
+        if sort not in SORT_KEYS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)}")
+        if file_type is not None and file_type not in self.directories:
+            raise ValueError(f"unknown file type: {file_type}")
+        with self._lock:
+            return self._query(file_type, sort, descending, since, until, offset, limit)
+
+    def _query(self, file_type: Optional[str], sort: str, descending: bool, since: Optional[float],
+               until: Optional[float], offset: int, limit: Optional[int]) -> Tuple[int, List[MediaEntry]]:
+        if since is None and until is None:
+            matches = self._view(file_type, sort)
+        else:
+            # Time filters bisect the mtime-sorted view; only the matching slice is re-sorted
+            by_mtime = self._view(file_type, "mtime")
+            mtimes = self._mtimes(file_type)
+            lo = 0 if since is None else bisect.bisect_left(mtimes, since)
+            hi = len(mtimes) if until is None else bisect.bisect_right(mtimes, until)
+            matches = by_mtime[lo:hi]
+            if sort != "mtime":
+                matches = sorted(matches, key=lambda entry: getattr(entry, sort))
+
+        total = len(matches)
+        if limit is None:
+            limit = total
+        if descending:
+            start, stop = max(total - offset - limit, 0), max(total - offset, 0)
+            page = matches[start:stop][::-1]
+        else:
+            page = matches[offset:offset + limit]
+        return total, page
@@ -0,0 +1,109 @@
+import asyncio
+import mimetypes
+import os
+from email.utils import formatdate
+from pathlib import Path
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
+from config import MEDIA_CHUNK_BYTES
+
+
+def etag_for(stat: os.stat_result) -> str:
+    # Size and mtime change on every rewrite (uploads are atomic replaces), so no hashing needed
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    tags = [tag.strip() for tag in header.split(",")]
+    # Weak comparison, as If-None-Match requires
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes=" range into an inclusive (start, end). Returns None when the
+    whole file should be sent (no header, another unit, or multiple ranges).
+    Raises HTTPException(416) when the range lies outside the file.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].strip()
+    if "," in spec:
+        return None
+    start_text, _, end_text = spec.partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(0, size - int(end_text))
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end or start < 0:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+
+async def _read_chunks(path: Path, start: int, length: int):
+    fd = await asyncio.to_thread(os.open, path, os.O_RDONLY)
+    try:
+        offset, remaining = start, length
+        while remaining > 0:
+            chunk = await asyncio.to_thread(os.pread, fd, min(MEDIA_CHUNK_BYTES, remaining), offset)
+            if not chunk:
+                break
+            offset += len(chunk)
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        os.close(fd)
+
+
+def media_response(request: Request, path: Path, cache_control: str = "no-cache") -> Response:
+    """
+    Serve a file with Range/206, ETag/If-None-Match and Last-Modified support.
+    The body is streamed in MEDIA_CHUNK_BYTES reads, so memory per request stays bounded.
+    """
+    try:
+        stat = path.stat()
+    except (FileNotFoundError, NotADirectoryError):
+        raise HTTPException(status_code=404, detail='file not found.')
+
+    size = stat.st_size
+    etag = etag_for(stat)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+    byte_range = parse_range(request.headers.get("range"), size)
+    if_range = request.headers.get("if-range")
+    if byte_range is not None and if_range and if_range != etag:
+        # The client's partial copy is stale; send the whole file
+        byte_range = None
+
+    if byte_range is None:
+        start, length, status_code = 0, size, 200
+    else:
+        start, end = byte_range
+        length, status_code = end - start + 1, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(length)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+    return StreamingResponse(_read_chunks(path, start, length), status_code=status_code,
+                             headers=headers, media_type=media_type)
@@ -1,17 +1,43 @@
 import numpy as np
-from sklearn.cluster import DBSCAN
-from sklearn.preprocessing import StandardScaler
-from collections import defaultdict
 import json
-from scipy.spatial import distance
+import time
+from point_cloud import downsample_to_budget, cluster_boxes
+from clustering import make_clusterer
+from association import associate
+from tracking import TrackStore
+from config import (
+    OBSTACLE_CLUSTERER,
+    OBSTACLE_GRID_CELL_SIZE,
+    OBSTACLE_MIN_SAMPLES,
+    OBSTACLE_TRACK_CAPACITY,
+    OBSTACLE_TRACK_GATE,
+    OBSTACLE_TRACK_MIN_HITS,
+    OBSTACLE_TRACK_MAX_MISSES,
+    OBSTACLE_APPROACH_SPEED
+)
+
+# Frame intervals are clamped so a stall or a burst cannot blow up the Kalman predict
+MIN_FRAME_DT = 0.01
+MAX_FRAME_DT = 1.0
+
+def default_clusterer(name=OBSTACLE_CLUSTERER):
+    if name == "grid":
+        return make_clusterer(name, cell_size=OBSTACLE_GRID_CELL_SIZE, min_samples=OBSTACLE_MIN_SAMPLES)
+    return make_clusterer(name)
 
 class ObstacleDetector:
-    def __init__(self, simulation=True):
+    def __init__(self, simulation=True, clusterer=None):
         self.simulation = simulation
+        self.clusterer = clusterer if clusterer is not None else default_clusterer()
         self.RADIUS_THRESHOLD = 2000  # mm
-        self.object_tracker = {}
-        self.cluster_movement_history = defaultdict(list)
-        self.previous_clusters = []
+        self.tracks = TrackStore(
+            capacity=OBSTACLE_TRACK_CAPACITY,
+            gate=OBSTACLE_TRACK_GATE,
+            min_hits=OBSTACLE_TRACK_MIN_HITS,
+            max_misses=OBSTACLE_TRACK_MAX_MISSES
+        )
+        self.approach_speed = OBSTACLE_APPROACH_SPEED
+        self._last_timestamp = None
 
     def generate_simulated_data(self, num_points=100):
         """Generate random LiDAR-like points with some clustered structure"""
@@ -53,114 +79,138 @@ class ObstacleDetector:
             "theta": theta
         }
 
-    def is_moving_towards_lidar(self, movement_history, threshold=4):
+    def calculate_oriented_box(self, cluster_points):
         """
-        Determine if a cluster is consistently moving toward the LiDAR.
+        Calculate an oriented (PCA-aligned) bounding box for a single cluster of points.
+        process_frame uses cluster_boxes to do this for all clusters at once.
+        Parameters:
+            cluster_points (np.ndarray): Array of points in the cluster (x, y).
+        Returns:
+            bounding_box (dict): Dictionary containing bounding box center (x, y),
+                                width (along theta), height, and rotation angle theta.
         """
-        return sum(movement < 0 for movement in movement_history) >= threshold
+        boxes, _, _ = cluster_boxes(cluster_points, np.zeros(len(cluster_points), dtype=np.int64))
+        _, _, _, _, _, _, center_x, center_y, width, height, theta = boxes[0].tolist()
+        
+        return {
+            "center": (center_x, center_y),
+            "width": width,
+            "height": height,
+            "theta": theta
+        }
+
+    def _frame_dt(self, timestamp):
+        if timestamp is None:
+            timestamp = time.monotonic()
+        dt = MAX_FRAME_DT if self._last_timestamp is None else timestamp - self._last_timestamp
+        self._last_timestamp = timestamp
+        return float(np.clip(dt, MIN_FRAME_DT, MAX_FRAME_DT))
 
-    def process_frame(self):
-        """Process a single frame of LiDAR data"""
-        if self.simulation:
+    def process_frame(self, points=None, max_points=None, timestamp=None):
+        """
+        Process a single frame of LiDAR data.
+        Real scans are passed in as an (n, 2) or (n, 3) array; only x and y are used.
+        Clustering always uses every point; max_points only limits the points
+        returned for display. timestamp (seconds) sets the tracker's time step and
+        defaults to the time of the call.
+        """
+        if points is None:
+            if not self.simulation:
+                raise ValueError("process_frame needs scan points when not in simulation mode")
             points = self.generate_simulated_data()
-        else:
-            # Here you would get real LiDAR data
-            pass
+        points = np.asarray(points, dtype=float)
+        dt = self._frame_dt(timestamp)
+
+        if len(points) == 0:
+            # Still age the tracks so obstacles that vanished eventually expire
+            self.tracks.step(np.empty((0, 2)), dt)
+            return {
+                "points": [],
+                "clusters": [],
+                "tracks": self.track_summaries(),
+                "radius_threshold": float(self.RADIUS_THRESHOLD)
+            }
+        points = points[:, :2]
 
         # Perform clustering
-        X_scaled = StandardScaler().fit_transform(points)
-        db = DBSCAN(eps=0.3, min_samples=10).fit(X_scaled)
-        
-        labels = db.labels_
-        unique_labels = set(labels)
-        
-        # Process clusters and create response data
-        current_clusters = []
+        labels = self.clusterer.fit(points)
+
+        # Boxes for every cluster in one batched pass; dicts are only built for the response
+        boxes, order, starts = cluster_boxes(points, labels)
+        members = np.split(points[order], starts[1:]) if len(starts) else []
+
         clusters_data = []
-        
-        for k in unique_labels:
-            if k == -1:  # Skip noise points
-                continue
-            
-            class_member_mask = (labels == k)
-            cluster_points = points[class_member_mask]
-            
-            # Calculate bounding box with theta
-            bounding_box = self.calculate_bounding_box(cluster_points)
-            current_clusters.append(bounding_box)
-            
+        for box, cluster_points in zip(boxes.tolist(), members):
+            _, _, center_x, center_y, width, height, obb_x, obb_y, obb_length, obb_width, theta = box
+            # Top-level box stays axis-aligned, which is what the frontend draws
             clusters_data.append({
-                "center": bounding_box["center"],
-                "width": bounding_box["width"],
-                "height": bounding_box["height"],
-                "theta": bounding_box["theta"],
+                "center": (center_x, center_y),
+                "width": width,
+                "height": height,
+                "theta": 0.0,
+                "oriented_box": {
+                    "center": (obb_x, obb_y),
+                    "length": obb_length,
+                    "width": obb_width,
+                    "theta": theta
+                },
                 "points": cluster_points.tolist()
             })
 
-        # Match clusters with previous frame
-        matches, unmatched_prev, unmatched_curr = self.match_clusters(
-            current_clusters, self.previous_clusters
-        )
+        # Associate clusters with tracks and run the Kalman update
+        centers = boxes[:, 2:4]
+        slots = self.tracks.step(centers, dt)
 
-        # Update tracking data
-        for prev_idx, curr_idx in matches:
-            prev_box = self.previous_clusters[prev_idx]
-            curr_box = current_clusters[curr_idx]
-            
-            # Calculate movement toward LiDAR
-            movement = float(
-                np.linalg.norm(prev_box["center"]) - 
-                np.linalg.norm(curr_box["center"])
-            )
-            
-            object_id = self.object_tracker.get(
-                str(prev_box["center"]), len(self.object_tracker) + 1
-            )
-            self.object_tracker[str(curr_box["center"])] = object_id
-            
-            # Update movement history
-            self.cluster_movement_history[object_id].append(movement)
-            if len(self.cluster_movement_history[object_id]) > 4:
-                self.cluster_movement_history[object_id].pop(0)
-            
-            moving_towards = bool(self.is_moving_towards_lidar(
-                self.cluster_movement_history[object_id]
-            ))
-            
-            clusters_data[curr_idx]["id"] = object_id
-            clusters_data[curr_idx]["movement"] = movement
-            clusters_data[curr_idx]["moving_towards_lidar"] = moving_towards
-
-        # Update previous clusters for next frame
-        self.previous_clusters = current_clusters
+        for curr_idx, slot in enumerate(slots.tolist()):
+            if slot < 0 or self.tracks.hits[slot] < self.tracks.min_hits:
+                continue
+            radial_velocity = float(self.tracks.radial_velocity([slot])[0])
+            clusters_data[curr_idx]["id"] = int(self.tracks.ids[slot])
+            clusters_data[curr_idx]["velocity"] = self.tracks.state[slot, 2:].tolist()
+            # Range decrease over this frame, positive when closing in
+            clusters_data[curr_idx]["movement"] = -radial_velocity * dt
+            clusters_data[curr_idx]["moving_towards_lidar"] = radial_velocity < -self.approach_speed
 
         # Prepare response data
         response_data = {
-            "points": points.tolist(),
+            "points": downsample_to_budget(points, max_points).tolist(),
             "clusters": clusters_data,
+            "tracks": self.track_summaries(),
             "radius_threshold": float(self.RADIUS_THRESHOLD)
         }
         
         return response_data
 
+    def track_summaries(self):
+        """Confirmed tracks, including ones coasting on prediction after a missed frame"""
+        slots = np.flatnonzero(self.tracks.confirmed)
+        radial_velocity = self.tracks.radial_velocity(slots)
+        return [
+            {
+                "id": int(track_id),
+                "center": state[:2],
+                "velocity": state[2:],
+                "misses": int(misses),
+                "moving_towards_lidar": bool(radial < -self.approach_speed)
+            }
+            for track_id, state, misses, radial in zip(
+                self.tracks.ids[slots], self.tracks.state[slots].tolist(),
+                self.tracks.misses[slots], radial_velocity
+            )
+        ]
+
     def match_clusters(self, current_clusters, previous_clusters, max_distance=200):
-        matches = []
-        unmatched_current = set(range(len(current_clusters)))
-        unmatched_previous = set(range(len(previous_clusters)))
-
-        for i, current in enumerate(current_clusters):
-            min_dist = float("inf")
-            matched_prev = None
-            for j, previous in enumerate(previous_clusters):
-                dist = distance.euclidean(
-                    current["center"], previous["center"]
-                )
-                if dist < min_dist and dist <= max_distance:
-                    min_dist = dist
-                    matched_prev = j
-            if matched_prev is not None:
-                matches.append((matched_prev, i))
-                unmatched_previous.discard(matched_prev)
-                unmatched_current.discard(i)    
-
-        return matches, list(unmatched_previous), list(unmatched_current)
\ No newline at end of file
+        """
+        Match current clusters to previous ones by center distance.
+        Each previous cluster is claimed by at most one current cluster.
+        Returns (matches, unmatched_previous, unmatched_current) where matches are
+        (prev_idx, curr_idx) pairs.
+        """
+        current_centers = [cluster["center"] for cluster in current_clusters]
+        previous_centers = [cluster["center"] for cluster in previous_clusters]
+        prev_idx, curr_idx = associate(previous_centers, current_centers, max_distance)
+
+        matches = list(zip(prev_idx.tolist(), curr_idx.tolist()))
+        unmatched_previous = sorted(set(range(len(previous_clusters))) - set(prev_idx.tolist()))
+        unmatched_current = sorted(set(range(len(current_clusters))) - set(curr_idx.tolist()))
+        return matches, unmatched_previous, unmatched_current
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class UploadError(Exception):
+    """Raised for upload requests that cannot be applied; carries the HTTP status to return"""
+
+    def __init__(self, status_code: int, detail: str, offset: Optional[int] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.offset = offset
+
+
+def safe_file_name(file_name: Optional[str]) -> str:
+    """Strip any directory components so uploads cannot escape their media directory"""
+    name = Path(file_name or "").name
+    if not name or name in (".", ".."):
+        raise UploadError(400, "invalid file name.")
+    return name
+
+
+class UploadSession:
+    """
+    A resumable upload: bytes go to <id>.part and the session metadata to <id>.json,
+    both in the upload directory, so an interrupted upload can continue after a restart.
+    The current offset is always the size of the .part file.
+    """
+
+    def __init__(self, directory: Path, upload_id: str, meta: dict):
+        self.upload_id = upload_id
+        self.meta = meta
+        self.part_path = directory / f"{upload_id}.part"
+        self.meta_path = directory / f"{upload_id}.json"
+        self.lock = asyncio.Lock()
+
+    @property
+    def destination(self) -> Path:
+        return Path(self.meta["destination"])
+
+    @property
+    def size(self) -> Optional[int]:
+        return self.meta.get("size")
+
+    def offset(self) -> int:
+        try:
+            return self.part_path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def describe(self) -> dict:
+        return {
+            "upload_id": self.upload_id,
+            "file_name": self.meta["file_name"],
+            "file_type": self.meta["file_type"],
+            "size": self.size,
+            "offset": self.offset(),
+        }
+
+
+class UploadStore:
+    """Creates, resumes and finalizes streaming uploads without holding file contents in memory"""
+
+    def __init__(self, directory: Path, buffer_bytes: int, max_bytes: int, expiry: float):
+        self.directory = Path(directory)
+        self.buffer_bytes = buffer_bytes
+        self.max_bytes = max_bytes
+        self.expiry = expiry
+        self._sessions: Dict[str, UploadSession] = {}
+        self.directory.mkdir(exist_ok=True)
+
+    def create(self, file_name: str, file_type: str, destination: Path, size: Optional[int]) -> UploadSession:
+        if size is not None and (size < 0 or size > self.max_bytes):
+            raise UploadError(413, f"upload size must be between 0 and {self.max_bytes} bytes.")
+        self.remove_expired()
+        upload_id = uuid.uuid4().hex
+        meta = {
+            "file_name": file_name,
+            "file_type": file_type,
+            "destination": str(destination),
+            "size": size,
+            "created": time.time(),
+        }
+        session = UploadSession(self.directory, upload_id, meta)
+        session.part_path.touch()
+        session.meta_path.write_text(json.dumps(meta))
+        self._sessions[upload_id] = session
+        return session
+
+    def get(self, upload_id: str) -> UploadSession:
+        session = self._sessions.get(upload_id)
+        if session is None:
+            # Sessions started before a restart are picked up from their metadata file
+            meta_path = self.directory / f"{Path(upload_id).name}.json"
+            if not meta_path.exists():
+                raise UploadError(404, "upload not found.")
+            session = UploadSession(self.directory, meta_path.stem, json.loads(meta_path.read_text()))
+            self._sessions[session.upload_id] = session
+        return session
+
+    async def write(self, session: UploadSession, offset: int, chunks: AsyncIterator[bytes]) -> int:
+        """
+        Append a request body to the session starting at offset, which must equal the
+        bytes already stored. Returns the new offset. Disk writes run in a worker thread
+        in blocks of buffer_bytes, so memory stays flat regardless of the file size.
+        """
+        if session.lock.locked():
+            raise UploadError(409, "upload is already receiving data.", session.offset())
+        async with session.lock:
+            current = session.offset()
+            if offset != current:
+                raise UploadError(409, f"offset {offset} does not match stored {current}.", current)
+
+            limit = session.size if session.size is not None else self.max_bytes
+            f = await asyncio.to_thread(open, session.part_path, "ab")
+            try:
+                buffer = bytearray()
+                written = current
+                async for chunk in chunks:
+                    buffer += chunk
+                    if written + len(buffer) > limit:
+                        raise UploadError(413, "upload is larger than its declared size.", written)
+                    if len(buffer) >= self.buffer_bytes:
+                        await asyncio.to_thread(f.write, buffer)
+                        written += len(buffer)
+                        buffer = bytearray()
+                if buffer:
+                    await asyncio.to_thread(f.write, buffer)
+                    written += len(buffer)
+            finally:
+                # Whatever reached the disk before a disconnect stays; the client resumes from there
+                await asyncio.to_thread(f.close)
+            return written
+
+    async def complete(self, session: UploadSession) -> Path:
+        """Atomically move the finished upload into place and forget the session"""
+        async with session.lock:
+            offset = session.offset()
+            if session.size is not None and offset != session.size:
+                raise UploadError(409, f"upload has {offset} of {session.size} bytes.", offset)
+            destination = session.destination
+            await asyncio.to_thread(self._finalize, session, destination)
+            self._sessions.pop(session.upload_id, None)
+            return destination
+
+    @staticmethod
+    def _finalize(session: UploadSession, destination: Path):
+        with open(session.part_path, "rb+") as f:
+            os.fsync(f.fileno())
+        # Same filesystem, so readers see either the old file or the complete new one
+        os.replace(session.part_path, destination)
+        session.meta_path.unlink(missing_ok=True)
+
+    def abort(self, session: UploadSession):
+        self._sessions.pop(session.upload_id, None)
+        session.part_path.unlink(missing_ok=True)
+        session.meta_path.unlink(missing_ok=True)
+
+    def remove_expired(self):
+        cutoff = time.time() - self.expiry
+        for meta_path in self.directory.glob("*.json"):
+            try:
+                if meta_path.stat().st_mtime < cutoff and meta_path.with_suffix(".part").stat().st_mtime < cutoff:
+                    logger.info(f"Removing expired upload {meta_path.stem}")
+                    self._sessions.pop(meta_path.stem, None)
+                    meta_path.with_suffix(".part").unlink(missing_ok=True)
+                    meta_path.unlink(missing_ok=True)
+            except FileNotFoundError:
+                continue
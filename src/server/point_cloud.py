@@ -0,0 +1,139 @@
+import numpy as np
+
+# Downsampling methods understood by downsample_to_budget
+ANGULAR = "angular"
+VOXEL = "voxel"
+
+
+def voxel_downsample(points, voxel_size):
+    """
+    Replace the points in each occupied grid cell (voxel in 3D) by their centroid.
+    Parameters:
+        points (np.ndarray): Array of points, shape (n, 2) or (n, 3).
+        voxel_size (float): Edge length of a cell in the same units as the points.
+    Returns:
+        np.ndarray: One centroid per occupied cell, float32.
+    """
+    points = np.asarray(points, dtype=np.float32)
+    if len(points) == 0:
+        return points.reshape(0, points.shape[1] if points.ndim == 2 else 2)
+
+    cells = np.floor(points / voxel_size).astype(np.int64)
+    cells -= cells.min(axis=0)
+    # Collapse the cell coordinates into one integer key so a 1D unique suffices
+    keys = np.ravel_multi_index(cells.T, cells.max(axis=0) + 1)
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+
+    centroids = np.empty((len(counts), points.shape[1]), dtype=np.float32)
+    for dim in range(points.shape[1]):
+        centroids[:, dim] = np.bincount(inverse, weights=points[:, dim]) / counts
+    return centroids
+
+
+def angular_min_range(points, n_bins):
+    """
+    Keep the nearest point in each of n_bins equal angular sectors around the sensor.
+    This preserves the closest obstacle in every direction, which is what matters
+    for avoidance, while bounding the output to n_bins points.
+    """
+    points = np.asarray(points, dtype=np.float32)
+    if len(points) == 0:
+        return points
+
+    angles = np.arctan2(points[:, 1], points[:, 0])
+    ranges = np.hypot(points[:, 0], points[:, 1])
+    bins = ((angles + np.pi) * (n_bins / (2 * np.pi))).astype(np.int64)
+    np.clip(bins, 0, n_bins - 1, out=bins)
+
+    # Sort by bin then range so the first entry of each bin is its nearest point
+    order = np.lexsort((ranges, bins))
+    sorted_bins = bins[order]
+    first = np.flatnonzero(np.r_[True, sorted_bins[1:] != sorted_bins[:-1]])
+    return points[order[first]]
+
+
+def downsample_to_budget(points, max_points, method=ANGULAR):
+    """
+    Reduce a scan to at most max_points points.
+    Returns the input unchanged when it already fits the budget.
+    """
+    if max_points is None or max_points <= 0 or len(points) <= max_points:
+        return points
+
+    if method == ANGULAR:
+        return angular_min_range(points, max_points)
+    if method == VOXEL:
+        points = np.asarray(points, dtype=np.float32)
+        extent = np.ptp(points[:, :2], axis=0)
+        area = max(float(extent[0] * extent[1]), 1e-6)
+        voxel_size = np.sqrt(area / max_points)
+        reduced = voxel_downsample(points, voxel_size)
+        # Occupancy is rarely uniform, so grow the cell until the budget is met
+        while len(reduced) > max_points:
+            voxel_size *= 1.5
+            reduced = voxel_downsample(points, voxel_size)
+        return reduced
+    raise ValueError(f"Unknown downsampling method: {method}")
+
+
+# Columns of the array returned by cluster_boxes
+BOX_COLUMNS = (
+    "label", "count",
+    "center_x", "center_y", "width", "height",  # axis-aligned box
+    "obb_center_x", "obb_center_y", "obb_length", "obb_width", "theta",  # PCA-oriented box
+)
+
+
+def cluster_boxes(points, labels):
+    """
+    Axis-aligned and oriented bounding boxes for every cluster in one pass.
+
+    Points are sorted by label once and every statistic is a segmented reduction
+    (np.*.reduceat), so the cost is O(n log n) regardless of the cluster count.
+    The oriented box is aligned with each cluster's principal axis; theta is the
+    angle of its long side from the x axis.
+    Returns:
+        boxes (np.ndarray): One row per cluster with the columns in BOX_COLUMNS.
+        order (np.ndarray): Point indices sorted by cluster (noise excluded).
+        starts (np.ndarray): Start offset of each cluster within order.
+    """
+    points = np.asarray(points, dtype=float)[:, :2]
+    labels = np.asarray(labels)
+    member = np.flatnonzero(labels >= 0)
+    if len(member) == 0:
+        return np.empty((0, len(BOX_COLUMNS))), member, member
+
+    order = member[np.argsort(labels[member], kind="stable")]
+    sorted_labels = labels[order]
+    sorted_points = points[order]
+    starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+    counts = np.diff(np.r_[starts, len(order)])
+
+    mins = np.minimum.reduceat(sorted_points, starts, axis=0)
+    maxs = np.maximum.reduceat(sorted_points, starts, axis=0)
+    means = np.add.reduceat(sorted_points, starts, axis=0) / counts[:, None]
+
+    # Principal axis from the per-cluster covariance
+    centered = sorted_points - np.repeat(means, counts, axis=0)
+    cxx = np.add.reduceat(centered[:, 0] * centered[:, 0], starts)
+    cyy = np.add.reduceat(centered[:, 1] * centered[:, 1], starts)
+    cxy = np.add.reduceat(centered[:, 0] * centered[:, 1], starts)
+    theta = 0.5 * np.arctan2(2 * cxy, cxx - cyy)
+
+    # Project every point onto its cluster's axes and take the extents
+    cos_t, sin_t = np.cos(theta), np.sin(theta)
+    point_cos, point_sin = np.repeat(cos_t, counts), np.repeat(sin_t, counts)
+    u = centered[:, 0] * point_cos + centered[:, 1] * point_sin
+    v = -centered[:, 0] * point_sin + centered[:, 1] * point_cos
+    u_min, u_max = np.minimum.reduceat(u, starts), np.maximum.reduceat(u, starts)
+    v_min, v_max = np.minimum.reduceat(v, starts), np.maximum.reduceat(v, starts)
+    u_mid, v_mid = (u_min + u_max) / 2, (v_min + v_max) / 2
+
+    boxes = np.column_stack([
+        sorted_labels[starts], counts,
+        (mins + maxs) / 2, maxs - mins,
+        means[:, 0] + u_mid * cos_t - v_mid * sin_t,
+        means[:, 1] + u_mid * sin_t + v_mid * cos_t,
+        u_max - u_min, v_max - v_min, theta,
+    ])
+    return boxes, order, starts
@@ -1,20 +1,46 @@
 from fastapi import APIRouter, WebSocket, HTTPException
 from fastapi.websockets import WebSocketDisconnect
-import httpx
+from typing import Optional
 import time
+import json
 import asyncio
 import logging
-from websocket_manager import WebSocketManager
-from config import CAMERA_SERVICE_URL
+from websocket_manager import WebSocketManager, LATEST_ONLY
+from config import (
+    CAMERA_SERVICE_URL,
+    CAMERA_SERVICE_TIMEOUT,
+    DETECTION_RECORDING_DIR,
+    DETECTION_SEGMENT_BYTES,
+    DETECTION_SEGMENT_SECONDS,
+    DETECTION_FSYNC_INTERVAL,
+    DETECTION_RECORDING_MAX_BYTES
+)
+from detection_frames import DetectionFrame, DetectionFrameError
+from detection_stream import AdaptiveDelivery, ingest_rate
+from detection_recorder import DetectionRecorder, ReplayCursor, list_segments
+from service_client import ServiceUnavailable, service_pool
+from routers.status import status_poller
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 detection_frontend_ws_manager = WebSocketManager(name="detection_frontend")
 pi_detection_ws_manager = WebSocketManager(name="pi_detection")
+camera_service = service_pool.service("camera", CAMERA_SERVICE_URL, CAMERA_SERVICE_TIMEOUT)
+# Started and stopped with the app (see main.py)
+recorder = DetectionRecorder(
+    DETECTION_RECORDING_DIR,
+    segment_bytes=DETECTION_SEGMENT_BYTES,
+    segment_seconds=DETECTION_SEGMENT_SECONDS,
+    fsync_interval=DETECTION_FSYNC_INTERVAL,
+    max_bytes=DETECTION_RECORDING_MAX_BYTES
+)
 
 @router.websocket("/ws/detection_stream")
-async def detection_stream_websocket_endpoint(websocket: WebSocket):
-    await detection_frontend_ws_manager.connect(websocket)
+async def detection_stream_websocket_endpoint(websocket: WebSocket, format: Optional[str] = None):
+    # format=binary receives header + raw JPEG frames instead of base64 JSON.
+    # Each viewer keeps only the newest frame and adapts its own quality.
+    client = await detection_frontend_ws_manager.connect(websocket, overflow=LATEST_ONLY, format=format)
+    client.encoder = AdaptiveDelivery(client, binary=format == "binary")
     
     try:
         while True:
@@ -29,36 +55,42 @@ async def detection_stream_websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         print(f"Detection WebSocket error: {e}")
     finally:
-        await detection_frontend_ws_manager.disconnect()
+        await detection_frontend_ws_manager.disconnect(websocket)
 
 @router.websocket("/ws/detection")
 async def detection_websocket_endpoint(websocket: WebSocket):
     await pi_detection_ws_manager.connect(websocket)
+    json_seq = 0
     
     try:
         while True:
             try:
-                # Receive frame data from Raspberry Pi
-                data = await websocket.receive_json()
-                logger.info("Received frame data from Raspberry Pi")
-                
-                # Forward the frame data to frontend client
-                detection_frame = {
-                    "type": "detection_frame",
-                    "data": {
-                        "timestamp": int(time.time()),
-                        "frame": data["frame"]
-                    }
-                }
-                
-                # Send to frontend if connection exists
-                if detection_frontend_ws_manager.connection:
-                    success = await detection_frontend_ws_manager.send_message(detection_frame)
-                    if not success:
-                        logger.warning("Failed to forward detection frame to frontend")
+                # Binary messages are header + JPEG; text messages are the legacy JSON format
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    logger.info("Pi detection WebSocket disconnected")
+                    break
+
+                ingest_rate.tick()
+                if message.get("bytes") is not None:
+                    frame = DetectionFrame.from_binary(message["bytes"])
                 else:
+                    data = json.loads(message["text"])
+                    json_seq += 1
+                    frame = DetectionFrame.from_base64(json_seq, time.time(), data["frame"])
+
+                # Hands the frame to the recorder thread; never waits on disk
+                recorder.record(frame)
+
+                if not detection_frontend_ws_manager.has_connections:
                     logger.warning("No frontend connection available to forward detection data")
+                    continue
+
+                # Every viewer gets the same frame object; formatting happens in its writer
+                detection_frontend_ws_manager.broadcast(frame)
                 
+            except DetectionFrameError as e:
+                logger.warning(f"Dropped malformed detection frame: {str(e)}")
             except WebSocketDisconnect:
                 logger.info("Pi detection WebSocket disconnected")
                 break
@@ -72,31 +104,153 @@ async def detection_websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         logger.error(f"Detection WebSocket error: {str(e)}")
     finally:
-        await pi_detection_ws_manager.disconnect()
+        await pi_detection_ws_manager.disconnect(websocket)
+
+class ReplayControl:
+    """Playback state shared between the replay loop and the control message reader"""
+
+    def __init__(self, speed: float):
+        self.speed = speed
+        self.paused = False
+        self.seek_to: Optional[float] = None
+        self.changed = asyncio.Event()
+
+    def apply(self, command: dict):
+        kind = command.get("type")
+        if kind == "seek":
+            self.seek_to = float(command["timestamp"])
+        elif kind == "speed" and float(command["value"]) > 0:
+            self.speed = float(command["value"])
+        elif kind == "pause":
+            self.paused = True
+        elif kind == "resume":
+            self.paused = False
+        else:
+            return
+        self.changed.set()
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """Sleep until timeout or a control change; True if something changed"""
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        changed = self.changed.is_set()
+        self.changed.clear()
+        return changed
+
+
+async def _read_replay_controls(websocket: WebSocket, control: ReplayControl):
+    while True:
+        message = await websocket.receive_text()
+        try:
+            control.apply(json.loads(message))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            logger.warning(f"Ignored malformed replay control message: {message[:100]}")
+
+
+async def _replay_frames(websocket: WebSocket, cursor: ReplayCursor, control: ReplayControl, binary: bool):
+    # Frames are paced against the first frame after each (re)start, scaled by speed
+    anchor = None
+    while True:
+        if control.seek_to is not None:
+            control.changed.clear()
+            await asyncio.to_thread(cursor.seek, control.seek_to)
+            control.seek_to = None
+            anchor = None
+        if control.paused:
+            await control.wait()
+            anchor = None
+            continue
+
+        # mmap reads can fault in pages from disk, so they stay off the event loop
+        item = await asyncio.to_thread(cursor.next)
+        if item is None:
+            await websocket.send_json({"type": "replay_end"})
+            await control.wait()
+            anchor = None
+            continue
+
+        timestamp, packed = item
+        if anchor is None:
+            anchor = (time.monotonic(), timestamp)
+        delay = anchor[0] + (timestamp - anchor[1]) / control.speed - time.monotonic()
+        if delay > 0 and await control.wait(delay):
+            anchor = (time.monotonic(), timestamp)
+            if control.seek_to is not None or control.paused:
+                continue
+
+        if binary:
+            await websocket.send_bytes(packed)
+        else:
+            await websocket.send_text(DetectionFrame.from_binary(packed).json_text())
+
+
+@router.websocket("/ws/detection/replay")
+async def detection_replay_websocket_endpoint(websocket: WebSocket, start: Optional[float] = None,
+                                              end: Optional[float] = None, speed: float = 1.0,
+                                              format: Optional[str] = None):
+    # Plays recorded frames from start to end (capture timestamps, seconds) in the same
+    # formats as /ws/detection_stream. Clients steer playback with JSON messages:
+    # {"type": "seek", "timestamp": t}, {"type": "speed", "value": 2.0}, {"type": "pause"}, {"type": "resume"}
+    await websocket.accept()
+    if speed <= 0:
+        await websocket.close(code=1008, reason="speed must be positive")
+        return
+
+    control = ReplayControl(speed)
+    cursor = await asyncio.to_thread(ReplayCursor, DETECTION_RECORDING_DIR, start, end)
+    reader = asyncio.create_task(_read_replay_controls(websocket, control))
+    player = asyncio.create_task(_replay_frames(websocket, cursor, control, format == "binary"))
+    try:
+        done, _ = await asyncio.wait({reader, player}, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if not isinstance(task.exception(), (WebSocketDisconnect, type(None))):
+                logger.error(f"Detection replay error: {str(task.exception())}")
+    finally:
+        reader.cancel()
+        player.cancel()
+        await asyncio.gather(reader, player, return_exceptions=True)
+        cursor.close()
+
+@router.get("/detection/recordings")
+async def get_detection_recordings():
+    """Recorder status and the time range covered by each recorded segment"""
+    segments = await asyncio.to_thread(lambda: [segment.summary() for segment in list_segments(DETECTION_RECORDING_DIR)])
+    return {"recorder": recorder.stats(), "segments": segments}
+
+@router.post("/detection/recordings/start")
+async def start_detection_recording():
+    recorder.start()
+    return recorder.stats()
+
+@router.post("/detection/recordings/stop")
+async def stop_detection_recording():
+    await asyncio.to_thread(recorder.stop)
+    return recorder.stats()
 
 @router.post("/stream/start")
 async def start_stream():
     print("Forwarding start request to stream service")
-    async with httpx.AsyncClient() as client:
-        response = await client.post(f"{CAMERA_SERVICE_URL}/start", json={"name": "start"}, timeout=3)
+    try:
+        response = await camera_service.post("/start", json={"name": "start"})
         return response.json()
+    except ServiceUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 @router.post("/stream/stop")
 async def stop_stream():
     print("Forwarding stop request to stream service")
-    async with httpx.AsyncClient() as client:
-        response = await client.post(f"{CAMERA_SERVICE_URL}/stop", json={"name": "stop"}, timeout=3)
+    try:
+        response = await camera_service.post("/stop", json={"name": "stop"})
         return response.json()
+    except ServiceUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 @router.get("/stream/status")
 async def get_stream_status():
-    print("Checking stream service status")
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{CAMERA_SERVICE_URL}/status", timeout=3)
-            return response.json()
-    except httpx.TimeoutException:
-        return {"isStreaming": False, "error": "Request timed out"}
-    except Exception as e:
-        logger.error(f"Error checking stream status: {str(e)}")
-        return {"isStreaming": None, "error": str(e)}
+    # Served from the background poller's snapshot (see routers/status.py)
+    status = status_poller.get("camera")
+    if status["online"] and isinstance(status["status"], dict):
+        return status["status"]
+    return {"isStreaming": False if status["online"] is False else None, "error": status["error"]}
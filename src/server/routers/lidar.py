@@ -1,10 +1,32 @@
-from fastapi import APIRouter, HTTPException, WebSocket
+from fastapi import APIRouter, HTTPException, Request, WebSocket
 from fastapi.websockets import WebSocketDisconnect
-import httpx
+from typing import Optional
 import asyncio
+import json
 import logging
+import numpy as np
 from websocket_manager import WebSocketManager
-from config import LIDAR_SERVICE_URL
+from config import (
+    LIDAR_SERVICE_URL,
+    LIDAR_SERVICE_TIMEOUT,
+    LIDAR_DOWNSAMPLE_METHOD,
+    LIDAR_STREAM_QUANTUM,
+    LIDAR_STREAM_KEYFRAME_INTERVAL,
+    LIDAR_SERVER_DETECTION
+)
+from detection_pipeline import DetectionPipeline
+from service_client import ServiceUnavailable, service_pool
+from routers.status import status_poller
+from point_cloud import downsample_to_budget
+from lidar_codec import (
+    LIDAR_SCAN_CONTENT_TYPES,
+    LidarScanError,
+    LidarFrame,
+    LidarStreamEncoder,
+    decode_scan,
+    boxes_to_clusters,
+    clusters_to_boxes
+)
 import signal
 import sys
 
@@ -27,85 +49,168 @@ class LidarState:
 
 lidar_state = LidarState()
 lidar_ws_manager = WebSocketManager(name="lidar")
+lidar_service = service_pool.service("lidar", LIDAR_SERVICE_URL, LIDAR_SERVICE_TIMEOUT)
+
+def publish_scan(points, clusters, radius_threshold=14, labels=None):
+    """
+    Broadcast a scan to every lidar subscriber. Points are downsampled once per
+    requested level of detail; clients without a max_points get full resolution.
+    Clients using the delta codec get a LidarFrame that their writer encodes.
+    """
+    boxes = None
+    for (max_points, codec), clients in lidar_ws_manager.group_clients("max_points", "codec").items():
+        frame_points, frame_labels = points, labels
+        if max_points and len(points) > max_points:
+            # Per-point labels no longer line up once the scan is reduced
+            frame_points = downsample_to_budget(
+                np.asarray(points, dtype=np.float32), max_points, LIDAR_DOWNSAMPLE_METHOD
+            )
+            frame_labels = None
+
+        if codec == "delta":
+            if boxes is None:
+                boxes = clusters_to_boxes(clusters)
+            lidar_ws_manager.broadcast(LidarFrame(frame_points, frame_labels, boxes), clients)
+            continue
+
+        payload_points = frame_points.tolist() if isinstance(frame_points, np.ndarray) else frame_points
+        lidar_ws_manager.broadcast({
+            "type": "lidar",
+            "data": {
+                "points": payload_points,
+                "clusters": clusters,
+                "radius_threshold": radius_threshold
+            }
+        }, clients)
+
+def publish_detection(result):
+    """Broadcast clusters and tracks computed by the detection worker"""
+    lidar_ws_manager.broadcast({
+        "type": "lidar_detection",
+        "data": result
+    })
+
+detection_pipeline = DetectionPipeline(publish=publish_detection)
 
 @router.websocket("/ws/lidar")
-async def lidar_websocket_endpoint(websocket: WebSocket):
-    await lidar_ws_manager.connect(websocket)
+async def lidar_websocket_endpoint(websocket: WebSocket, max_points: Optional[int] = None,
+                                   codec: Optional[str] = None):
+    client = await lidar_ws_manager.connect(websocket, max_points=max_points, codec=codec)
+    if codec == "delta":
+        client.encoder = LidarStreamEncoder(
+            quantum=LIDAR_STREAM_QUANTUM, keyframe_interval=LIDAR_STREAM_KEYFRAME_INTERVAL
+        )
     
     try:
         while True:
             try:
-                await websocket.receive_text()
+                message = await websocket.receive_text()
+                # Delta clients ask for a keyframe after detecting a sequence gap
+                if client.encoder is not None and json.loads(message).get("type") == "resync":
+                    client.encoder.request_keyframe()
             
             except WebSocketDisconnect:
                 break
             except asyncio.CancelledError:
                 break
+            except (ValueError, AttributeError):
+                continue
             
     except Exception as e:
         print(f"WebSocket error: {e}")
     finally:
-        await lidar_ws_manager.disconnect()
+        await lidar_ws_manager.disconnect(websocket)
+
+def _json_scan(data: dict):
+    """Points and labels of a JSON scan as arrays; raises HTTPException(422) if they are malformed"""
+    try:
+        # float64 keeps the forwarded values exactly as the sender wrote them
+        points = np.asarray(data.get("scan_points", []), dtype=np.float64)
+        labels = np.asarray(data.get("point_labels", []), dtype=np.float64)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=422, detail="scan_points and point_labels must be numeric arrays.")
+    if points.size == 0:
+        points = points.reshape(0, 2)
+    if points.ndim != 2 or points.shape[1] < 2:
+        raise HTTPException(status_code=422, detail="scan_points must be a list of [x, y] points.")
+    if labels.size and (labels.ndim != 1 or len(labels) != len(points) or not np.all(labels == np.round(labels))):
+        raise HTTPException(status_code=422, detail="point_labels must hold one integer label per point.")
+    if not (np.isfinite(points).all() and np.isfinite(labels).all()):
+        raise HTTPException(status_code=422, detail="scan_points and point_labels must be finite.")
+    return points, labels.astype(np.int32) if labels.size else []
+
 
 @router.post("/lidar-data")
-async def receive_lidar_data(data: dict):
+async def receive_lidar_data(request: Request):
     try:
         logger.info("Received POST request to /lidar-data")
-        
-        # Extract data from the request
-        scan_points = data.get("scan_points", [])
-        bounding_boxes = data.get("bounding_boxes", [])
 
-        # Send the data immediately through WebSocket without any processing
-        lidar_data = {
-            "type": "lidar",
-            "data": {
-                "points": scan_points,
-                "clusters": bounding_boxes,
-                "radius_threshold": 14
-            }
-        }
-        
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type in LIDAR_SCAN_CONTENT_TYPES:
+            # Packed float32 scan: decoded straight into NumPy buffers
+            scan = decode_scan(await request.body())
+            scan_points = scan.points
+            point_labels = scan.labels
+            bounding_boxes = boxes_to_clusters(scan.points, scan.labels, scan.boxes)
+        else:
+            data = await request.json()
+            if not isinstance(data, dict):
+                raise HTTPException(status_code=422, detail="lidar data must be a JSON object.")
+            scan_points, point_labels = _json_scan(data)
+            bounding_boxes = data.get("bounding_boxes", [])
+
         # Update state before sending
         lidar_state.scan_points = scan_points
-        lidar_state.point_labels = data.get("point_labels", [])
+        lidar_state.point_labels = point_labels
         lidar_state.bounding_boxes = bounding_boxes
         
         # Send WebSocket message if connection exists
-        if lidar_ws_manager.connection:
-            success = await lidar_ws_manager.send_message(lidar_data)
-            if not success:
-                logger.warning("Failed to send lidar data via WebSocket")
+        if lidar_ws_manager.has_connections:
+            publish_scan(scan_points, bounding_boxes, labels=point_labels)
+
+        # Clustering and tracking run in the worker; results are published when ready
+        if LIDAR_SERVER_DETECTION and len(scan_points):
+            detection_pipeline.submit(scan_points)
 
         return {"status": "success"}
 
+    except LidarScanError as e:
+        logger.warning(f"Rejected malformed lidar scan: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logger.error(f"Error processing lidar data: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/lidar/detection/stats")
+async def get_detection_stats():
+    return detection_pipeline.stats()
+
 @router.post("/lidar/start")
 async def start_lidar():
     print("Forwarding start request to LiDAR service")
-    async with httpx.AsyncClient() as client:
-        response = await client.post(f"{LIDAR_SERVICE_URL}/start", json={"name": "start"}, timeout=3)
+    try:
+        response = await lidar_service.post("/start", json={"name": "start"})
         return response.json()
+    except ServiceUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 @router.post("/lidar/stop")
 async def stop_lidar():
     print("Forwarding stop request to LiDAR service")
-    async with httpx.AsyncClient() as client:
-        response = await client.post(f"{LIDAR_SERVICE_URL}/stop", json={"name": "stop"}, timeout=3)
+    try:
+        response = await lidar_service.post("/stop", json={"name": "stop"})
         return response.json()
+    except ServiceUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 @router.get("/lidar/status")
 async def get_status():
-    print("Checking LiDAR service status")
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{LIDAR_SERVICE_URL}/status", timeout=3)
-            return response.json()
-    except httpx.TimeoutException:
-        return {"isRunning": False, "error": "Request timed out"}
-    except Exception as e:
-        logger.error(f"Error checking LiDAR status: {str(e)}")
-        return {"isRunning": None, "error": str(e)}
\ No newline at end of file
+    # Served from the background poller's snapshot (see routers/status.py)
+    status = status_poller.get("lidar")
+    if status["online"] and isinstance(status["status"], dict):
+        return status["status"]
+    return {"isRunning": False if status["online"] is False else None, "error": status["error"]}
@@ -1,13 +1,36 @@
-from fastapi import APIRouter, HTTPException, WebSocket
+from fastapi import APIRouter, HTTPException, WebSocket, Query, Request
 from fastapi.websockets import WebSocketDisconnect
-import requests
 import json
-import base64
 import asyncio
 import logging
 from pathlib import Path
+from typing import Optional
 from websocket_manager import WebSocketManager
-from config import MAPPING_DIR, MAPPING_METADATA_DIR, MAPPING_SERVICE_URL
+from routers.thumbnails import schedule_thumbnails, thumbnail_service
+from mapping_store import MappingStore
+from mapping_ingest import (
+    MappingWriter, WriterBusy, write_base64, write_stream, staging_path, commit_staged, discard_staged
+)
+from map_tiles import TilePyramid
+from media_files import media_response
+from service_client import ServiceUnavailable, service_pool
+from config import (
+    MAPPING_DIR,
+    MAPPING_METADATA_DIR,
+    MAPPING_SERVICE_URL,
+    MAPPING_SERVICE_TIMEOUT,
+    MAPPING_DB_PATH,
+    MAPPING_TILE_DIR,
+    MAPPING_TILE_MIN_ZOOM,
+    MAPPING_TILE_MAX_ZOOM,
+    MAPPING_CAMERA_HFOV,
+    MAPPING_TILE_MAX_AGE,
+    MAPPING_WRITE_WORKERS,
+    MAPPING_WRITE_MAX_PENDING,
+    MAPPING_WRITE_WAIT_TIMEOUT,
+    MAPPING_BATCH_MAX_IMAGES,
+    MAPPING_BATCH_MAX_IN_FLIGHT
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -17,6 +40,13 @@ mapping_ws_manager = WebSocketManager(name="mapping")
 MAPPING_DIR.mkdir(exist_ok=True)
 MAPPING_METADATA_DIR.mkdir(exist_ok=True)
 
+# Existing JSON sidecars are imported on startup (see main.py)
+mapping_store = MappingStore(MAPPING_DB_PATH)
+mapping_service = service_pool.service("mapping", MAPPING_SERVICE_URL, MAPPING_SERVICE_TIMEOUT)
+mapping_writer = MappingWriter(MAPPING_WRITE_WORKERS, MAPPING_WRITE_MAX_PENDING, MAPPING_WRITE_WAIT_TIMEOUT)
+# Started and stopped with the app (see main.py)
+tile_pyramid = TilePyramid(MAPPING_TILE_DIR, MAPPING_TILE_MIN_ZOOM, MAPPING_TILE_MAX_ZOOM, MAPPING_CAMERA_HFOV)
+
 @router.websocket("/ws/mapping")
 async def mapping_websocket_endpoint(websocket: WebSocket):
     await mapping_ws_manager.connect(websocket)
@@ -34,42 +64,43 @@ async def mapping_websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         print(f"Mapping WebSocket error: {e}")
     finally:
-        await mapping_ws_manager.disconnect()
+        await mapping_ws_manager.disconnect(websocket)
+
+def _image_path(image_id) -> Path:
+    image_id = str(image_id)
+    if not image_id or Path(image_id).name != image_id or image_id in (".", ".."):
+        raise HTTPException(status_code=400, detail=f"invalid image id: {image_id}")
+    return MAPPING_DIR / f"{image_id}.jpg"
+
+
+def _mapping_metadata(data: dict) -> dict:
+    # Extract geolocation and orientation data
+    return {
+        "image_url": f"/mapping_images/{data['image_id']}.jpg",
+        "image_id": str(data['image_id']),
+        "timestamp": data.get("timestamp", 0.0),
+        "latitude": data.get("lat", 0.0),
+        "longitude": data.get("lon", 0.0),
+        "altitude": data.get("alt", 0.0),
+        "yaw": data.get("yaw", 0.0)
+    }
+
+
+def _after_save(image_path: Path, metadata: dict):
+    schedule_thumbnails("mapping_images", image_path)
+    tile_pyramid.submit(image_path, metadata)
+
 
 @router.post("/mapping/upload")
 async def save_new_mapping(data: dict):
     try:        
         logger.info(f"Processing mapping upload for image ID: {data.get('image_id')}")
-        image_path = MAPPING_DIR / f"{data['image_id']}.jpg"
-        metadata_path = MAPPING_METADATA_DIR / f"{data['image_id']}.json"
-        
-        # Save the base64 encoded image data to a file
-        image_data_bytes = base64.b64decode(data["image_data"])
-        with open(image_path, 'wb') as f:
-            f.write(image_data_bytes)
-            
-        image_url = f"/mapping_images/{data['image_id']}.jpg"
+        image_path = _image_path(data['image_id'])
         
-        # Extract geolocation and orientation data
-        timestamp = data.get("timestamp", 0.0)
-        latitude = data.get("lat", 0.0)
-        longitude = data.get("lon", 0.0)
-        altitude = data.get("alt", 0.0)
-        yaw = data.get("yaw", 0.0)
-        
-        # Save metadata to JSON file
-        metadata = {
-            "image_url": image_url,
-            "image_id": data['image_id'],
-            "timestamp": timestamp,
-            "latitude": latitude,
-            "longitude": longitude,
-            "altitude": altitude,
-            "yaw": yaw
-        }
-        
-        with open(metadata_path, 'w') as f:
-            json.dump(metadata, f)
+        # Decode and write the base64 image data on the writer pool
+        await mapping_writer.run(write_base64, image_path, data["image_data"])
+        metadata = await asyncio.to_thread(mapping_store.upsert, _mapping_metadata(data))
+        _after_save(image_path, metadata)
         
         mapping_image = {
             "type": "mapping_image",
@@ -77,63 +108,142 @@ async def save_new_mapping(data: dict):
         }
         
         # Send via WebSocket if connection exists
-        if mapping_ws_manager.connection:
+        if mapping_ws_manager.has_connections:
             success = await mapping_ws_manager.send_message(mapping_image)
             if not success:
                 logger.warning("Failed to send mapping data via WebSocket")
                 
-        return {"status": "success", "image_url": image_url}
+        return {"status": "success", "image_url": metadata["image_url"]}
 
+    except WriterBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error saving mapping image: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/mapping/upload/batch")
+async def save_new_mapping_batch(request: Request):
+    """
+    Multipart upload of many images at once: a "metadata" field holding a JSON list of
+    the same objects /mapping/upload takes (without image_data), and one "images" file
+    part per entry, named <image_id>.jpg. Subscribers get a single "mapping_images" message.
+    """
+    try:
+        async with request.form(max_files=MAPPING_BATCH_MAX_IMAGES, max_fields=10) as form:
+            entries = json.loads(form.get("metadata") or "[]")
+            files = {Path(upload.filename or "").stem: upload for upload in form.getlist("images")}
+            if not isinstance(entries, list) or not entries:
+                raise HTTPException(status_code=400, detail="metadata must be a non-empty JSON list.")
+            image_ids = [str(entry.get("image_id")) for entry in entries]
+            if len(set(image_ids)) != len(image_ids):
+                raise HTTPException(status_code=400, detail="image ids in a batch must be unique.")
+            missing = [image_id for image_id in image_ids if image_id not in files]
+            if missing:
+                raise HTTPException(status_code=400, detail=f"no image part for: {', '.join(missing)}")
+
+            paths = [_image_path(entry["image_id"]) for entry in entries]
+            # Write every image to a staging file first and only move them into place once all
+            # succeed, so a batch that fails partway (e.g. WriterBusy) leaves no images behind
+            staged = [(staging_path(path), path) for path in paths]
+            results = await mapping_writer.run_all(write_stream, [
+                (staged_path, files[image_id].file) for (staged_path, _), image_id in zip(staged, image_ids)
+            ], MAPPING_BATCH_MAX_IN_FLIGHT)
+            errors = [result for result in results if isinstance(result, BaseException)]
+            if errors:
+                await asyncio.to_thread(discard_staged, staged)
+                raise errors[0]
+            await asyncio.to_thread(commit_staged, staged)
+            stored = await asyncio.to_thread(mapping_store.upsert_many, [_mapping_metadata(entry) for entry in entries])
+            for path, metadata in zip(paths, stored):
+                _after_save(path, metadata)
+
+        mapping_ws_manager.broadcast({"type": "mapping_images", "data": stored})
+        logger.info(f"Saved mapping batch of {len(stored)} images")
+        return {"status": "success", "image_urls": [metadata["image_url"] for metadata in stored]}
+
+    except WriterBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except HTTPException:
+        raise
+    except (ValueError, TypeError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=f"invalid batch: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error saving mapping batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/mapping/upload/stats")
+async def get_mapping_upload_stats():
+    return mapping_writer.stats()
     
 @router.get("/mapping/images")
-async def get_mapping_images():
+async def get_mapping_images(since_seq: Optional[int] = None, since_timestamp: Optional[float] = None,
+                             limit: Optional[int] = Query(None, ge=1)):
+    # Pass the returned last_seq back as since_seq to fetch only images added since
     try:
-        # Get all files in the directory and filter by common image extensions
-        image_extensions = {'.jpg', '.jpeg', '.png', '.JPG', '.JPEG', '.PNG'}
-        image_files = [f for f in MAPPING_DIR.iterdir() if f.is_file() and f.suffix in image_extensions]
-        
-        images_with_metadata = []
-        for image_file in image_files:
-            image_id = image_file.stem
-            metadata_path = MAPPING_METADATA_DIR / f"{image_id}.json"
-            
-            if metadata_path.exists():
-                with open(metadata_path, 'r') as f:
-                    metadata = json.load(f)
-                images_with_metadata.append(metadata)
-            else:
-                # Fallback if no metadata exists
-                images_with_metadata.append({
-                    "image_url": f"/mapping_images/{image_file.name}",
-                    "image_id": image_id,
-                    "timestamp": "",
-                    "latitude": 0.0,
-                    "longitude": 0.0,
-                    "altitude": 0.0,
-                    "yaw": 0.0
-                })
-        
-        return {"images": images_with_metadata}
+        images = await asyncio.to_thread(mapping_store.list_images, since_seq, since_timestamp, limit)
+        last_seq = images[-1]["seq"] if images else since_seq or 0
+        return {"images": images, "last_seq": last_seq, "has_more": limit is not None and len(images) == limit}
     except Exception as e:
         print(f"Error getting mapping images: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     
+@router.get("/mapping/images/bbox")
+async def get_mapping_images_in_bbox(min_lat: float = Query(..., ge=-90, le=90), min_lon: float = Query(..., ge=-180, le=180),
+                                     max_lat: float = Query(..., ge=-90, le=90), max_lon: float = Query(..., ge=-180, le=180),
+                                     limit: Optional[int] = Query(None, ge=1)):
+    # A min_lon greater than max_lon is a viewport that crosses the antimeridian
+    images = await asyncio.to_thread(mapping_store.within_bbox, min_lat, min_lon, max_lat, max_lon, limit)
+    return {"images": images}
+
+@router.get("/mapping/images/radius")
+async def get_mapping_images_in_radius(lat: float = Query(..., ge=-90, le=90), lon: float = Query(..., ge=-180, le=180),
+                                       radius_m: float = Query(..., gt=0), limit: Optional[int] = Query(None, ge=1)):
+    images = await asyncio.to_thread(mapping_store.within_radius, lat, lon, radius_m, limit)
+    return {"images": images}
+
+@router.get("/mapping/images/nearest")
+async def get_nearest_mapping_images(lat: float = Query(..., ge=-90, le=90), lon: float = Query(..., ge=-180, le=180),
+                                     k: int = Query(10, ge=1, le=1000)):
+    images = await asyncio.to_thread(mapping_store.nearest, lat, lon, k)
+    return {"images": images}
+
+@router.get("/tiles/stats")
+async def get_tile_stats():
+    return tile_pyramid.stats()
+
+@router.get("/tiles/{z}/{x}/{y}")
+async def get_tile(request: Request, z: int, x: int, y: str):
+    # Accept both /tiles/z/x/y and /tiles/z/x/y.png
+    y = y[:-len(".png")] if y.endswith(".png") else y
+    if not y.isdigit() or not MAPPING_TILE_MIN_ZOOM <= z <= MAPPING_TILE_MAX_ZOOM:
+        raise HTTPException(status_code=404, detail="tile not found.")
+    return media_response(request, tile_pyramid.tile(z, x, int(y)),
+                          cache_control=f"public, max-age={MAPPING_TILE_MAX_AGE}")
+
 @router.delete("/mapping/images/{image_id}")
 async def delete_mapping_image(image_id: str):
     try:
         image_path = MAPPING_DIR / f"{image_id}.jpg"
         metadata_path = MAPPING_METADATA_DIR / f"{image_id}.json"
+        metadata = await asyncio.to_thread(mapping_store.get, image_id)
         
         if image_path.exists():
             image_path.unlink()
+            thumbnail_service.forget("mapping_images", image_path.name)
         if metadata_path.exists():
             metadata_path.unlink()
+        await asyncio.to_thread(mapping_store.delete, image_id)
+        if metadata is not None and tile_pyramid.running:
+            # Redraw the tiles under the deleted image from the ones that remain
+            remaining = await asyncio.to_thread(mapping_store.list_images)
+            tile_pyramid.remove(metadata, [(MAPPING_DIR / f"{other['image_id']}.jpg", other) for other in remaining])
 
-        response = requests.delete(f"{MAPPING_SERVICE_URL}", json={"image_id": image_id}, timeout=3)
+        response = await mapping_service.delete(json={"image_id": image_id})
         return response.json()
+    except ServiceUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print(f"Error deleting mapping image: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -141,17 +251,26 @@ async def delete_mapping_image(image_id: str):
 @router.post("/mapping/start")
 async def start_mapping():
     print("Forwarding start request to mapping service")
-    response = requests.post(f"{MAPPING_SERVICE_URL}/start", json={"command": "start"}, timeout=3)
-    return response.json()
+    try:
+        response = await mapping_service.post("/start", json={"command": "start"})
+        return response.json()
+    except ServiceUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 @router.post("/mapping/stop")
 async def stop_mapping():
     print("Forwarding stop request to mapping service")
-    response = requests.post(f"{MAPPING_SERVICE_URL}/stop", json={"command": "stop"}, timeout=3) 
-    return response.json()
+    try:
+        response = await mapping_service.post("/stop", json={"command": "stop"})
+        return response.json()
+    except ServiceUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 @router.post("/mapping/generate")
 async def generate_mapping():
     print("Forwarding generate request to mapping service")
-    response = requests.post(f"{MAPPING_SERVICE_URL}/generate", json={"command": "generate"}, timeout=3)
-    return response.json() 
\ No newline at end of file
+    try:
+        response = await mapping_service.post("/generate", json={"command": "generate"})
+        return response.json()
+    except ServiceUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e)) 
\ No newline at end of file
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, HTTPException, WebSocket
+from fastapi import APIRouter, HTTPException, WebSocket, Request, Query
 from fastapi.websockets import WebSocketDisconnect
 from fastapi.responses import Response
+from typing import Optional
 import requests
 import json
 import base64
@@ -8,7 +9,18 @@ import asyncio
 import logging
 from pathlib import Path
 from websocket_manager import WebSocketManager
-from config import PICAMPIC_DIR, PICAMVID_DIR
+from picam_uploads import UploadError, UploadSession, UploadStore, safe_file_name
+from media_files import media_response
+from media_catalog import MediaCatalog
+from routers.thumbnails import schedule_thumbnails, thumbnail_service
+from config import (
+    PICAMPIC_DIR,
+    PICAMVID_DIR,
+    PICAM_UPLOAD_DIR,
+    PICAM_UPLOAD_BUFFER_BYTES,
+    PICAM_UPLOAD_MAX_BYTES,
+    PICAM_UPLOAD_EXPIRY
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -16,6 +28,42 @@ logger = logging.getLogger(__name__)
 PICAMPIC_DIR.mkdir(exist_ok=True)
 PICAMVID_DIR.mkdir(exist_ok=True)
 
+upload_store = UploadStore(
+    PICAM_UPLOAD_DIR,
+    buffer_bytes=PICAM_UPLOAD_BUFFER_BYTES,
+    max_bytes=PICAM_UPLOAD_MAX_BYTES,
+    expiry=PICAM_UPLOAD_EXPIRY
+)
+
+MEDIA_DIRS = {"image": PICAMPIC_DIR, "video": PICAMVID_DIR}
+MEDIA_SOURCES = {"image": "picam_images", "video": "picam_videos"}
+MEDIA_URLS = {file_type: f"/{source}" for file_type, source in MEDIA_SOURCES.items()}
+media_catalog = MediaCatalog(MEDIA_DIRS)
+
+
+def _media_path(file_type: str, file_name: str) -> Path:
+    if file_type not in MEDIA_DIRS:
+        raise HTTPException(status_code=400, detail='invalid file type.')
+    return MEDIA_DIRS[file_type] / file_name
+
+
+def _upload_http_error(e: UploadError) -> HTTPException:
+    # Upload-Offset tells the client where to resume after a conflict or a size error
+    headers = {"Upload-Offset": str(e.offset)} if e.offset is not None else None
+    return HTTPException(status_code=e.status_code, detail=e.detail, headers=headers)
+
+
+def _safe_name(file_name: str) -> str:
+    try:
+        return safe_file_name(file_name)
+    except UploadError as e:
+        raise _upload_http_error(e)
+
+
+def _write_file(file_path: Path, data: bytes):
+    with open(file_path, 'wb') as f:
+        f.write(data)
+
 @router.post("/picam/upload")
 async def save_new_picam(data : dict):
     print("uploading picam image/video")
@@ -32,9 +80,11 @@ async def save_new_picam(data : dict):
             raise HTTPException(status_code=400, detail='invalid file type.')
         print(file_path)
         
-        file_data_bytes = base64.b64decode(file)
-        with open(file_path, 'wb') as f:
-            f.write(file_data_bytes)
+        # Legacy base64 path; large files should use the streaming /picam/uploads endpoints
+        file_data_bytes = await asyncio.to_thread(base64.b64decode, file)
+        await asyncio.to_thread(_write_file, file_path, file_data_bytes)
+        media_catalog.add(file_type, file_path)
+        schedule_thumbnails(MEDIA_SOURCES[file_type], file_path)
             
         if file_type == 'image':
             file_url = f"/picam_images/{file_name}"
@@ -42,46 +92,125 @@ async def save_new_picam(data : dict):
             file_url = f"/picam_videos/{file_name}"
         return {"status": "success", f"{file_type}_url": file_url}
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error saving picam {file_type}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    
-@router.get("/picam/files")
-async def get_picam_files():
+
+# Streaming uploads. A client creates a session, PUTs the raw bytes (in one request or
+# several, each starting at the offset returned by the previous one) and completes it.
+# After an interruption, GET the session to find the offset to resume from.
+
+@router.post("/picam/uploads")
+async def create_picam_upload(data: dict):
     try:
-        image_files = [f.name for f in PICAMPIC_DIR.iterdir() if f.is_file]
-        video_files = [f.name for f in PICAMVID_DIR.iterdir() if f.is_file]
-        files = {
-            "images": image_files,
-            "videos": video_files
-        }
-        return files
-    
-    except Exception as e:
-        print(f"Error getting files: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        file_type = data.get('file_type')
+        file_name = safe_file_name(data.get('file_name'))
+        session = upload_store.create(file_name, file_type, _media_path(file_type, file_name), data.get('size'))
+        return session.describe()
+    except UploadError as e:
+        raise _upload_http_error(e)
+
+@router.get("/picam/uploads/{upload_id}")
+async def get_picam_upload(upload_id: str):
+    try:
+        return upload_store.get(upload_id).describe()
+    except UploadError as e:
+        raise _upload_http_error(e)
+
+async def _complete_upload(session: UploadSession) -> dict:
+    file_path = await upload_store.complete(session)
+    file_type = session.meta["file_type"]
+    media_catalog.add(file_type, file_path)
+    schedule_thumbnails(MEDIA_SOURCES[file_type], file_path)
+    return {"status": "success", f"{file_type}_url": f"{MEDIA_URLS[file_type]}/{file_path.name}"}
+
+@router.put("/picam/uploads/{upload_id}")
+async def write_picam_upload(upload_id: str, request: Request, offset: int = 0, complete: bool = False):
+    try:
+        session = upload_store.get(upload_id)
+        new_offset = await upload_store.write(session, offset, request.stream())
+        if complete:
+            return await _complete_upload(session)
+        return {"upload_id": upload_id, "offset": new_offset}
+    except UploadError as e:
+        raise _upload_http_error(e)
+
+@router.post("/picam/uploads/{upload_id}/complete")
+async def complete_picam_upload(upload_id: str):
+    try:
+        return await _complete_upload(upload_store.get(upload_id))
+    except UploadError as e:
+        raise _upload_http_error(e)
+
+@router.delete("/picam/uploads/{upload_id}")
+async def abort_picam_upload(upload_id: str):
+    try:
+        upload_store.abort(upload_store.get(upload_id))
+        return {"status": "success", "detail": f"upload {upload_id} aborted"}
+    except UploadError as e:
+        raise _upload_http_error(e)
+
+@router.post("/picam/upload/stream")
+async def stream_picam_upload(request: Request, file_name: str, file_type: str):
+    """Single-request streaming upload of a raw body"""
+    try:
+        file_name = safe_file_name(file_name)
+        size = request.headers.get("content-length")
+        session = upload_store.create(file_name, file_type, _media_path(file_type, file_name),
+                                      int(size) if size is not None else None)
+        try:
+            await upload_store.write(session, 0, request.stream())
+            return await _complete_upload(session)
+        except Exception:
+            upload_store.abort(session)
+            raise
+    except UploadError as e:
+        raise _upload_http_error(e)
     
-@router.get("/picam/files/{file_name}")
-async def get_picam_file(file_name: str, file_type: str):
+@router.get("/picam/files")
+async def get_picam_files(file_type: Optional[str] = None, sort: str = "mtime", order: str = "desc",
+                          since: Optional[float] = None, until: Optional[float] = None,
+                          offset: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=1)):
+    # since/until filter on modification time (unix seconds); pages come from the in-memory catalog.
+    # Without a limit every matching file is returned
     try:
-        if file_type == 'image':
-            file_path = PICAMPIC_DIR / file_name
-        elif file_type == 'video':
-            file_path = PICAMVID_DIR / file_name 
-        else:
-            raise HTTPException(status_code=400)
-        
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail='file not found.')
-        
-        with open(file_path, 'b') as f:
-            content = f.read()
-        return Response(content=content, media_type="application/octet-stream")
-        
-    except Exception as e:
-        print(f"Error getting file: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        await asyncio.to_thread(media_catalog.refresh)
+        total, entries = media_catalog.query(file_type, sort, order != "asc", since, until, offset, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    items = [
+        dict(
+            entry.to_dict(),
+            url=f"{MEDIA_URLS[entry.file_type]}/{entry.name}",
+            thumbnail_url=f"/thumbs{MEDIA_URLS[entry.file_type]}/{entry.name}"
+        )
+        for entry in entries
+    ]
+    return {
+        "images": [entry.name for entry in entries if entry.file_type == "image"],
+        "videos": [entry.name for entry in entries if entry.file_type == "video"],
+        "items": items,
+        "total": total,
+        "offset": offset,
+        "limit": limit
+    }
     
+@router.api_route("/picam/files/{file_name}", methods=["GET", "HEAD"])
+async def get_picam_file(request: Request, file_name: str, file_type: str):
+    return media_response(request, _media_path(file_type, _safe_name(file_name)))
+
+# Served here rather than through StaticFiles so browsers can seek videos with Range requests
+@router.api_route("/picam_images/{file_name}", methods=["GET", "HEAD"])
+async def serve_picam_image(request: Request, file_name: str):
+    return media_response(request, PICAMPIC_DIR / _safe_name(file_name))
+
+@router.api_route("/picam_videos/{file_name}", methods=["GET", "HEAD"])
+async def serve_picam_video(request: Request, file_name: str):
+    return media_response(request, PICAMVID_DIR / _safe_name(file_name))
+
 @router.delete("/picam/files/{file_name}")
 async def remove_picam_file(file_name: str, file_type: str):
     try:
@@ -93,9 +222,10 @@ async def remove_picam_file(file_name: str, file_type: str):
             raise HTTPException(status_code=400)
         
         if file_path.exists():
-            print("hi")
             try:
                 file_path.unlink()
+                media_catalog.remove(file_type, file_name)
+                thumbnail_service.forget(MEDIA_SOURCES[file_type], file_name)
                 return {"status": "success", "detail": f"{file_name} deleted"}
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,62 @@
+from fastapi import APIRouter, WebSocket
+from fastapi.websockets import WebSocketDisconnect
+import asyncio
+import logging
+from websocket_manager import WebSocketManager, LATEST_ONLY
+from service_client import service_pool
+from status_poller import StatusPoller
+from config import (
+    LIDAR_SERVICE_URL,
+    LIDAR_SERVICE_TIMEOUT,
+    CAMERA_SERVICE_URL,
+    CAMERA_SERVICE_TIMEOUT,
+    MAPPING_SERVICE_URL,
+    MAPPING_SERVICE_TIMEOUT,
+    STATUS_POLL_INTERVAL
+)
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+status_ws_manager = WebSocketManager(name="status")
+
+
+def publish_status(snapshot: dict):
+    status_ws_manager.broadcast({"type": "device_status", "data": snapshot})
+
+
+# Started and stopped with the app (see main.py); the services are the same ones the proxy routers use
+status_poller = StatusPoller(STATUS_POLL_INTERVAL, publish=publish_status)
+status_poller.watch("lidar", service_pool.service("lidar", LIDAR_SERVICE_URL, LIDAR_SERVICE_TIMEOUT))
+status_poller.watch("camera", service_pool.service("camera", CAMERA_SERVICE_URL, CAMERA_SERVICE_TIMEOUT))
+status_poller.watch("mapping", service_pool.service("mapping", MAPPING_SERVICE_URL, MAPPING_SERVICE_TIMEOUT))
+
+
+@router.get("/status")
+async def get_device_status():
+    """Latest polled health of every device service; never waits on the devices"""
+    return status_poller.snapshot()
+
+@router.get("/status/stats")
+async def get_status_poller_stats():
+    return status_poller.stats()
+
+@router.websocket("/ws/status")
+async def status_websocket_endpoint(websocket: WebSocket):
+    # Only the newest snapshot matters to a slow client
+    client = await status_ws_manager.connect(websocket, overflow=LATEST_ONLY)
+    status_ws_manager.broadcast({"type": "device_status", "data": status_poller.snapshot()}, [client])
+
+    try:
+        while True:
+            try:
+                await websocket.receive_text()
+
+            except WebSocketDisconnect:
+                break
+            except asyncio.CancelledError:
+                break
+
+    except Exception as e:
+        logger.error(f"Status WebSocket error: {str(e)}")
+    finally:
+        await status_ws_manager.disconnect(websocket)
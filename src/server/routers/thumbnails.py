@@ -0,0 +1,66 @@
+from fastapi import APIRouter, HTTPException, Request
+import logging
+from media_files import media_response
+from thumbnails import ThumbnailService, UndecodableMedia
+from config import (
+    MAPPING_DIR,
+    PICAMPIC_DIR,
+    PICAMVID_DIR,
+    THUMBNAIL_DIR,
+    THUMBNAIL_SIZES,
+    THUMBNAIL_QUALITY,
+    THUMBNAIL_WORKERS,
+    THUMBNAIL_CACHE_MAX_BYTES
+)
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Started and stopped with the app (see main.py)
+thumbnail_service = ThumbnailService(
+    THUMBNAIL_DIR,
+    sizes=THUMBNAIL_SIZES,
+    quality=THUMBNAIL_QUALITY,
+    max_bytes=THUMBNAIL_CACHE_MAX_BYTES,
+    workers=THUMBNAIL_WORKERS
+)
+
+# Thumbnail sources, named after the URL prefix the full-size files are served from
+THUMBNAIL_SOURCES = {
+    "picam_images": PICAMPIC_DIR,
+    "picam_videos": PICAMVID_DIR,
+    "mapping_images": MAPPING_DIR,
+}
+VIDEO_SOURCES = {"picam_videos"}
+
+
+def schedule_thumbnails(source: str, path):
+    """Called by upload handlers once a file is saved"""
+    thumbnail_service.schedule(source, path, video=source in VIDEO_SOURCES)
+
+
+@router.get("/thumbs/stats")
+async def get_thumbnail_stats():
+    return thumbnail_service.stats()
+
+@router.get("/thumbs/{source}/{file_name}")
+async def get_thumbnail(request: Request, source: str, file_name: str, size: int = THUMBNAIL_SIZES[0]):
+    if source not in THUMBNAIL_SOURCES:
+        raise HTTPException(status_code=404, detail="unknown thumbnail source.")
+    path = THUMBNAIL_SOURCES[source] / file_name
+    if path.parent != THUMBNAIL_SOURCES[source] or not path.is_file():
+        raise HTTPException(status_code=404, detail="file not found.")
+
+    try:
+        thumb = await thumbnail_service.thumbnail(source, path, size, video=source in VIDEO_SOURCES)
+    except UndecodableMedia as e:
+        # The file is on disk but is not media OpenCV can read; the request itself was fine
+        raise HTTPException(status_code=415, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting thumbnail for {file_name}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return media_response(request, thumb)
@@ -1,17 +1,37 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
 import asyncio
-import random
-import json
-from datetime import datetime
+import time
+from typing import Dict, Optional
 from websocket_manager import WebSocketManager
+from telemetry_source import TELEMETRY_FIELDS, TelemetrySource, parse_sample
+from alert_engine import AlertEngine, AlertRule
+from config import (
+    TELEMETRY_INTERVAL,
+    TELEMETRY_STALE_AFTER,
+    TELEMETRY_MAX_RATE,
+    TELEMETRY_RATE_STEPS,
+    ALERT_RULES,
+    ALERT_BUFFER_SAMPLES,
+    ALERT_RATE_WINDOW
+)
 import logging 
 import numpy as np
-import time
 
 router = APIRouter()
 ws_manager = WebSocketManager("warning-system")
 logger = logging.getLogger(__name__)
 
+# Last send time per max_rate group; clients asking for the same rate share one clock. Rates are
+# snapped to TELEMETRY_RATE_STEPS, so this holds at most one entry per step
+_rate_group_sent: Dict[Optional[float], float] = {}
+
+
+def _rate_step(max_rate: Optional[float]) -> Optional[float]:
+    """Round a requested max_rate down to a configured step (the lowest step if below all of them)"""
+    if not max_rate or max_rate <= 0:
+        return None
+    return max([step for step in TELEMETRY_RATE_STEPS if step <= max_rate], default=min(TELEMETRY_RATE_STEPS))
+
 def generate_telemetry_data():
     timestamp = time.time()
     pitch = 80 * np.sin(timestamp / 2)
@@ -25,34 +45,101 @@ def generate_telemetry_data():
         "yaw": float(yaw)
     }
 
+def publish_alerts(events: list):
+    # Alert transitions go to every client, whatever its telemetry max_rate
+    ws_manager.broadcast({"type": "alert", "data": events})
+
+alert_engine = AlertEngine(
+    [AlertRule.from_config(rule) for rule in ALERT_RULES],
+    TELEMETRY_FIELDS,
+    capacity=ALERT_BUFFER_SAMPLES,
+    rate_window=ALERT_RATE_WINDOW,
+    publish=publish_alerts
+)
+
+def publish_telemetry(sample: dict):
+    """
+    Run the alert rules on a sample, then broadcast it to every subscriber. Clients connected with ?max_rate=N (Hz)
+    are grouped by rate, and a group is skipped until 1/N seconds have passed since
+    it last got a sample, so the per-sample cost depends on the number of rates, not viewers.
+    """
+    # Only real attitude data raises alerts; the synthetic fallback is for display
+    if sample.get("source") == "ingest":
+        # Judged on the sender's timestamps, so a batch posted at once keeps its real spacing
+        alert_engine.evaluate(sample, now=sample["timestamp"])
+    elif alert_engine.ring.count:
+        # The live feed went stale: clear its alerts instead of leaving them frozen on
+        alert_engine.reset()
+    message = {"type": "telemetry", "data": sample}
+    now = time.monotonic()
+    for (max_rate,), clients in ws_manager.group_clients("max_rate").items():
+        if max_rate:
+            if now - _rate_group_sent.get(max_rate, 0.0) < 1.0 / max_rate:
+                continue
+            _rate_group_sent[max_rate] = now
+        ws_manager.broadcast(message, clients)
+
+# Started and stopped with the app (see main.py)
+telemetry_source = TelemetrySource(
+    TELEMETRY_INTERVAL,
+    stale_after=TELEMETRY_STALE_AFTER,
+    fallback=generate_telemetry_data,
+    publish=publish_telemetry
+)
+
+@router.post("/warning-system/telemetry")
+async def ingest_telemetry(request: Request):
+    """
+    Real attitude data ({timestamp?, pitch, roll, yaw}, or a list of them) replaces the synthetic feed.
+    Timestamps must increase, and every sample in a list needs one.
+    """
+    try:
+        data = await request.json()
+        if isinstance(data, list) and len(data) > 1:
+            # Without them the whole batch would be stamped within microseconds of each other
+            if not all(isinstance(sample, dict) and sample.get("timestamp") for sample in data):
+                raise ValueError("every sample in a batch needs a timestamp")
+        samples = [parse_sample(sample) for sample in (data if isinstance(data, list) else [data])]
+        telemetry_source.check_order(samples)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"invalid telemetry sample: {str(e)}")
+    for sample in samples:
+        telemetry_source.ingest(sample)
+    return {"status": "success", "received": len(samples)}
+
+@router.get("/warning-system/telemetry/stats")
+async def get_telemetry_stats():
+    return telemetry_source.stats()
+
+@router.get("/warning-system/alerts")
+async def get_alerts():
+    return {"active": alert_engine.active_alerts(), "rules": alert_engine.rule_configs()}
+
+@router.get("/warning-system/alerts/stats")
+async def get_alert_stats():
+    return alert_engine.stats()
+
 @router.websocket("/ws/warning-system")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, max_rate: Optional[float] = None):
+    # max_rate (Hz) caps how often this client is sent samples; omitted means every sample
+    client = await ws_manager.connect(websocket, max_rate=_rate_step(max_rate or TELEMETRY_MAX_RATE))
+    # Transitions are only pushed when they happen, so a new client starts from the current alert set
+    ws_manager.broadcast({"type": "alerts", "data": alert_engine.active_alerts()}, [client])
+    logger.info("Client connected to warning system websocket")
+
     try:
-        await ws_manager.connect(websocket)
-        logger.info("Client connected to warning system websocket")
-        
         while True:
-            if not ws_manager.connection:
-                logger.info("WebSocket disconnected, stopping data generation")
+            try:
+                await websocket.receive_text()
+
+            except WebSocketDisconnect:
+                logger.info("Client disconnected from warning system websocket")
                 break
-                
-            # Generate random attitude data
-            data = {
-                "type": "telemetry",
-                "data": generate_telemetry_data()
-            }
-            
-            success = await ws_manager.send_message(data)
-            if not success:
-                logger.info("Failed to send message, stopping data generation")
+            except asyncio.CancelledError:
                 break
-                
-            await asyncio.sleep(0.1)  # Send data every 100ms
-            
-    except WebSocketDisconnect:
-        logger.info("Client disconnected from warning system websocket")
+
     except Exception as e:
         logger.error(f"Error in warning system websocket: {str(e)}")
     finally:
-        await ws_manager.disconnect()
+        await ws_manager.disconnect(websocket)
         logger.info("Cleaned up warning system websocket connection")
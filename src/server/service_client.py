@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from config import (
+    SERVICE_CONNECT_TIMEOUT,
+    SERVICE_RETRIES,
+    SERVICE_BREAKER_THRESHOLD,
+    SERVICE_BREAKER_RESET,
+    SERVICE_MAX_CONNECTIONS,
+    SERVICE_MAX_KEEPALIVE
+)
+
+logger = logging.getLogger(__name__)
+
+# Requests that are safe to resend after the device may already have acted on them
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "DELETE"}
+RETRY_BACKOFF = 0.1
+
+
+class ServiceUnavailable(Exception):
+    """Raised when a device service is unreachable or its circuit breaker is open"""
+
+    def __init__(self, service: str, detail: str):
+        super().__init__(f"{service} service unavailable: {detail}")
+        self.service = service
+        self.detail = detail
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures. While open, calls fail
+    immediately; after reset_timeout a single trial call is let through and its
+    result closes the breaker again or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def release(self):
+        """End a trial call that produced no verdict (e.g. it was cancelled)"""
+        self._trial = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class DeviceService:
+    """One device HTTP API (LiDAR Pi, camera Pi, mapping service) on the shared client"""
+
+    def __init__(self, pool: "ServicePool", name: str, base_url: str, timeout: float,
+                 connect_timeout: float, retries: int, breaker: CircuitBreaker):
+        self.pool = pool
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = httpx.Timeout(timeout, connect=min(connect_timeout, timeout))
+        self.retries = retries
+        self.breaker = breaker
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+        self.probes = 0
+
+    async def request(self, method: str, path: str = "", **kwargs) -> httpx.Response:
+        """
+        Send a request, retrying connection failures (and, for idempotent methods,
+        timeouts and 5xx responses) up to retries times. Raises ServiceUnavailable
+        when the service cannot be reached or the breaker is open. Retries stop as
+        soon as a failure opens the breaker; the caller gets that failure itself.
+        """
+        method = method.upper()
+        idempotent = method in IDEMPOTENT_METHODS
+        client = self.pool.client
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                self.rejected += 1
+                raise ServiceUnavailable(self.name, "circuit open")
+            self.requests += 1
+            # Let through while the breaker is open only as its half-open trial call
+            trial = self.breaker.opened_at is not None
+            try:
+                response = await client.request(method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+            except httpx.TransportError as e:
+                self._failed()
+                # A connect failure never reached the device, so even a POST can be resent
+                retry = isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout)) or idempotent
+                if not retry or attempt == self.retries or self.breaker.opened_at is not None:
+                    raise ServiceUnavailable(self.name, f"{type(e).__name__}: {str(e) or 'no response'}")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Anything else (bad URL, protocol or decoding errors) still counts against the service
+                self._failed()
+                raise
+            else:
+                if response.status_code < 500:
+                    self.breaker.record_success()
+                    return response
+                self._failed()
+                if not idempotent or attempt == self.retries or self.breaker.opened_at is not None:
+                    return response
+            finally:
+                # A trial that ended without a verdict (cancelled) must not block every later call
+                if trial:
+                    self.breaker.release()
+            await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
+
+    async def probe(self, path: str = "/status") -> httpx.Response:
+        """
+        One health check that bypasses the breaker and never retries, for the status
+        poller. Its failures do not count against the service, but an answer closes
+        the breaker so commands go through again as soon as the device is back.
+        """
+        self.probes += 1
+        response = await self.pool.client.get(f"{self.base_url}{path}", timeout=self.timeout)
+        if response.status_code < 500 and self.breaker.opened_at is not None:
+            logger.info(f"{self.name} service answered a health check, closing circuit")
+            self.breaker.record_success()
+        return response
+
+    async def get(self, path: str = "", **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str = "", **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    async def delete(self, path: str = "", **kwargs) -> httpx.Response:
+        return await self.request("DELETE", path, **kwargs)
+
+    def _failed(self):
+        self.failures += 1
+        was_open = self.breaker.opened_at is not None
+        self.breaker.record_failure()
+        if not was_open and self.breaker.opened_at is not None:
+            logger.warning(f"{self.name} service failing, opening circuit for {self.breaker.reset_timeout}s")
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "base_url": self.base_url,
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "requests": self.requests,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "probes": self.probes,
+        }
+
+
+class ServicePool:
+    """
+    Owns the application's single pooled httpx.AsyncClient, so device calls reuse
+    keep-alive connections instead of opening a new one per request. Services are
+    registered at import time; the client itself is created and closed with the app.
+    """
+
+    def __init__(self, max_connections: int, max_keepalive: int, connect_timeout: float,
+                 retries: int, failure_threshold: int, reset_timeout: float):
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.services: Dict[str, DeviceService] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def running(self) -> bool:
+        return self._client is not None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise RuntimeError("service pool is not started")
+        return self._client
+
+    def start(self):
+        if self.running:
+            return
+        self._client = httpx.AsyncClient(limits=self.limits)
+        logger.info(f"Started device HTTP client ({len(self.services)} services)")
+
+    async def stop(self):
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    def service(self, name: str, base_url: str, timeout: float) -> DeviceService:
+        if name not in self.services:
+            self.services[name] = DeviceService(
+                self, name, base_url, timeout, self.connect_timeout, self.retries,
+                CircuitBreaker(self.failure_threshold, self.reset_timeout),
+            )
+        return self.services[name]
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "services": [service.stats() for service in self.services.values()],
+        }
+
+
+# Shared by the lidar, detection and mapping routers; started and stopped with the app (see main.py)
+service_pool = ServicePool(SERVICE_MAX_CONNECTIONS, SERVICE_MAX_KEEPALIVE, SERVICE_CONNECT_TIMEOUT,
+                           SERVICE_RETRIES, SERVICE_BREAKER_THRESHOLD, SERVICE_BREAKER_RESET)
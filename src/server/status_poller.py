@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from service_client import DeviceService
+
+logger = logging.getLogger(__name__)
+
+
+class StatusPoller:
+    """
+    Polls each watched device service's status endpoint on a fixed interval and keeps
+    the latest results in an in-memory snapshot. Readers only ever look at the
+    snapshot, so status requests cost nothing on the devices no matter how many
+    clients ask. publish is called with the snapshot whenever a service changes.
+    """
+
+    def __init__(self, interval: float, publish: Optional[Callable[[dict], None]] = None):
+        self.interval = interval
+        self.publish = publish
+        self._watched: List[Tuple[str, DeviceService, str]] = []
+        self._task: Optional[asyncio.Task] = None
+        self.services: Dict[str, dict] = {}
+        self.updated: Optional[float] = None
+        self.polls = 0
+        self.changes = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def watch(self, name: str, service: DeviceService, path: str = "/status"):
+        self._watched.append((name, service, path))
+        self.services[name] = {"online": None, "status": None, "error": "not checked yet", "checked_at": None}
+
+    def start(self):
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Started device status poller ({len(self._watched)} services every {self.interval}s)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.error(f"Error polling device status: {str(e)}")
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    async def poll(self) -> bool:
+        """Check every service once; returns True if anything changed"""
+        results = await asyncio.gather(*(self._check(service, path) for _, service, path in self._watched))
+        changed = False
+        services = dict(self.services)
+        for (name, _, _), result in zip(self._watched, results):
+            previous = services.get(name)
+            # Error text alone (e.g. a connect error, then a timeout) is not worth a push
+            if previous is None or any(previous[key] != result[key] for key in ("online", "status")):
+                changed = True
+            services[name] = result
+        # Swap in a new dict rather than mutating, so a reader never sees a half-updated snapshot
+        self.services = services
+        self.updated = time.time()
+        self.polls += 1
+        if changed:
+            self.changes += 1
+            if self.publish:
+                self.publish(self.snapshot())
+        return changed
+
+    async def _check(self, service: DeviceService, path: str) -> dict:
+        started = time.monotonic()
+        result = {"online": False, "status": None, "error": None, "checked_at": time.time()}
+        try:
+            # Probes bypass the breaker the proxy routers share, so an open circuit does not
+            # hide a device that has come back; a successful probe closes it
+            response = await service.probe(path)
+            if response.status_code >= 500:
+                result["error"] = f"HTTP {response.status_code}"
+            else:
+                # Any answer means the service is up, even if it has no status endpoint
+                result["online"] = True
+                try:
+                    result["status"] = response.json()
+                except ValueError:
+                    pass
+        except httpx.TransportError as e:
+            result["error"] = f"{type(e).__name__}: {str(e) or 'no response'}"
+        except Exception as e:
+            result["error"] = str(e)
+        result["latency_ms"] = round((time.monotonic() - started) * 1000, 1)
+        result["circuit"] = service.breaker.state
+        return result
+
+    def get(self, name: str) -> dict:
+        return self.services[name]
+
+    def snapshot(self) -> dict:
+        return {"updated": self.updated, "services": self.services}
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "polls": self.polls,
+            "changes": self.changes,
+            "services": [name for name, _, _ in self._watched],
+        }
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import math
+import time
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_FIELDS = ("pitch", "roll", "yaw")
+
+
+def _finite(name: str, value) -> float:
+    value = float(value)
+    # NaN would poison the alert ring's rates and comparisons; inf is never a real reading
+    if not math.isfinite(value):
+        raise ValueError(f"{name} must be a finite number")
+    return value
+
+
+def parse_sample(data: dict) -> dict:
+    """Validate an ingested attitude sample; raises ValueError on missing, non-numeric or non-finite fields"""
+    if not isinstance(data, dict):
+        raise ValueError("sample must be an object")
+    sample = {"timestamp": _finite("timestamp", data.get("timestamp") or time.time())}
+    for field in TELEMETRY_FIELDS:
+        if field not in data:
+            raise ValueError(f"missing {field}")
+        sample[field] = _finite(field, data[field])
+    return sample
+
+
+class TelemetrySource:
+    """
+    The single producer of warning system telemetry. Real attitude samples arrive
+    through ingest(); while none has arrived for stale_after seconds, the fallback
+    generator fills in every interval. Each sample is handed to publish exactly once,
+    however many viewers are connected.
+    """
+
+    def __init__(self, interval: float, stale_after: float, fallback: Callable[[], dict],
+                 publish: Callable[[dict], None]):
+        self.interval = interval
+        self.stale_after = stale_after
+        self.fallback = fallback
+        self.publish = publish
+        self._task: Optional[asyncio.Task] = None
+        self.last_ingest: Optional[float] = None
+        self.last_timestamp: Optional[float] = None
+        self.latest: Optional[dict] = None
+        self.ingested = 0
+        self.generated = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def live(self) -> bool:
+        return self.last_ingest is not None and time.monotonic() - self.last_ingest < self.stale_after
+
+    def start(self):
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info("Started warning system telemetry source")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def check_order(self, samples: List[dict]):
+        """Raise ValueError unless the samples' timestamps increase, continuing on from the live feed"""
+        last = self.last_timestamp if self.live else None
+        for sample in samples:
+            if last is not None and sample["timestamp"] <= last:
+                raise ValueError(f"timestamp {sample['timestamp']} is not after the previous sample ({last})")
+            last = sample["timestamp"]
+
+    def ingest(self, sample: dict):
+        self.last_ingest = time.monotonic()
+        self.last_timestamp = sample["timestamp"]
+        self.ingested += 1
+        self._emit(dict(sample, source="ingest"))
+
+    async def _run(self):
+        while True:
+            if not self.live:
+                try:
+                    self.generated += 1
+                    self._emit(dict(self.fallback(), source="synthetic"))
+                except Exception as e:
+                    logger.error(f"Error generating telemetry: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def _emit(self, sample: dict):
+        self.latest = sample
+        self.publish(sample)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "live": self.live,
+            "ingested": self.ingested,
+            "generated": self.generated,
+            "latest": self.latest,
+        }
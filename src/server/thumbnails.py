@@ -0,0 +1,251 @@
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+DIGEST_CHUNK_BYTES = 1024 * 1024
+# Poster frames are taken this far into a video (capped), past any black lead-in
+POSTER_POSITION = 0.1
+POSTER_MAX_FRAME = 300
+
+
+class UndecodableMedia(Exception):
+    """Raised when OpenCV cannot read an image or a frame out of a video"""
+
+
+def thumb_path(cache_dir: Path, key: str, size: int) -> Path:
+    # Two-level fan-out keeps directories small with many thousands of thumbnails
+    return Path(cache_dir) / key[:2] / f"{key}_{size}.jpg"
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(DIGEST_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _poster_frame(path: str):
+    capture = cv2.VideoCapture(path)
+    try:
+        frame_count = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+        if frame_count > 1:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, min(int(frame_count * POSTER_POSITION), POSTER_MAX_FRAME))
+        ok, frame = capture.read()
+        if not ok:
+            # Some containers do not support seeking; fall back to the first frame
+            capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = capture.read()
+        return frame if ok else None
+    finally:
+        capture.release()
+
+
+def _render(path: str, video: bool, cache_dir: str, sizes: List[int], quality: int) -> Tuple[str, int]:
+    """
+    Runs in a worker process. Thumbnails are keyed by the source's content hash, so a
+    re-upload of the same file reuses them. Returns (key, bytes written).
+    """
+    key = _file_digest(path)
+    missing = []
+    for size in sizes:
+        target = thumb_path(cache_dir, key, size)
+        if target.exists():
+            # Bump mtime so eviction treats it as recently used
+            os.utime(target)
+        else:
+            missing.append((size, target))
+    if not missing:
+        return key, 0
+
+    image = _poster_frame(path) if video else cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise UndecodableMedia(f"could not decode {Path(path).name}")
+
+    written = 0
+    height, width = image.shape[:2]
+    for size, target in missing:
+        scale = size / max(width, height)
+        thumb = image if scale >= 1.0 else cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode(".jpg", thumb, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise ValueError("JPEG encode failed")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(encoded.tobytes())
+        os.replace(tmp, target)
+        written += len(encoded)
+    return key, written
+
+
+def _warm_up():
+    return True
+
+
+class ThumbnailService:
+    """
+    Generates fixed-size JPEG thumbnails (poster frames for videos) in a process pool
+    and keeps them in a content-addressed cache bounded to max_bytes. The least
+    recently used thumbnails are evicted first.
+    """
+
+    def __init__(self, cache_dir: Path, sizes: List[int], quality: int, max_bytes: int, workers: int):
+        self.cache_dir = Path(cache_dir)
+        self.sizes = sorted(sizes)
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # (source, file name) -> (mtime_ns, size, content key), so lookups skip hashing
+        self._keys: Dict[Tuple[str, str], Tuple[int, int, str]] = {}
+        self._pending: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._evicting = False
+        self.cache_bytes = 0
+        self.generated = 0
+        self.failed = 0
+        self.evicted = 0
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    def start(self):
+        if self.running:
+            return
+        self.cache_dir.mkdir(exist_ok=True)
+        self.cache_bytes = sum(f.stat().st_size for f in self.cache_dir.glob("*/*.jpg"))
+        self._executor = self._new_executor()
+        self._executor.submit(_warm_up)
+        logger.info(f"Started thumbnail workers ({self.cache_bytes} bytes cached)")
+
+    def stop(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def schedule(self, source: str, path: Path, video: bool = False) -> bool:
+        """Queue thumbnail generation for a newly saved file without waiting for it"""
+        if not self.running:
+            return False
+        self._generate(source, Path(path), video)
+        return True
+
+    def forget(self, source: str, name: str):
+        self._keys.pop((source, name), None)
+
+    def _generate(self, source: str, path: Path, video: bool) -> asyncio.Future:
+        slot = (source, path.name)
+        pending = self._pending.get(slot)
+        if pending is None:
+            pending = self._pending[slot] = asyncio.ensure_future(self._render_file(slot, path, video))
+            pending.add_done_callback(lambda future: self._finished(slot, future))
+        return pending
+
+    def _finished(self, slot, future: asyncio.Future):
+        self._pending.pop(slot, None)
+        # Errors are already logged; retrieving them keeps asyncio from warning for scheduled jobs
+        if not future.cancelled():
+            future.exception()
+
+    async def _render_file(self, slot, path: Path, video: bool) -> str:
+        stat = path.stat()
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            key, written = await loop.run_in_executor(
+                executor, _render, str(path), video, str(self.cache_dir), self.sizes, self.quality
+            )
+        except BrokenProcessPool:
+            # Every job on the dead pool fails; only the first one replaces it
+            if self._executor is executor:
+                logger.error("Thumbnail worker died, restarting the pool")
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+            self.failed += 1
+            raise
+        except Exception as e:
+            logger.error(f"Error generating thumbnails for {path.name}: {str(e)}")
+            self.failed += 1
+            raise
+
+        self._keys[slot] = (stat.st_mtime_ns, stat.st_size, key)
+        self.generated += 1
+        self.cache_bytes += written
+        if self.cache_bytes > self.max_bytes and not self._evicting:
+            self._evicting = True
+            asyncio.ensure_future(self._evict())
+        return key
+
+    async def thumbnail(self, source: str, path: Path, size: int, video: bool = False) -> Path:
+        """Path of the cached thumbnail for path, generating it first if needed"""
+        if size not in self.sizes:
+            raise ValueError(f"size must be one of {self.sizes}")
+        if not self.running:
+            raise RuntimeError("thumbnail service is not running")
+        stat = path.stat()
+        known = self._keys.get((source, path.name))
+        if known and known[:2] == (stat.st_mtime_ns, stat.st_size):
+            target = thumb_path(self.cache_dir, known[2], size)
+            try:
+                # Eviction goes by mtime, so a hit marks the thumbnail as recently used
+                os.utime(target)
+                return target
+            except FileNotFoundError:
+                pass
+        key = await self._generate(source, path, video)
+        return thumb_path(self.cache_dir, key, size)
+
+    async def _evict(self):
+        try:
+            removed, self.cache_bytes = await asyncio.to_thread(self._evict_files)
+            self.evicted += removed
+        finally:
+            self._evicting = False
+
+    def _evict_files(self) -> Tuple[int, int]:
+        files = []
+        for f in self.cache_dir.glob("*/*.jpg"):
+            try:
+                stat = f.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, f))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        # Trim to 90% so eviction does not run again on the very next thumbnail
+        target = self.max_bytes * 0.9
+        removed = 0
+        for _, size, f in files:
+            if total <= target:
+                break
+            f.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed, total
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "cache_bytes": self.cache_bytes,
+            "max_bytes": self.max_bytes,
+            "generated": self.generated,
+            "failed": self.failed,
+            "evicted": self.evicted,
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,134 @@
+import numpy as np
+from association import associate
+
+# State vector per track: x, y, vx, vy
+STATE_DIM = 4
+_H = np.array([[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0]])
+
+
+class TrackStore:
+    """
+    Fixed-capacity multi-object tracker with a constant-velocity Kalman filter.
+
+    All track state lives in preallocated arrays indexed by slot, so memory does not
+    grow over long runs. Predict and update run in batch across every live track.
+    Track IDs come from a monotonically increasing counter and are never reused.
+
+    Lifecycle:
+        birth     an unmatched detection takes a free slot (dropped if none are free)
+        confirm   a track is reported once it has been matched min_hits times
+        death     a track is freed after more than max_misses consecutive misses
+    """
+
+    def __init__(self, capacity=256, gate=2.0, min_hits=3, max_misses=5,
+                 process_noise=1.0, measurement_noise=0.05, initial_velocity_var=4.0):
+        self.capacity = capacity
+        self.gate = gate
+        self.min_hits = min_hits
+        self.max_misses = max_misses
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.initial_velocity_var = initial_velocity_var
+
+        self.state = np.zeros((capacity, STATE_DIM))
+        self.cov = np.zeros((capacity, STATE_DIM, STATE_DIM))
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.hits = np.zeros(capacity, dtype=np.int32)
+        self.misses = np.zeros(capacity, dtype=np.int32)
+        self.age = np.zeros(capacity, dtype=np.int32)
+        self.active = np.zeros(capacity, dtype=bool)
+
+        self._next_id = 1
+        self.births_dropped = 0
+
+    @property
+    def confirmed(self):
+        return self.active & (self.hits >= self.min_hits)
+
+    def _transition(self, dt):
+        F = np.eye(STATE_DIM)
+        F[0, 2] = F[1, 3] = dt
+        # Discrete white-noise acceleration model
+        q = self.process_noise
+        dt2, dt3, dt4 = dt * dt, dt ** 3 / 2, dt ** 4 / 4
+        Q = q * np.array([
+            [dt4, 0, dt3, 0],
+            [0, dt4, 0, dt3],
+            [dt3, 0, dt2, 0],
+            [0, dt3, 0, dt2],
+        ])
+        return F, Q
+
+    def predict(self, dt):
+        slots = np.flatnonzero(self.active)
+        if len(slots) == 0:
+            return slots
+        F, Q = self._transition(dt)
+        self.state[slots] = self.state[slots] @ F.T
+        self.cov[slots] = F @ self.cov[slots] @ F.T + Q
+        self.age[slots] += 1
+        return slots
+
+    def _update(self, slots, measurements):
+        P = self.cov[slots]
+        # H selects position, so H P H^T and P H^T are just sub-blocks of P
+        S = P[:, :2, :2] + self.measurement_noise * np.eye(2)
+        K = P[:, :, :2] @ np.linalg.inv(S)
+        innovation = measurements - self.state[slots, :2]
+        self.state[slots] += np.einsum("nij,nj->ni", K, innovation)
+        self.cov[slots] = (np.eye(STATE_DIM) - K @ _H) @ P
+
+    def _birth(self, measurements):
+        free = np.flatnonzero(~self.active)
+        n = min(len(free), len(measurements))
+        self.births_dropped += len(measurements) - n
+        slots = free[:n]
+        if n == 0:
+            return slots
+
+        self.state[slots] = 0.0
+        self.state[slots, :2] = measurements[:n]
+        self.cov[slots] = np.diag([
+            self.measurement_noise, self.measurement_noise,
+            self.initial_velocity_var, self.initial_velocity_var,
+        ])
+        self.ids[slots] = np.arange(self._next_id, self._next_id + n)
+        self._next_id += n
+        self.hits[slots] = 1
+        self.misses[slots] = 0
+        self.age[slots] = 0
+        self.active[slots] = True
+        return slots
+
+    def step(self, centers, dt):
+        """
+        Advance every track by dt and fold in this frame's detections.
+        Returns the slot assigned to each detection, -1 where none could be allocated.
+        """
+        centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        live = self.predict(dt)
+
+        prev_idx, curr_idx = associate(self.state[live, :2], centers, self.gate)
+        matched_slots = live[prev_idx]
+        if len(matched_slots):
+            self._update(matched_slots, centers[curr_idx])
+            self.hits[matched_slots] += 1
+            self.misses[matched_slots] = 0
+
+        missed = np.setdiff1d(live, matched_slots, assume_unique=True)
+        self.misses[missed] += 1
+        self.active[missed[self.misses[missed] > self.max_misses]] = False
+
+        detection_slots = np.full(len(centers), -1, dtype=np.int64)
+        detection_slots[curr_idx] = matched_slots
+        unmatched = np.setdiff1d(np.arange(len(centers)), curr_idx, assume_unique=True)
+        born = self._birth(centers[unmatched])
+        detection_slots[unmatched[:len(born)]] = born
+        return detection_slots
+
+    def radial_velocity(self, slots):
+        """Range rate of each track relative to the sensor; negative means approaching"""
+        position = self.state[slots, :2]
+        velocity = self.state[slots, 2:]
+        distance = np.linalg.norm(position, axis=1)
+        return np.einsum("ij,ij->i", position, velocity) / np.maximum(distance, 1e-9)
@@ -1,39 +1,212 @@
 from fastapi import WebSocket
-from typing import Optional
+from collections import deque
+from typing import Callable, Dict, List, Optional
+import asyncio
+import contextlib
+import inspect
+import itertools
+import json
 import logging
+import time
+from config import WS_CLIENT_QUEUE_SIZE, WS_OVERFLOW_POLICY
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DROP_OLDEST = "drop_oldest"
+LATEST_ONLY = "latest_only"
+OVERFLOW_POLICIES = (DROP_OLDEST, LATEST_ONLY)
+
+# Every manager registers itself here so queue stats can be reported in one place
+_managers: List["WebSocketManager"] = []
+_client_ids = itertools.count(1)
+
+# Smoothing factor for the per-client send time average
+SEND_TIME_ALPHA = 0.2
+
+
+class ClientConnection:
+    """
+    One subscriber with its own bounded send queue and writer task.
+    Producers only ever append to the queue; the writer task does the network I/O.
+    """
+
+    def __init__(self, websocket: WebSocket, manager_name: str, max_queue: int, overflow: str, options: dict):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.websocket = websocket
+        self.id = next(_client_ids)
+        self.manager_name = manager_name
+        self.max_queue = 1 if overflow == LATEST_ONLY else max(1, max_queue)
+        self.overflow = overflow
+        self.options = options
+        self.queue = deque()
+        self.sent = 0
+        self.dropped = 0
+        # Smoothed seconds spent in one network send; a proxy for how fast the client drains
+        self.send_time_ewma = 0.0
+        self.closed = False
+        self._ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        # Optional per-client transform applied by the writer right before sending,
+        # so stateful encoders only ever see messages that are actually delivered
+        self.encoder: Optional[Callable] = None
+
+    def enqueue(self, message) -> bool:
+        if self.closed:
+            return False
+        if len(self.queue) >= self.max_queue:
+            # Either policy discards the stalest frames; latest_only keeps a single slot
+            self.dropped += len(self.queue) - self.max_queue + 1
+            while len(self.queue) >= self.max_queue:
+                self.queue.popleft()
+        self.queue.append(message)
+        self._ready.set()
+        return True
+
+    async def _send(self, message):
+        if isinstance(message, bytes):
+            await self.websocket.send_bytes(message)
+        elif isinstance(message, str):
+            await self.websocket.send_text(message)
+        else:
+            await self.websocket.send_json(message)
+
+    async def run_writer(self, on_error):
+        try:
+            while not self.closed:
+                if not self.queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                message = self.queue.popleft()
+                if self.encoder is not None:
+                    try:
+                        message = self.encoder(message)
+                        if inspect.isawaitable(message):
+                            message = await message
+                    except Exception as e:
+                        # A frame this client's encoder cannot handle is skipped, not fatal to the connection
+                        logger.error(f"Error encoding message for {self.manager_name} client {self.id}: {str(e)}")
+                        self.dropped += 1
+                        if hasattr(self.encoder, "request_keyframe"):
+                            self.encoder.request_keyframe()
+                        continue
+                start = time.perf_counter()
+                await self._send(message)
+                elapsed = time.perf_counter() - start
+                self.send_time_ewma += SEND_TIME_ALPHA * (elapsed - self.send_time_ewma)
+                self.sent += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error sending message to {self.manager_name} client {self.id}: {str(e)}")
+            await on_error(self)
+
+    def close(self):
+        self.closed = True
+        self.queue.clear()
+        self._ready.set()
+        if self.task and not self.task.done() and self.task is not asyncio.current_task():
+            self.task.cancel()
+
+    def stats(self) -> dict:
+        stats = {
+            "id": self.id,
+            "queue_depth": len(self.queue),
+            "max_queue": self.max_queue,
+            "overflow": self.overflow,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "send_time_ms": self.send_time_ewma * 1000,
+            "options": self.options,
+        }
+        if hasattr(self.encoder, "stats"):
+            stats["encoder"] = self.encoder.stats()
+        return stats
+
+
 class WebSocketManager:
-    def __init__(self, name: str = "default"):
-        self.connection: Optional[WebSocket] = None
+    def __init__(self, name: str = "default", max_queue: int = WS_CLIENT_QUEUE_SIZE,
+                 overflow: str = WS_OVERFLOW_POLICY):
+        self.connections: Dict[WebSocket, ClientConnection] = {}
         self.name = name
+        self.max_queue = max_queue
+        self.overflow = overflow
+        _managers.append(self)
         logger.info(f"Initialized WebSocketManager: {name}")
 
-    async def connect(self, websocket: WebSocket):
+    @property
+    def has_connections(self) -> bool:
+        return bool(self.connections)
+
+    @property
+    def clients(self) -> List[ClientConnection]:
+        return list(self.connections.values())
+
+    async def connect(self, websocket: WebSocket, overflow: Optional[str] = None,
+                      max_queue: Optional[int] = None, **options) -> ClientConnection:
         await websocket.accept()
-        self.connection = websocket
-        logger.info(f"WebSocket connected: {self.name}")
-        return True
+        client = ClientConnection(
+            websocket,
+            self.name,
+            max_queue if max_queue is not None else self.max_queue,
+            overflow or self.overflow,
+            options,
+        )
+        self.connections[websocket] = client
+        client.task = asyncio.create_task(client.run_writer(self._drop_client))
+        logger.info(f"WebSocket connected: {self.name} (client {client.id}, {len(self.connections)} total)")
+        return client
 
-    async def disconnect(self):
-        if self.connection:
-            logger.info(f"WebSocket disconnected: {self.name}")
-            self.connection = None
+    async def disconnect(self, websocket: WebSocket):
+        client = self.connections.pop(websocket, None)
+        if client:
+            client.close()
+            logger.info(f"WebSocket disconnected: {self.name} (client {client.id})")
             return True
         return False
 
-    async def send_message(self, message: dict):
-        if not self.connection:
+    async def _drop_client(self, client: ClientConnection):
+        await self.disconnect(client.websocket)
+        # Close the socket too, so the browser sees onclose and reconnects instead of waiting forever
+        with contextlib.suppress(Exception):
+            await client.websocket.close(code=1011)
+
+    def broadcast(self, message, clients: Optional[List[ClientConnection]] = None) -> int:
+        """
+        Queue a message for every subscriber (or the given subset) without awaiting
+        any network write. Dicts are serialized once here rather than once per client.
+        Returns the number of clients the message was queued for.
+        """
+        targets = self.clients if clients is None else clients
+        if not targets:
+            return 0
+        if isinstance(message, dict):
+            message = json.dumps(message)
+        return sum(client.enqueue(message) for client in targets)
+
+    def group_clients(self, *options: str) -> Dict[tuple, List[ClientConnection]]:
+        """Group subscribers by their connect options, e.g. level of detail and codec"""
+        groups: Dict[tuple, List[ClientConnection]] = {}
+        for client in self.clients:
+            key = tuple(client.options.get(option) for option in options)
+            groups.setdefault(key, []).append(client)
+        return groups
+
+    async def send_message(self, message) -> bool:
+        if not self.connections:
             logger.warning(f"Attempted to send message to disconnected websocket: {self.name}")
             return False
-            
-        try:
-            await self.connection.send_json(message)
-            return True
-        except Exception as e:
-            logger.error(f"Error sending message to {self.name} websocket: {str(e)}")
-            self.connection = None
-            return False
\ No newline at end of file
+        return self.broadcast(message) > 0
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "clients": [client.stats() for client in self.clients],
+        }
+
+
+def all_manager_stats() -> List[dict]:
+    return [manager.stats() for manager in _managers]